@@ -0,0 +1,51 @@
+import threading
+from typing import Optional
+
+import boto3
+from botocore.client import BaseClient
+from botocore.config import Config
+
+from actions_helper.instrumentation import Instrumentation
+from actions_helper.rate_limiter import RateLimiter
+
+# Enough connections for the concurrent steps of a single deployment
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+MAX_ATTEMPTS = 10
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 30  # seconds
+# Services whose control plane calls are paced by the rate limiter
+RATE_LIMITED_SERVICES = ("ecs", "ecr")
+
+
+# Creates all AWS clients from a single session and shares them, so concurrent calls reuse pooled connections.
+# Clients are thread-safe once created, but creating them from a shared session is not, hence the lock.
+class ClientFactory:
+    def __init__(
+        self,
+        region_name: str,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        instrumentation: Optional[Instrumentation] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self._session = boto3.Session(region_name=region_name)
+        self._config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+        )
+        self._instrumentation = instrumentation
+        self._rate_limiter = rate_limiter
+        self._clients: dict[str, BaseClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, service_name: str) -> BaseClient:
+        with self._lock:
+            if service_name not in self._clients:
+                client = self._session.client(service_name, config=self._config)
+                if self._instrumentation:
+                    self._instrumentation.instrument(client)
+                if self._rate_limiter and service_name in RATE_LIMITED_SERVICES:
+                    self._rate_limiter.attach(client)
+                self._clients[service_name] = client
+            return self._clients[service_name]
@@ -1,10 +1,13 @@
-from typing import Any
+import hashlib
+import json
+from typing import Any, Optional
 
 import click
 from botocore.client import BaseClient
 
-from actions_helper.commands.get_active_task_definition_by_tag import get_active_task_definition_arn_by_tag
-from actions_helper.outputs import CreateTaskDefinitionOutput
+from actions_helper.commands.get_active_task_definition_by_tag import TaskDefinitionFamily
+from actions_helper.outputs import CreateTaskDefinitionOutput, PreparedTaskDefinition
+from actions_helper.task_definition_cache import TaskDefinitionCache, describe_task_definition
 from actions_helper.utils import PLACEHOLDER_TEXT, set_error
 
 KEYS_TO_DELETE_FROM_TASK_DEFINITION = (
@@ -16,10 +19,18 @@ KEYS_TO_DELETE_FROM_TASK_DEFINITION = (
     "registeredAt",
     "registeredBy",
 )
+# Tag holding the fingerprint of the rendered task definition a revision was registered from
+FINGERPRINT_TAG_KEY = "fingerprint"
 
 
-def get_rendered_task_definition(ecs_client: BaseClient, task_definition_arn: str, image_uri: str) -> dict[str, Any]:
-    task_definition = ecs_client.describe_task_definition(taskDefinition=task_definition_arn)["taskDefinition"]
+def get_rendered_task_definition(
+    ecs_client: BaseClient,
+    task_definition_arn: str,
+    image_uri: str,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+) -> dict[str, Any]:
+    # The described task definition is a copy, also when it comes from the cache, so it can be rendered in place
+    task_definition = describe_task_definition(ecs_client, task_definition_arn, task_definition_cache)["taskDefinition"]
 
     try:
         (container_image,) = {
@@ -39,15 +50,39 @@ def get_rendered_task_definition(ecs_client: BaseClient, task_definition_arn: st
     return task_definition
 
 
-def create_task_definition(
+def get_task_definition_fingerprint(task_definition: dict[str, Any], image_digest: Optional[str] = None) -> str:
+    # Keys are sorted, so the fingerprint does not depend on the order of the described task definition. The image tag
+    # in the task definition can be moved to another image, so the digest it pointed to is part of the fingerprint.
+    return hashlib.sha256(
+        json.dumps(
+            {"taskDefinition": task_definition, "imageDigest": image_digest},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        ).encode(),
+    ).hexdigest()
+
+
+def prepare_task_definition(
     ecs_client: BaseClient,
     application_id: str,
     image_uri: str,
     deployment_tag: str,
-) -> CreateTaskDefinitionOutput:
-    active_task_definition_by_pulumi = get_active_task_definition_arn_by_tag(
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+    image_digest: Optional[str] = None,
+) -> PreparedTaskDefinition:
+    # Only reads, both lookups share a single scan of the family
+    task_definition_family = TaskDefinitionFamily(
         ecs_client=ecs_client,
         task_definition_family_prefix=application_id,
+        tagging_client=tagging_client,
+        max_revisions=max_revisions,
+        task_definition_cache=task_definition_cache,
+    )
+
+    active_task_definition_by_pulumi = task_definition_family.get_active_task_definition_arn_by_tag(
         task_definition_tags=f"created_by:Pulumi,Name:{application_id}",
         allow_initial_deployment=False,
     )
@@ -56,27 +91,73 @@ def create_task_definition(
         ecs_client=ecs_client,
         task_definition_arn=active_task_definition_by_pulumi,
         image_uri=image_uri,
+        task_definition_cache=task_definition_cache,
     )
 
-    active_task_definition_by_github = get_active_task_definition_arn_by_tag(
-        ecs_client=ecs_client,
-        task_definition_family_prefix=application_id,
+    active_task_definition_by_github = task_definition_family.get_active_task_definition_arn_by_tag(
         task_definition_tags=f"created_by:{deployment_tag},Name:{application_id}",
         allow_initial_deployment=True,
     )
 
-    deployed_task_definition = ecs_client.register_task_definition(
-        **task_definition,
-        tags=[
-            {"key": "created_by", "value": deployment_tag},
-            {"key": "Name", "value": application_id},
-        ],
-    )["taskDefinition"]["taskDefinitionArn"]
+    fingerprint = get_task_definition_fingerprint(task_definition, image_digest)
+
+    return PreparedTaskDefinition(
+        application_id=application_id,
+        task_definition=task_definition,
+        fingerprint=fingerprint,
+        previous_task_definition_arn=active_task_definition_by_github,
+        # Without the digest, an image tag moved to another image would look like an unchanged task definition
+        unchanged=bool(image_digest or "@" in image_uri)
+        and bool(active_task_definition_by_github)
+        and {"key": FINGERPRINT_TAG_KEY, "value": fingerprint}
+        in task_definition_family.get_task_definition_tags(active_task_definition_by_github),
+    )
 
-    click.echo(f"previous_task_definition_arn={active_task_definition_by_github}")
+
+def create_task_definition(
+    ecs_client: BaseClient,
+    application_id: str,
+    image_uri: str,
+    deployment_tag: str,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+    prepared_task_definition: Optional[PreparedTaskDefinition] = None,
+    image_digest: Optional[str] = None,
+) -> CreateTaskDefinitionOutput:
+    # The lookups are skipped if they were already made, see `validate_deployment`
+    prepared_task_definition = prepared_task_definition or prepare_task_definition(
+        ecs_client=ecs_client,
+        application_id=application_id,
+        image_uri=image_uri,
+        deployment_tag=deployment_tag,
+        tagging_client=tagging_client,
+        max_revisions=max_revisions,
+        task_definition_cache=task_definition_cache,
+        image_digest=image_digest,
+    )
+
+    if prepared_task_definition.unchanged:
+        # Redeploying an unchanged task definition reuses the deployed revision instead of registering an identical one
+        click.echo(
+            f"Task definition unchanged (fingerprint {prepared_task_definition.fingerprint}), "
+            f"reusing {prepared_task_definition.previous_task_definition_arn}",
+        )
+        deployed_task_definition = prepared_task_definition.previous_task_definition_arn
+    else:
+        deployed_task_definition = ecs_client.register_task_definition(
+            **prepared_task_definition.task_definition,
+            tags=[
+                {"key": "created_by", "value": deployment_tag},
+                {"key": "Name", "value": application_id},
+                {"key": FINGERPRINT_TAG_KEY, "value": prepared_task_definition.fingerprint},
+            ],
+        )["taskDefinition"]["taskDefinitionArn"]
+
+    click.echo(f"previous_task_definition_arn={prepared_task_definition.previous_task_definition_arn}")
     click.echo(f"latest_task_definition_arn={deployed_task_definition}")
 
     return CreateTaskDefinitionOutput(
-        previous_task_definition_arn=active_task_definition_by_github,
+        previous_task_definition_arn=prepared_task_definition.previous_task_definition_arn,
         latest_task_definition_arn=deployed_task_definition,
     )
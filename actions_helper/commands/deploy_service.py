@@ -0,0 +1,271 @@
+from typing import Any, Optional
+
+import click
+from botocore.client import BaseClient
+
+from actions_helper.commands.create_task_definition import create_task_definition
+from actions_helper.commands.deregister_task_definition import deregister_task_definition
+from actions_helper.commands.rollback_service import rollback_service
+from actions_helper.commands.run_preflight import run_preflight_container
+from actions_helper.commands.validate_deployment import validate_deployment
+from actions_helper.commands.wait_for_service_stable import (
+    describe_service,
+    get_deployment,
+    is_deployment_stable,
+    wait_for_service_stable,
+)
+from actions_helper.instrumentation import Instrumentation
+from actions_helper.outputs import CreateTaskDefinitionOutput, DeployServiceOutput
+from actions_helper.poller import BatchPoller
+from actions_helper.service_snapshot import ServiceSnapshot
+from actions_helper.task_definition_cache import TaskDefinitionCache
+from actions_helper.task_graph import TaskGraph
+
+# Deployment configuration of the fast rollout for environments which may be briefly unavailable: all tasks are
+# replaced at once instead of in waves which keep the service at full capacity. The circuit breaker fails the
+# deployment once tasks keep failing to start, instead of ECS retrying until the stability timeout. It does not roll
+# back by itself, which is left to `rollback_on_failure`.
+FAST_ROLLOUT_DEPLOYMENT_CONFIGURATION = {
+    "maximumPercent": 200,
+    "minimumHealthyPercent": 0,
+    "deploymentCircuitBreaker": {"enable": True, "rollback": False},
+}
+
+
+def get_deployment_configuration_parameters(fast_rollout: bool) -> dict[str, Any]:
+    # The service keeps the deployment configuration of a fast rollout, see `restore_deployment_configuration`
+    return {"deploymentConfiguration": FAST_ROLLOUT_DEPLOYMENT_CONFIGURATION} if fast_rollout else {}
+
+
+def restore_deployment_configuration(
+    ecs_client: BaseClient,
+    cluster: str,
+    service: str,
+    deployment_configuration: dict[str, Any],
+):
+    # Sets the deployment configuration of the service before the fast rollout again, which does not start a new
+    # deployment. Services without a circuit breaker get the one of the fast rollout disabled.
+    click.echo("Restoring deployment configuration...")
+    ecs_client.update_service(
+        cluster=cluster,
+        service=service,
+        deploymentConfiguration={
+            "deploymentCircuitBreaker": {"enable": False, "rollback": False},
+            **deployment_configuration,
+        },
+    )
+
+
+def is_service_deployed(
+    ecs_client: BaseClient,
+    cluster: str,
+    service: str,
+    task_definition_arn: str,
+    desired_count: Optional[int],
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
+) -> bool:
+    service_description = describe_service(ecs_client, cluster, service, poller, service_snapshot)
+    return (
+        len(service_description["deployments"]) == 1
+        and (deployment := get_deployment(service_description, task_definition_arn)) is not None
+        and is_deployment_stable(service_description, deployment)
+        and desired_count in (None, service_description["desiredCount"])
+    )
+
+
+def deploy_service(
+    *,
+    ecs_client: BaseClient,
+    application: str,
+    environment: str,
+    image_uri: str,
+    deployment_tag: str,
+    run_preflight: bool,
+    desired_count: Optional[int],
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+    rollback_on_failure: bool = False,
+    logs_client: Optional[BaseClient] = None,
+    poller: Optional[BatchPoller] = None,
+    fast_rollout: bool = False,
+    image_digest: Optional[str] = None,
+) -> DeployServiceOutput:
+    service = f"{application}-{environment}"
+    instrumentation = instrumentation or Instrumentation()
+    # Saves describing the service once more in each step
+    service_snapshot = ServiceSnapshot()
+
+    def create_task_definition_step(application_id: str, description: str):
+        def step() -> CreateTaskDefinitionOutput:
+            click.echo(f"Creating {description} task definition...")
+            with instrumentation.phase(f"create_task_definition:{application_id}"):
+                return create_task_definition(
+                    ecs_client=ecs_client,
+                    application_id=application_id,
+                    deployment_tag=deployment_tag,
+                    image_uri=image_uri,
+                    tagging_client=tagging_client,
+                    max_revisions=max_revisions,
+                    task_definition_cache=task_definition_cache,
+                    prepared_task_definition=prepared_task_definitions[application_id],
+                    image_digest=image_digest,
+                )
+
+        return step
+
+    def run_preflight_step(preflight_task_definition: CreateTaskDefinitionOutput):
+        with instrumentation.phase(f"run_preflight:{service}"):
+            return run_preflight_container(
+                ecs_client=ecs_client,
+                service=service,
+                cluster=environment,
+                latest_task_definition_arn=preflight_task_definition.latest_task_definition_arn,
+                logs_client=logs_client,
+                poller=poller,
+                service_snapshot=service_snapshot,
+            )
+
+    def update_service_step(production_task_definition: CreateTaskDefinitionOutput, **_):
+        if production_task_definition.reused and is_service_deployed(
+            ecs_client=ecs_client,
+            cluster=environment,
+            service=service,
+            task_definition_arn=production_task_definition.latest_task_definition_arn,
+            desired_count=desired_count,
+            poller=poller,
+            service_snapshot=service_snapshot,
+        ):
+            click.echo("Service already runs the unchanged task definition, skipping update")
+            return
+
+        deployment_configuration = None
+        if fast_rollout:
+            # Read from the description of the validation, before the update replaces the deployment configuration
+            service_description = describe_service(
+                ecs_client,
+                environment,
+                service,
+                poller,
+                service_snapshot,
+                static=True,
+            )
+            deployment_configuration = service_description["deploymentConfiguration"]
+        try:
+            click.echo("Updating service...")
+            service_snapshot.invalidate()
+            with instrumentation.phase(f"update_service:{service}"):
+                ecs_client.update_service(
+                    taskDefinition=production_task_definition.latest_task_definition_arn,
+                    cluster=environment,
+                    service=service,
+                    # Without a desired count, the service keeps its current one
+                    **({"desiredCount": desired_count} if desired_count is not None else {}),
+                    **get_deployment_configuration_parameters(fast_rollout),
+                )
+            click.echo("Service updated")
+
+            click.echo("Waiting for service stability...")
+            with instrumentation.phase(f"wait_for_service_stable:{service}"):
+                wait_for_service_stable(
+                    ecs_client=ecs_client,
+                    cluster=environment,
+                    service=service,
+                    task_definition_arn=production_task_definition.latest_task_definition_arn,
+                    poller=poller,
+                    service_snapshot=service_snapshot,
+                )
+            click.echo("Service stable")
+        except Exception:
+            if rollback_on_failure:
+                rollback(production_task_definition)
+            raise
+        finally:
+            if deployment_configuration:
+                with instrumentation.phase(f"restore_deployment_configuration:{service}"):
+                    restore_deployment_configuration(ecs_client, environment, service, deployment_configuration)
+
+    def rollback(production_task_definition: CreateTaskDefinitionOutput):
+        # Restores the previous revision right away instead of leaving the service to converge on its own. Failures
+        # before the service update, like a failed preflight, leave the service on the previous revision anyway.
+        if not production_task_definition.previous_task_definition_arn or production_task_definition.reused:
+            click.echo("No previous task definition to roll back to")
+            return
+        try:
+            with instrumentation.phase(f"rollback:{service}"):
+                rollback_service(
+                    ecs_client=ecs_client,
+                    cluster=environment,
+                    service=service,
+                    task_definition_arn=production_task_definition.previous_task_definition_arn,
+                    poller=poller,
+                    service_snapshot=service_snapshot,
+                )
+        except Exception as e:
+            click.echo(f"Rollback of service {service} failed: {e!r}")
+
+    # Everything which can fail before the first registration is checked up front, so a failed validation leaves nothing
+    # to clean up
+    click.echo("Validating deployment...")
+    with instrumentation.phase(f"validate_deployment:{service}"):
+        prepared_task_definitions = validate_deployment(
+            ecs_client=ecs_client,
+            application=application,
+            environment=environment,
+            image_uri=image_uri,
+            deployment_tag=deployment_tag,
+            run_preflight=run_preflight,
+            tagging_client=tagging_client,
+            max_revisions=max_revisions,
+            task_definition_cache=task_definition_cache,
+            poller=poller,
+            service_snapshot=service_snapshot,
+            image_digest=image_digest,
+        )
+
+    graph = TaskGraph()
+    graph.add("local_task_definition", create_task_definition_step(f"{application}-local-exec-{environment}", "local"))
+    graph.add("production_task_definition", create_task_definition_step(service, "production"))
+    if run_preflight:
+        click.echo("Run preflight enabled")
+        graph.add(
+            "preflight_task_definition",
+            create_task_definition_step(f"{application}-preflight-{environment}", "preflight"),
+        )
+        graph.add("preflight", run_preflight_step, depends_on=("preflight_task_definition",))
+
+    # The service update waits for the local task definition as well, so that a failed registration can still be
+    # rolled back before the service runs the new revision; the registrations themselves run concurrently.
+    graph.add(
+        "update_service",
+        update_service_step,
+        depends_on=(
+            "production_task_definition",
+            "local_task_definition",
+            *(("preflight",) if run_preflight else ()),
+        ),
+    )
+
+    try:
+        graph.run()
+    finally:
+        click.echo("De-registering task definition")
+        with instrumentation.phase(f"deregister_task_definition:{service}"):
+            deregister_task_definition(
+                ecs_client=ecs_client,
+                cluster=environment,
+                service=service,
+                production_task_definition_output=graph.results.get("production_task_definition"),
+                local_task_definition_output=graph.results.get("local_task_definition"),
+                preflight_task_definition_output=graph.results.get("preflight_task_definition"),
+                run_preflight=run_preflight,
+                service_stable="update_service" in graph.results,
+                service_snapshot=service_snapshot,
+            )
+
+    return DeployServiceOutput(
+        service=service,
+        task_definition_arn=graph.results["production_task_definition"].latest_task_definition_arn,
+    )
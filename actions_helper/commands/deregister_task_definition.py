@@ -1,12 +1,23 @@
-from typing import Optional
+from typing import Any, Optional
 
 import click
 from botocore.client import BaseClient
 
+from actions_helper.commands.wait_for_service_stable import describe_service
 from actions_helper.outputs import CreateTaskDefinitionOutput
+from actions_helper.service_snapshot import ServiceSnapshot
 from actions_helper.utils import set_error
 
 
+def get_primary_deployment_task_definition_arn(service_description: dict[str, Any]) -> str:
+    (primary_deployment_definition_arn,) = (
+        deployment["taskDefinition"]
+        for deployment in service_description["deployments"]
+        if deployment["status"] == "PRIMARY"
+    )
+    return primary_deployment_definition_arn
+
+
 def deregister_task_definition(
     ecs_client: BaseClient,
     cluster: str,
@@ -15,21 +26,19 @@ def deregister_task_definition(
     production_task_definition_output: Optional[CreateTaskDefinitionOutput],
     local_task_definition_output: Optional[CreateTaskDefinitionOutput],
     preflight_task_definition_output: Optional[CreateTaskDefinitionOutput],
+    service_stable: bool = True,
+    service_snapshot: Optional[ServiceSnapshot] = None,
 ):
-    (primary_deployment_definition_arn,) = (
-        deployment["taskDefinition"]
-        for deployment in ecs_client.describe_services(
-            cluster=cluster,
-            services=[service],
-        )["services"][0]["deployments"]
-        if deployment["status"] == "PRIMARY"
+    primary_deployment_definition_arn = get_primary_deployment_task_definition_arn(
+        describe_service(ecs_client, cluster, service, service_snapshot=service_snapshot),
     )
 
     click.echo(f"{primary_deployment_definition_arn=}")
 
     fail_pipeline = True
     if (
-        all(
+        service_stable
+        and all(
             (
                 production_task_definition_output,
                 local_task_definition_output,
@@ -48,7 +57,8 @@ def deregister_task_definition(
         preflight_task_definition_output,
         production_task_definition_output,
     ):
-        if task_definition:
+        # A reused revision is both the previous and the latest one, and stays registered either way
+        if task_definition and not task_definition.reused:
             click.echo(f"Deregister {task_definition}")
             ecs_client.deregister_task_definition(
                 taskDefinition=task_definition.latest_task_definition_arn
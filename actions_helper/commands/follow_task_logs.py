@@ -0,0 +1,102 @@
+import contextlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+import click
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+TASK_LOGS_POLL_DELAY = 2  # seconds between polls of the log stream, like the `tasks_stopped` waiter
+
+
+@dataclass(frozen=True)
+class TaskLogStream:
+    container: str
+    group: str
+    name: str
+
+
+def get_task_log_stream(task_definition: dict[str, Any], task_arn: str) -> Optional[TaskLogStream]:
+    # The awslogs driver writes the output of a container to the stream <prefix>/<container name>/<task ID>, see
+    # https://docs.aws.amazon.com/AmazonECS/latest/developerguide/using_awslogs.html. The preflight task definition has
+    # a single container, see `check_preflight_task`.
+    container_definition = task_definition["containerDefinitions"][0]
+    log_configuration = container_definition.get("logConfiguration", {})
+    options = log_configuration.get("options", {})
+    if log_configuration.get("logDriver") != "awslogs" or "awslogs-stream-prefix" not in options:
+        return None
+
+    task_id = task_arn.rsplit("/", 1)[-1]
+    return TaskLogStream(
+        container=container_definition["name"],
+        group=options["awslogs-group"],
+        name=f"{options['awslogs-stream-prefix']}/{container_definition['name']}/{task_id}",
+    )
+
+
+def get_log_events_parameters(log_stream: TaskLogStream, next_token: Optional[str]) -> dict[str, Any]:
+    return {
+        "logGroupName": log_stream.group,
+        "logStreamName": log_stream.name,
+        "startFromHead": True,
+        **({"nextToken": next_token} if next_token else {}),
+    }
+
+
+def is_log_stream_missing(error: ClientError) -> bool:
+    # The stream is only created once the container started
+    return error.response["Error"]["Code"] == "ResourceNotFoundException"
+
+
+def print_log_events(log_stream: TaskLogStream, response: dict[str, Any]):
+    for event in response["events"]:
+        click.echo(f"[{log_stream.container}] {event['message'].rstrip()}")
+
+
+def print_new_task_logs(logs_client: BaseClient, log_stream: TaskLogStream, next_token: Optional[str]) -> Optional[str]:
+    # Prints the lines written since the forward token and returns the token to continue from. At the end of the
+    # stream, CloudWatch Logs returns the token it was given.
+    while True:
+        try:
+            response = logs_client.get_log_events(**get_log_events_parameters(log_stream, next_token))
+        except ClientError as e:
+            if not is_log_stream_missing(e):
+                raise
+            return next_token
+        print_log_events(log_stream, response)
+        if response["nextForwardToken"] == next_token:
+            return next_token
+        next_token = response["nextForwardToken"]
+
+
+def poll_task_logs(logs_client: BaseClient, log_stream: TaskLogStream, stopped: threading.Event):
+    # Polls until the task stopped, and once more afterwards for the last lines. The logs are only a diagnostic aid,
+    # so errors stop the polling instead of failing the deployment.
+    next_token = None
+    try:
+        while True:
+            task_stopped = stopped.wait(TASK_LOGS_POLL_DELAY)
+            next_token = print_new_task_logs(logs_client, log_stream, next_token)
+            if task_stopped:
+                return
+    except (BotoCoreError, ClientError) as e:
+        click.echo(f"Following the logs of {log_stream.container} failed: {e}")
+
+
+@contextlib.contextmanager
+def follow_task_logs(logs_client: BaseClient, log_stream: TaskLogStream) -> Iterator[None]:
+    # Prints the logs of the task while the body waits for it to stop
+    stopped = threading.Event()
+    thread = threading.Thread(
+        target=poll_task_logs,
+        args=(logs_client, log_stream, stopped),
+        name=f"logs-{log_stream.container}",
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
@@ -0,0 +1,272 @@
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import click
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+from actions_helper.commands.create_task_definition import FINGERPRINT_TAG_KEY
+from actions_helper.commands.get_active_task_definition_by_tag import (
+    Tag,
+    iter_active_task_definition_tags,
+    iter_task_definition_arn_pages,
+)
+from actions_helper.outputs import GcTaskDefinitionsOutput
+
+# Maximum number of task definitions accepted by the ECS `delete_task_definitions` call
+MAX_DELETE_TASK_DEFINITIONS = 10
+# Maximum number of services accepted by the ECS `describe_services` call
+MAX_DESCRIBE_SERVICES = 10
+DEFAULT_KEEP_REVISIONS = 5
+DEFAULT_MAX_WORKERS = 8
+# Number of task definitions processed between two saves of the state file
+CHECKPOINT_INTERVAL = 100
+
+
+class GcStateMismatchError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class TaskDefinitionGcPlan:
+    keep: tuple[str, ...]
+    deregister: tuple[str, ...]
+    # Revisions which are already INACTIVE, deregistered revisions are deleted as well
+    delete: tuple[str, ...]
+
+
+def get_task_definition_family(task_definition_arn: str) -> str:
+    # arn:aws:ecs:<region>:<account>:task-definition/<family>:<revision>
+    return task_definition_arn.rsplit("/", 1)[1].rsplit(":", 1)[0]
+
+
+def get_deployed_task_definition_arns(ecs_client: BaseClient, clusters: Iterable[str]) -> frozenset[str]:
+    task_definition_arns = set()
+    for cluster in clusters:
+        next_token = None
+        while True:
+            response = ecs_client.list_services(cluster=cluster, **({"nextToken": next_token} if next_token else {}))
+            service_arns = response["serviceArns"]
+            for start in range(0, len(service_arns), MAX_DESCRIBE_SERVICES):
+                for service in ecs_client.describe_services(
+                    cluster=cluster,
+                    services=service_arns[start : start + MAX_DESCRIBE_SERVICES],
+                )["services"]:
+                    task_definition_arns.update(deployment["taskDefinition"] for deployment in service["deployments"])
+            if not (next_token := response.get("nextToken")):
+                break
+    return frozenset(task_definition_arns)
+
+
+def plan_task_definition_gc(
+    *,
+    ecs_client: BaseClient,
+    families: Iterable[str],
+    deployed_task_definition_arns: frozenset[str],
+    keep: int = DEFAULT_KEEP_REVISIONS,
+    tagging_client: Optional[BaseClient] = None,
+) -> TaskDefinitionGcPlan:
+    kept, deregister, delete = [], [], []
+    for family in families:
+        # Families are listed by prefix, which also matches longer family names
+        revisions_by_tags = Counter()
+        for task_definition_arn, tags in iter_active_task_definition_tags(
+            ecs_client=ecs_client,
+            task_definition_family_prefix=family,
+            tagging_client=tagging_client,
+        ):
+            if get_task_definition_family(task_definition_arn) != family:
+                continue
+            # Every revision has its own fingerprint, so it does not count as a tag here
+            retention_key = frozenset(
+                Tag(tag["key"], tag["value"]) for tag in tags if tag["key"] != FINGERPRINT_TAG_KEY
+            )
+            revisions_by_tags[retention_key] += 1
+            if revisions_by_tags[retention_key] <= keep or task_definition_arn in deployed_task_definition_arns:
+                kept.append(task_definition_arn)
+            else:
+                deregister.append(task_definition_arn)
+
+        # Deregistered revisions can still run in a deployment, which cannot start new tasks once they are deleted
+        for page in iter_task_definition_arn_pages(ecs_client, family, status="INACTIVE"):
+            family_arns = tuple(arn for arn in page if get_task_definition_family(arn) == family)
+            kept.extend(arn for arn in family_arns if arn in deployed_task_definition_arns)
+            delete.extend(arn for arn in family_arns if arn not in deployed_task_definition_arns)
+
+    return TaskDefinitionGcPlan(keep=tuple(kept), deregister=tuple(deregister), delete=tuple(delete))
+
+
+class TaskDefinitionGcState:
+    # Records the plan and the finished steps, so an interrupted run can be resumed without scanning the families again.
+    # The arguments the plan was made for are recorded as well, a run with other arguments must not resume it.
+    def __init__(self, path: Optional[str], arguments: dict[str, Any], plan: TaskDefinitionGcPlan):
+        self.path = Path(path) if path else None
+        self.arguments = arguments
+        self.plan = plan
+        self.deregistered: set[str] = set()
+        self.deleted: set[str] = set()
+
+    @classmethod
+    def load(cls, path: str) -> "TaskDefinitionGcState":
+        state_json = json.loads(Path(path).read_text())
+        state = cls(
+            path,
+            state_json.get("arguments", {}),
+            TaskDefinitionGcPlan(**{key: tuple(arns) for key, arns in state_json["plan"].items()}),
+        )
+        state.deregistered.update(state_json["deregistered"])
+        state.deleted.update(state_json["deleted"])
+        return state
+
+    def save(self):
+        if self.path:
+            temporary_path = self.path.with_suffix(".tmp")
+            temporary_path.write_text(
+                json.dumps(
+                    {
+                        "arguments": self.arguments,
+                        "plan": asdict(self.plan),
+                        "deregistered": sorted(self.deregistered),
+                        "deleted": sorted(self.deleted),
+                    },
+                ),
+            )
+            temporary_path.replace(self.path)
+
+    def remove(self):
+        if self.path:
+            self.path.unlink(missing_ok=True)
+
+
+def deregister_task_definitions(
+    ecs_client: BaseClient,
+    state: TaskDefinitionGcState,
+    max_workers: int,
+) -> tuple[str, ...]:
+    def deregister(task_definition_arn: str) -> Optional[str]:
+        try:
+            ecs_client.deregister_task_definition(taskDefinition=task_definition_arn)
+        except ClientError as e:
+            click.echo(f"Failed to deregister {task_definition_arn}: {e}")
+            return None
+        return task_definition_arn
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = tuple(arn for arn in state.plan.deregister if arn not in state.deregistered)
+        for start in range(0, len(pending), CHECKPOINT_INTERVAL):
+            task_definition_arns = pending[start : start + CHECKPOINT_INTERVAL]
+            for task_definition_arn, deregistered in zip(
+                task_definition_arns,
+                executor.map(deregister, task_definition_arns),
+            ):
+                if deregistered:
+                    state.deregistered.add(deregistered)
+                else:
+                    failed.append(task_definition_arn)
+            state.save()
+            click.echo(f"Deregistered {start + len(task_definition_arns)} of {len(pending)} task definitions")
+    return tuple(failed)
+
+
+def delete_task_definitions(
+    ecs_client: BaseClient,
+    state: TaskDefinitionGcState,
+    max_workers: int,
+) -> tuple[str, ...]:
+    def delete(task_definition_arns: tuple[str, ...]) -> dict[str, list]:
+        try:
+            return ecs_client.delete_task_definitions(taskDefinitions=list(task_definition_arns))
+        except ClientError as e:
+            # Reported like the failures of the call, which only fails the revisions of this batch
+            return {"taskDefinitions": [], "failures": [{"arn": arn, "reason": str(e)} for arn in task_definition_arns]}
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = tuple(
+            arn
+            for arn in (*state.plan.delete, *(arn for arn in state.plan.deregister if arn in state.deregistered))
+            if arn not in state.deleted
+        )
+        for start in range(0, len(pending), CHECKPOINT_INTERVAL):
+            task_definition_arns = pending[start : start + CHECKPOINT_INTERVAL]
+            for response in executor.map(
+                delete,
+                (
+                    task_definition_arns[batch_start : batch_start + MAX_DELETE_TASK_DEFINITIONS]
+                    for batch_start in range(0, len(task_definition_arns), MAX_DELETE_TASK_DEFINITIONS)
+                ),
+            ):
+                state.deleted.update(
+                    task_definition["taskDefinitionArn"] for task_definition in response["taskDefinitions"]
+                )
+                for failure in response["failures"]:
+                    click.echo(f"Failed to delete {failure['arn']}: {failure.get('reason')}")
+                    failed.append(failure["arn"])
+            state.save()
+            click.echo(f"Deleted {start + len(task_definition_arns)} of {len(pending)} task definitions")
+    return tuple(failed)
+
+
+def gc_task_definitions(
+    *,
+    ecs_client: BaseClient,
+    families: tuple[str, ...],
+    clusters: tuple[str, ...],
+    keep: int = DEFAULT_KEEP_REVISIONS,
+    dry_run: bool = False,
+    state_file: Optional[str] = None,
+    tagging_client: Optional[BaseClient] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> GcTaskDefinitionsOutput:
+    arguments = {"families": sorted(families), "clusters": sorted(clusters), "keep": keep}
+    if state_file and Path(state_file).exists():
+        state = TaskDefinitionGcState.load(state_file)
+        if state.arguments != arguments:
+            raise GcStateMismatchError(
+                f"{state_file} was planned for {state.arguments}, not {arguments}. Remove it to plan a new run",
+            )
+        click.echo(
+            f"Resuming from {state_file}: {len(state.deregistered)} task definitions deregistered, "
+            f"{len(state.deleted)} deleted",
+        )
+    else:
+        click.echo("Planning garbage collection...")
+        plan = plan_task_definition_gc(
+            ecs_client=ecs_client,
+            families=families,
+            deployed_task_definition_arns=get_deployed_task_definition_arns(ecs_client, clusters),
+            keep=keep,
+            tagging_client=tagging_client,
+        )
+        state = TaskDefinitionGcState(None if dry_run else state_file, arguments, plan)
+        state.save()
+
+    click.echo(
+        f"Keeping {len(state.plan.keep)} task definitions, deregistering {len(state.plan.deregister)} "
+        f"and deleting {len(state.plan.deregister) + len(state.plan.delete)}",
+    )
+    if dry_run:
+        for action, task_definition_arns in (("Deregister", state.plan.deregister), ("Delete", state.plan.delete)):
+            for task_definition_arn in task_definition_arns:
+                click.echo(f"{action} {task_definition_arn}")
+        return GcTaskDefinitionsOutput(kept=state.plan.keep, deregistered=(), deleted=(), failed=())
+
+    failed = (
+        *deregister_task_definitions(ecs_client, state, max_workers),
+        *delete_task_definitions(ecs_client, state, max_workers),
+    )
+    # A failed run keeps its state, so it can be resumed
+    if not failed:
+        state.remove()
+
+    return GcTaskDefinitionsOutput(
+        kept=state.plan.keep,
+        deregistered=tuple(arn for arn in state.plan.deregister if arn in state.deregistered),
+        deleted=tuple(arn for arn in (*state.plan.delete, *state.plan.deregister) if arn in state.deleted),
+        failed=failed,
+    )
@@ -1,14 +1,22 @@
 from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Iterator, Optional
 
 import click
 from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+from actions_helper.task_definition_cache import TaskDefinitionCache, describe_task_definition
+
+# Maximum number of ARNs accepted by the Resource Groups Tagging API `get_resources` call
+MAX_TAGGING_RESOURCE_ARNS = 100
 
 
 class NonSingleValueError(Exception):
     pass
 
 
-@dataclass
+@dataclass(frozen=True)
 class Tag:
     key: str
     value: str
@@ -25,50 +33,234 @@ def format_tags(task_definition_tags: str) -> tuple[Tag, ...]:
         )
 
 
+def get_task_definition_tags_in_bulk(
+    tagging_client: BaseClient,
+    task_definition_arns: tuple[str, ...],
+) -> dict[str, list[dict[str, str]]]:
+    tags_by_arn = {}
+    for start in range(0, len(task_definition_arns), MAX_TAGGING_RESOURCE_ARNS):
+        for resource in tagging_client.get_resources(
+            ResourceARNList=list(task_definition_arns[start : start + MAX_TAGGING_RESOURCE_ARNS]),
+        )["ResourceTagMappingList"]:
+            tags_by_arn[resource["ResourceARN"]] = [
+                {"key": tag["Key"], "value": tag["Value"]} for tag in resource["Tags"]
+            ]
+    return tags_by_arn
+
+
+def iter_task_definition_arn_pages(
+    ecs_client: BaseClient,
+    task_definition_family_prefix: str,
+    status: str = "ACTIVE",
+) -> Iterator[tuple[str, ...]]:
+    next_token = None
+    while True:
+        response = ecs_client.list_task_definitions(
+            familyPrefix=task_definition_family_prefix,
+            status=status,
+            sort="DESC",
+            **({"nextToken": next_token} if next_token else {}),
+        )
+        yield tuple(response["taskDefinitionArns"])
+        if not (next_token := response.get("nextToken")):
+            return
+
+
+def try_get_task_definition_tags_in_bulk(
+    tagging_client: BaseClient,
+    task_definition_arns: tuple[str, ...],
+) -> Optional[dict[str, list[dict[str, str]]]]:
+    # Returns None if the Tagging API is unavailable, e.g. because the role is not allowed to use it
+    try:
+        return get_task_definition_tags_in_bulk(tagging_client, task_definition_arns)
+    except (BotoCoreError, ClientError) as e:
+        click.echo(f"Bulk tag lookup unavailable, describing task definitions one by one: {e}")
+        return None
+
+
+def iter_indexed_task_definition_tags(
+    *,
+    ecs_client: BaseClient,
+    task_definition_family_prefix: str,
+    task_definition_cache: TaskDefinitionCache,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+) -> Iterator[tuple[str, list[dict[str, str]]]]:
+    # Listing the ACTIVE revisions checks the status of the indexed ones, so only the revisions missing from the tag
+    # index are looked up, usually the few registered since the previous scan
+    tag_index = task_definition_cache.get_tag_index(task_definition_family_prefix)
+    task_definition_arns = tuple(
+        islice(
+            chain.from_iterable(iter_task_definition_arn_pages(ecs_client, task_definition_family_prefix)),
+            max_revisions,
+        ),
+    )
+
+    unindexed_task_definition_arns = tag_index.get_unindexed_task_definition_arns(task_definition_arns)
+    tags_by_arn = {}
+    if tagging_client and unindexed_task_definition_arns:
+        tags_by_arn = try_get_task_definition_tags_in_bulk(tagging_client, unindexed_task_definition_arns) or {}
+    for task_definition_arn in unindexed_task_definition_arns:
+        # The Tagging API is eventually consistent, task definitions missing from its response are described
+        if task_definition_arn not in tags_by_arn:
+            tags_by_arn[task_definition_arn] = describe_task_definition(
+                ecs_client,
+                task_definition_arn,
+                task_definition_cache,
+                fresh_tags=True,
+            )["tags"]
+
+    if tag_index.update(
+        task_definition_arns,
+        tags_by_arn,
+        complete=max_revisions is None or len(task_definition_arns) < max_revisions,
+    ):
+        task_definition_cache.put_tag_index(task_definition_family_prefix, tag_index)
+
+    for task_definition_arn in task_definition_arns:
+        yield task_definition_arn, tag_index.tags_by_arn[task_definition_arn]
+
+
+def iter_active_task_definition_tags(
+    *,
+    ecs_client: BaseClient,
+    task_definition_family_prefix: str,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+) -> Iterator[tuple[str, list[dict[str, str]]]]:
+    # Yields the ACTIVE task definitions of a family with their tags, newest first. Without a cache for the tag index,
+    # pages are only listed and task definitions only described when the consumer asks for them, so callers can stop
+    # as soon as they have an answer.
+    if task_definition_cache:
+        yield from iter_indexed_task_definition_tags(
+            ecs_client=ecs_client,
+            task_definition_family_prefix=task_definition_family_prefix,
+            task_definition_cache=task_definition_cache,
+            tagging_client=tagging_client,
+            max_revisions=max_revisions,
+        )
+        return
+
+    remaining_revisions = max_revisions
+    for page in iter_task_definition_arn_pages(ecs_client, task_definition_family_prefix):
+        if remaining_revisions is not None:
+            page = page[:remaining_revisions]
+            remaining_revisions -= len(page)
+
+        tags_by_arn = {}
+        if tagging_client and page:
+            if (bulk_tags_by_arn := try_get_task_definition_tags_in_bulk(tagging_client, page)) is None:
+                tagging_client = None
+            else:
+                tags_by_arn = bulk_tags_by_arn
+
+        for task_definition_arn in page:
+            # The Tagging API is eventually consistent, task definitions missing from its response are described
+            yield (
+                task_definition_arn,
+                tags_by_arn[task_definition_arn]
+                if task_definition_arn in tags_by_arn
+                else describe_task_definition(ecs_client, task_definition_arn)["tags"],
+            )
+
+        if remaining_revisions == 0:
+            return
+
+
+class TaskDefinitionFamily:
+    # Scans the ACTIVE revisions of a task definition family at most once. Revisions are listed and described lazily
+    # and remembered, so any number of tag lookups on the same family share one scan.
+    def __init__(
+        self,
+        *,
+        ecs_client: BaseClient,
+        task_definition_family_prefix: str,
+        tagging_client: Optional[BaseClient] = None,
+        max_revisions: Optional[int] = None,
+        task_definition_cache: Optional[TaskDefinitionCache] = None,
+    ):
+        self.task_definition_family_prefix = task_definition_family_prefix
+        self._unscanned_task_definitions = iter_active_task_definition_tags(
+            ecs_client=ecs_client,
+            task_definition_family_prefix=task_definition_family_prefix,
+            tagging_client=tagging_client,
+            max_revisions=max_revisions,
+            task_definition_cache=task_definition_cache,
+        )
+        self._scanned_task_definitions: list[tuple[str, list[dict[str, str]]]] = []
+
+    def __iter__(self) -> Iterator[tuple[str, list[dict[str, str]]]]:
+        index = 0
+        while True:
+            if index == len(self._scanned_task_definitions):
+                if (task_definition := next(self._unscanned_task_definitions, None)) is None:
+                    return
+                self._scanned_task_definitions.append(task_definition)
+            yield self._scanned_task_definitions[index]
+            index += 1
+
+    def get_task_definition_tags(self, task_definition_arn: str) -> list[dict[str, str]]:
+        return next(revision_tags for arn, revision_tags in self if arn == task_definition_arn)
+
+    def get_active_task_definition_arn_by_tag(self, task_definition_tags: str, allow_initial_deployment: bool) -> str:
+        tags = format_tags(task_definition_tags)
+
+        active_task_definitions = iter(self)
+        newest_active_task_definitions = tuple(islice(active_task_definitions, 2))
+
+        # Allows for initial deployment of task definition.
+        # Requires that the only other active task definition was created by Pulumi,
+        # in order to prevent multiple deployed task definitions with different tags.
+        if allow_initial_deployment and len(newest_active_task_definitions) == 1:
+            ((_, only_revision_tags),) = newest_active_task_definitions
+            if {"key": "created_by", "value": "Pulumi"} not in only_revision_tags:
+                raise ValueError("Expected initial deployment to only have Pulumi task definition")
+            return ""
+
+        # A second match already proves that the tags are ambiguous, so the scan stops there
+        tagged_active_task_definitions = tuple(
+            islice(
+                (
+                    task_definition_arn
+                    for task_definition_arn, revision_tags in chain(
+                        newest_active_task_definitions,
+                        active_task_definitions,
+                    )
+                    if all({"key": tag.key, "value": tag.value} in revision_tags for tag in tags)
+                ),
+                2,
+            ),
+        )
+
+        try:
+            (task_definition,) = tagged_active_task_definitions
+            click.echo(task_definition)
+            return task_definition
+        except ValueError as e:
+            raise NonSingleValueError(
+                f"Expected exactly one active task definition with tags {task_definition_tags}. "
+                f"Found: {tagged_active_task_definitions}",
+            ) from e
+
+
 def get_active_task_definition_arn_by_tag(
     *,
     ecs_client: BaseClient,
     task_definition_family_prefix: str,
     task_definition_tags: str,
     allow_initial_deployment: bool,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
 ) -> str:
-    tags = format_tags(task_definition_tags)
-
-    active_task_definition_arns = ecs_client.list_task_definitions(
-        familyPrefix=task_definition_family_prefix,
-        status="ACTIVE",
-        sort="DESC",
-    )["taskDefinitionArns"]
-
-    tagged_active_task_definitions = tuple(
-        task_definition["taskDefinition"]["taskDefinitionArn"]
-        for task_definition_arn in active_task_definition_arns
-        if (
-            task_definition := ecs_client.describe_task_definition(
-                taskDefinition=task_definition_arn,
-                include=["TAGS"],
-            )
-        )
-        and all({"key": tag.key, "value": tag.value} in task_definition["tags"] for tag in tags)
+    return TaskDefinitionFamily(
+        ecs_client=ecs_client,
+        task_definition_family_prefix=task_definition_family_prefix,
+        tagging_client=tagging_client,
+        max_revisions=max_revisions,
+        task_definition_cache=task_definition_cache,
+    ).get_active_task_definition_arn_by_tag(
+        task_definition_tags=task_definition_tags,
+        allow_initial_deployment=allow_initial_deployment,
     )
-
-    # Allows for initial deployment of task definition.
-    # Requires that the only other active task definition was created by Pulumi,
-    # in order to prevent multiple deployed task definitions with different tags.
-    if allow_initial_deployment and len(active_task_definition_arns) == 1:
-        if {"key": "created_by", "value": "Pulumi"} not in ecs_client.describe_task_definition(
-            taskDefinition=active_task_definition_arns[0],
-            include=["TAGS"],
-        )["tags"]:
-            raise ValueError("Expected initial deployment to only have Pulumi task definition")
-        return ""
-
-    try:
-        (task_definition,) = tagged_active_task_definitions
-        click.echo(task_definition)
-        return task_definition
-    except ValueError as e:
-        raise NonSingleValueError(
-            f"Expected exactly one active task definition with tags {task_definition_tags}. "
-            f"Found: {tagged_active_task_definitions}",
-        ) from e
@@ -1,19 +1,71 @@
+import time
+from typing import Any
+
 import click
 from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+from actions_helper.outputs import ImageOutput
+
+# The image is usually pushed by a job running right before the deployment, which may not have finished yet
+IMAGE_WAIT_TIMEOUT = 600  # seconds
+MIN_IMAGE_POLL_DELAY = 2  # seconds
+MAX_IMAGE_POLL_DELAY = 15  # seconds
+IMAGE_POLL_BACKOFF_FACTOR = 1.5
+# DNS suffixes of the partitions which differ from the default one
+PARTITION_DNS_SUFFIXES = {"aws-cn": "amazonaws.com.cn"}
+
+
+class ImageNotFoundError(Exception):
+    pass
+
+
+def get_repository_uri(ecr_client: BaseClient, registry_id: str, ecr_repository: str) -> str:
+    dns_suffix = PARTITION_DNS_SUFFIXES.get(ecr_client.meta.partition, "amazonaws.com")
+    return f"{registry_id}.dkr.ecr.{ecr_client.meta.region_name}.{dns_suffix}/{ecr_repository}"
+
+
+def wait_for_image(
+    ecr_client: BaseClient,
+    ecr_repository: str,
+    tag: str,
+    timeout: float = IMAGE_WAIT_TIMEOUT,
+) -> dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    delay = MIN_IMAGE_POLL_DELAY
+
+    while True:
+        try:
+            return ecr_client.describe_images(
+                repositoryName=ecr_repository,
+                imageIds=[{"imageTag": tag}],
+            )["imageDetails"][0]
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ImageNotFoundException":
+                raise
+
+        if time.monotonic() + delay > deadline:
+            raise ImageNotFoundError(f"Image {ecr_repository}:{tag} was not pushed within {timeout} seconds")
+        click.echo(f"Image {ecr_repository}:{tag} not found yet, retrying in {delay:.0f} seconds...")
+        time.sleep(delay)
+        delay = min(delay * IMAGE_POLL_BACKOFF_FACTOR, MAX_IMAGE_POLL_DELAY)
 
 
-def get_image_uri(ecr_client: BaseClient, ecr_repository: str, tag: str) -> str:
-    (image_tag,) = ecr_client.describe_images(
-        repositoryName=ecr_repository,
-        imageIds=[{"imageTag": tag}],
-    )["imageDetails"][0]["imageTags"]
+def get_image(
+    ecr_client: BaseClient,
+    ecr_repository: str,
+    tag: str,
+    pin_digest: bool = False,
+    timeout: float = IMAGE_WAIT_TIMEOUT,
+) -> ImageOutput:
+    image_details = wait_for_image(ecr_client=ecr_client, ecr_repository=ecr_repository, tag=tag, timeout=timeout)
 
-    repository_uri = ecr_client.describe_repositories(
-        repositoryNames=[ecr_repository],
-    )["repositories"][0]["repositoryUri"]
+    # The repository URI only depends on the registry, region and repository, which saves a `describe_repositories` call
+    repository_uri = get_repository_uri(ecr_client, image_details["registryId"], ecr_repository)
 
-    image_uri = f"{repository_uri}:{image_tag}"
+    # A digest always refers to the same image, while the tag could be moved to another image during the deployment
+    image_uri = f"{repository_uri}@{image_details['imageDigest']}" if pin_digest else f"{repository_uri}:{tag}"
 
     click.echo(f"{image_uri=}")
 
-    return image_uri
+    return ImageOutput(image_uri=image_uri, image_digest=image_details["imageDigest"])
@@ -0,0 +1,131 @@
+from typing import Any, Optional
+
+from botocore.client import BaseClient
+
+from actions_helper.commands.create_task_definition import (
+    KEYS_TO_DELETE_FROM_TASK_DEFINITION,
+    prepare_task_definition,
+)
+from actions_helper.commands.deregister_task_definition import get_primary_deployment_task_definition_arn
+from actions_helper.commands.wait_for_service_stable import describe_service
+from actions_helper.outputs import DeploymentPlan, PreparedTaskDefinition, TaskDefinitionPlan
+from actions_helper.task_definition_cache import TaskDefinitionCache, describe_task_definition
+from actions_helper.task_graph import TaskGraph
+
+
+def diff_task_definitions(current: Any, planned: Any, path: str = "") -> tuple[dict[str, Any], ...]:
+    # Nested objects and lists of the same length are compared element by element, anything else as a whole
+    if isinstance(current, dict) and isinstance(planned, dict):
+        changes = []
+        for key in sorted(current.keys() | planned.keys()):
+            key_path = f"{path}.{key}" if path else key
+            if key not in planned:
+                changes.append({"path": key_path, "action": "remove", "current": current[key]})
+            elif key not in current:
+                changes.append({"path": key_path, "action": "add", "planned": planned[key]})
+            else:
+                changes.extend(diff_task_definitions(current[key], planned[key], key_path))
+        return tuple(changes)
+
+    if isinstance(current, list) and isinstance(planned, list) and len(current) == len(planned):
+        return tuple(
+            change
+            for index, (current_item, planned_item) in enumerate(zip(current, planned))
+            for change in diff_task_definitions(current_item, planned_item, f"{path}[{index}]")
+        )
+
+    return () if current == planned else ({"path": path, "action": "change", "current": current, "planned": planned},)
+
+
+def plan_task_definition(
+    *,
+    ecs_client: BaseClient,
+    prepared_task_definition: PreparedTaskDefinition,
+    current_task_definition_arn: Optional[str] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+) -> TaskDefinitionPlan:
+    # Task definitions which do not run as a service are compared to the revision of the previous deployment
+    current_task_definition_arn = current_task_definition_arn or prepared_task_definition.previous_task_definition_arn
+    current_task_definition = {}
+    if current_task_definition_arn:
+        current_task_definition = {
+            key: value
+            for key, value in describe_task_definition(
+                ecs_client,
+                current_task_definition_arn,
+                task_definition_cache,
+            )["taskDefinition"].items()
+            if key not in KEYS_TO_DELETE_FROM_TASK_DEFINITION
+        }
+
+    return TaskDefinitionPlan(
+        family=prepared_task_definition.application_id,
+        current_task_definition_arn=current_task_definition_arn,
+        changes=diff_task_definitions(current_task_definition, prepared_task_definition.task_definition),
+    )
+
+
+def plan_deployment(
+    *,
+    ecs_client: BaseClient,
+    application: str,
+    environment: str,
+    image_uri: str,
+    deployment_tag: str,
+    run_preflight: bool,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+) -> DeploymentPlan:
+    # Only reads. The lookups of all families run concurrently with the description of the service, which only decides
+    # what the production task definition is compared to.
+    service = f"{application}-{environment}"
+    families = {
+        "local": f"{application}-local-exec-{environment}",
+        "production": service,
+        **({"preflight": f"{application}-preflight-{environment}"} if run_preflight else {}),
+    }
+
+    def prepare_step(application_id: str):
+        # Performs the same lookups as `create_task_definition`, so the plan fails where the deployment would fail
+        return lambda: prepare_task_definition(
+            ecs_client=ecs_client,
+            application_id=application_id,
+            image_uri=image_uri,
+            deployment_tag=deployment_tag,
+            tagging_client=tagging_client,
+            max_revisions=max_revisions,
+            task_definition_cache=task_definition_cache,
+        )
+
+    def plan_step(prepared_step: str):
+        def step(primary_task_definition_arn: Optional[str] = None, **prepared_task_definitions) -> TaskDefinitionPlan:
+            return plan_task_definition(
+                ecs_client=ecs_client,
+                prepared_task_definition=prepared_task_definitions[prepared_step],
+                current_task_definition_arn=primary_task_definition_arn,
+                task_definition_cache=task_definition_cache,
+            )
+
+        return step
+
+    graph = TaskGraph()
+    graph.add(
+        "primary_task_definition_arn",
+        lambda: get_primary_deployment_task_definition_arn(describe_service(ecs_client, environment, service)),
+    )
+    for name, application_id in families.items():
+        graph.add(f"prepared_{name}", prepare_step(application_id))
+    for name in families:
+        graph.add(
+            name,
+            plan_step(f"prepared_{name}"),
+            depends_on=(f"prepared_{name}", *(("primary_task_definition_arn",) if name == "production" else ())),
+        )
+    graph.run()
+
+    return DeploymentPlan(
+        service=service,
+        image_uri=image_uri,
+        task_definitions=tuple(graph.results[name] for name in families),
+    )
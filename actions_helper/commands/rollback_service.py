@@ -0,0 +1,36 @@
+import time
+from typing import Optional
+
+import click
+from botocore.client import BaseClient
+
+from actions_helper.commands.wait_for_service_stable import wait_for_service_stable
+from actions_helper.poller import BatchPoller
+from actions_helper.service_snapshot import ServiceSnapshot
+
+
+def rollback_service(
+    ecs_client: BaseClient,
+    cluster: str,
+    service: str,
+    task_definition_arn: str,
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
+) -> float:
+    # Returns the time to recovery, from the start of the rollback until the service is stable again, in seconds
+    start = time.monotonic()
+    click.echo(f"Rolling back service {service} to {task_definition_arn}...")
+    if service_snapshot:
+        service_snapshot.invalidate()
+    ecs_client.update_service(cluster=cluster, service=service, taskDefinition=task_definition_arn)
+    wait_for_service_stable(
+        ecs_client=ecs_client,
+        cluster=cluster,
+        service=service,
+        task_definition_arn=task_definition_arn,
+        poller=poller,
+        service_snapshot=service_snapshot,
+    )
+    time_to_recovery = time.monotonic() - start
+    click.echo(f"Service {service} recovered on {task_definition_arn} after {time_to_recovery:.0f} seconds")
+    return time_to_recovery
@@ -1,8 +1,16 @@
+import contextlib
+from typing import Optional
+
 import click
 from botocore.client import BaseClient
 
+from actions_helper.commands.follow_task_logs import follow_task_logs, get_task_log_stream
+from actions_helper.commands.wait_for_service_stable import describe_service
 from actions_helper.commands.wait_for_task_stopped import wait_for_task_stopped
 from actions_helper.outputs import RunPreflightOutput
+from actions_helper.poller import BatchPoller
+from actions_helper.service_snapshot import ServiceSnapshot
+from actions_helper.task_definition_cache import describe_task_definition
 from actions_helper.utils import set_error
 
 
@@ -11,11 +19,14 @@ def run_preflight_container(
     cluster: str,
     service: str,
     latest_task_definition_arn: str,
+    logs_client: Optional[BaseClient] = None,
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
 ) -> RunPreflightOutput:
-    network_config = ecs_client.describe_services(
-        cluster=cluster,
-        services=[service],
-    )["services"][0]["networkConfiguration"]["awsvpcConfiguration"]
+    # Only the network configuration is used
+    network_config = describe_service(ecs_client, cluster, service, poller, service_snapshot, static=True)[
+        "networkConfiguration"
+    ]["awsvpcConfiguration"]
 
     click.echo("Running preflight task...")
     task_arn = ecs_client.run_task(
@@ -32,7 +43,16 @@ def run_preflight_container(
         taskDefinition=latest_task_definition_arn,
     )["tasks"][0]["taskArn"]
 
-    wait_for_task_stopped(ecs_client=ecs_client, cluster=cluster, task=task_arn)
+    log_stream = (
+        get_task_log_stream(
+            describe_task_definition(ecs_client, latest_task_definition_arn)["taskDefinition"],
+            task_arn,
+        )
+        if logs_client
+        else None
+    )
+    with follow_task_logs(logs_client, log_stream) if log_stream else contextlib.nullcontext():
+        wait_for_task_stopped(ecs_client=ecs_client, cluster=cluster, task=task_arn, poller=poller)
 
     (stopped_preflight_container,) = ecs_client.describe_tasks(
         cluster=cluster,
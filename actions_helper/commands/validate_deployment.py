@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from botocore.client import BaseClient
+
+from actions_helper.commands.create_task_definition import prepare_task_definition
+from actions_helper.commands.wait_for_service_stable import describe_service
+from actions_helper.outputs import PreparedTaskDefinition
+from actions_helper.poller import BatchPoller
+from actions_helper.service_snapshot import ServiceSnapshot
+from actions_helper.task_definition_cache import TaskDefinitionCache
+from actions_helper.utils import report_error, set_error
+
+
+class ServiceNotActiveError(Exception):
+    pass
+
+
+def get_task_definition_families(application: str, environment: str, run_preflight: bool) -> tuple[str, ...]:
+    return (
+        f"{application}-local-exec-{environment}",
+        f"{application}-{environment}",
+        *((f"{application}-preflight-{environment}",) if run_preflight else ()),
+    )
+
+
+def check_service_active(service_description: dict[str, Any], service: str):
+    # Deleted services are still described for a while
+    if service_description["status"] != "ACTIVE":
+        raise ServiceNotActiveError(f"Service {service} is {service_description['status']}")
+
+
+def get_outcome(function: Callable[[], Any]) -> Any:
+    try:
+        return function()
+    except (Exception, SystemExit) as e:
+        return e
+
+
+def check_validation_outcomes(service: str, outcomes: dict[str, Any]) -> dict[str, Any]:
+    # Reports every failed check instead of only the first one, and fails before anything was registered. Checks which
+    # exited through `set_error`, like the rendering of a task definition, reported their problem already.
+    failed_checks = tuple(check for check, outcome in outcomes.items() if isinstance(outcome, BaseException))
+    for check in failed_checks:
+        if not isinstance(outcomes[check], SystemExit):
+            report_error(f"Validation of {check} failed: {outcomes[check]}")
+    if failed_checks:
+        set_error(f"Validation of the deployment of {service} failed for {', '.join(failed_checks)}")
+    return outcomes
+
+
+def validate_deployment(
+    *,
+    ecs_client: BaseClient,
+    application: str,
+    environment: str,
+    image_uri: str,
+    deployment_tag: str,
+    run_preflight: bool,
+    tagging_client: Optional[BaseClient] = None,
+    max_revisions: Optional[int] = None,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
+    image_digest: Optional[str] = None,
+) -> dict[str, PreparedTaskDefinition]:
+    # Makes the read-only lookups of all task definition families and checks the service concurrently. The deployment
+    # registers the prepared task definitions afterwards, so the families are only scanned once.
+    service = f"{application}-{environment}"
+
+    def prepare_step(application_id: str):
+        return lambda: prepare_task_definition(
+            ecs_client=ecs_client,
+            application_id=application_id,
+            image_uri=image_uri,
+            deployment_tag=deployment_tag,
+            tagging_client=tagging_client,
+            max_revisions=max_revisions,
+            task_definition_cache=task_definition_cache,
+            image_digest=image_digest,
+        )
+
+    families = get_task_definition_families(application, environment, run_preflight)
+    checks = {
+        f"service {service}": lambda: check_service_active(
+            describe_service(ecs_client, environment, service, poller, service_snapshot),
+            service,
+        ),
+        **{f"task definition family {application_id}": prepare_step(application_id) for application_id in families},
+    }
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        outcomes = check_validation_outcomes(service, dict(zip(checks, executor.map(get_outcome, checks.values()))))
+
+    return {application_id: outcomes[f"task definition family {application_id}"] for application_id in families}
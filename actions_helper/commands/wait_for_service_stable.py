@@ -0,0 +1,158 @@
+import time
+from typing import Any, Optional
+
+import click
+from botocore.client import BaseClient
+
+from actions_helper.poller import BatchPoller, DescribeFailedError
+from actions_helper.service_snapshot import ServiceSnapshot
+
+# Note: The timeout must not be shorter than the workflow timeout!
+SERVICE_STABLE_TIMEOUT = 2880  # seconds
+# Poll quickly while the deployment makes progress and back off while it does not
+MIN_POLL_DELAY = 2  # seconds
+MAX_POLL_DELAY = 10  # seconds
+POLL_BACKOFF_FACTOR = 1.5
+# Total number of tasks of the deployment that failed to start after which it is considered failed
+MAX_FAILED_TASKS = 3
+# Service event messages which show that the deployment cannot succeed
+FAILED_DEPLOYMENT_EVENT_MESSAGES = (
+    "deployment failed",
+    "rolling back to deployment",
+    "unable to place a task",
+    "unable to consistently start tasks successfully",
+)
+
+
+class DeploymentFailedError(Exception):
+    pass
+
+
+class ServiceStabilityTimeoutError(Exception):
+    pass
+
+
+def get_deployment(service: dict[str, Any], task_definition_arn: str) -> Optional[dict[str, Any]]:
+    # Newer deployments come first, so the deployment started by this run wins over older ones with the same revision
+    return next(
+        (deployment for deployment in service["deployments"] if deployment["taskDefinition"] == task_definition_arn),
+        None,
+    )
+
+
+def is_deployment_stable(service: dict[str, Any], deployment: dict[str, Any]) -> bool:
+    # The rollout state is only reported for services using the ECS deployment controller
+    if "rolloutState" in deployment:
+        return deployment["rolloutState"] == "COMPLETED"
+    return (
+        len(service["deployments"]) == 1
+        and deployment["runningCount"] == deployment["desiredCount"]
+        and deployment["pendingCount"] == 0
+    )
+
+
+def get_new_events(
+    service: dict[str, Any],
+    deployment: dict[str, Any],
+    seen_event_ids: set[str],
+) -> tuple[dict[str, Any], ...]:
+    # Events are returned newest first, reverse them to report in chronological order
+    new_events = tuple(
+        event
+        for event in reversed(service.get("events", ()))
+        if event["id"] not in seen_event_ids and event["createdAt"] >= deployment["createdAt"]
+    )
+    seen_event_ids.update(event["id"] for event in new_events)
+    return new_events
+
+
+def check_deployment_failed(deployment: dict[str, Any], new_events: tuple[dict[str, Any], ...], max_failed_tasks: int):
+    if deployment.get("rolloutState") == "FAILED":
+        raise DeploymentFailedError(f"Deployment {deployment['id']} failed: {deployment.get('rolloutStateReason')}")
+
+    if deployment.get("failedTasks", 0) >= max_failed_tasks:
+        raise DeploymentFailedError(f"Deployment {deployment['id']} failed to start {deployment['failedTasks']} tasks")
+
+    for event in new_events:
+        if any(message in event["message"] for message in FAILED_DEPLOYMENT_EVENT_MESSAGES):
+            raise DeploymentFailedError(f"Deployment {deployment['id']} failed: {event['message']}")
+
+
+def get_service_description(response: dict[str, Any], service: str) -> dict[str, Any]:
+    # Missing services are reported as failures, not errors, like by the poller
+    if not response["services"]:
+        raise DescribeFailedError(f"Describing {service} failed: {response['failures'][0]['reason']}")
+    return response["services"][0]
+
+
+def describe_service(
+    ecs_client: BaseClient,
+    cluster: str,
+    service: str,
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
+    static: bool = False,
+) -> dict[str, Any]:
+    # With a snapshot, the service is only described if the snapshot cannot answer, see `ServiceSnapshot`
+    if service_snapshot and (service_description := service_snapshot.get(static=static)):
+        return service_description
+
+    if poller:
+        service_description = poller.describe_service(cluster, service).result()
+    else:
+        service_description = get_service_description(
+            ecs_client.describe_services(cluster=cluster, services=[service]),
+            service,
+        )
+    if service_snapshot:
+        service_snapshot.update(service_description)
+    return service_description
+
+
+def wait_for_service_stable(
+    ecs_client: BaseClient,
+    cluster: str,
+    service: str,
+    task_definition_arn: str,
+    timeout: float = SERVICE_STABLE_TIMEOUT,
+    max_failed_tasks: int = MAX_FAILED_TASKS,
+    poller: Optional[BatchPoller] = None,
+    service_snapshot: Optional[ServiceSnapshot] = None,
+) -> dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    delay = MIN_POLL_DELAY
+    previous_progress = None
+    seen_event_ids = set()
+
+    while True:
+        service_description = describe_service(ecs_client, cluster, service, poller)
+        if service_snapshot:
+            service_snapshot.update(service_description)
+        if not (deployment := get_deployment(service_description, task_definition_arn)):
+            raise DeploymentFailedError(f"No deployment of {task_definition_arn} found for service {service}")
+
+        progress = (
+            deployment.get("rolloutState"),
+            deployment["runningCount"],
+            deployment["pendingCount"],
+            deployment["desiredCount"],
+        )
+        click.echo(
+            f"Deployment {deployment['id']}: rolloutState={progress[0]}, "
+            f"running={progress[1]}, pending={progress[2]}, desired={progress[3]}",
+        )
+
+        new_events = get_new_events(service_description, deployment, seen_event_ids)
+        for event in new_events:
+            click.echo(f"{event['createdAt']} {event['message']}")
+        check_deployment_failed(deployment, new_events, max_failed_tasks)
+
+        if is_deployment_stable(service_description, deployment):
+            return deployment
+
+        delay = MIN_POLL_DELAY if progress != previous_progress else min(delay * POLL_BACKOFF_FACTOR, MAX_POLL_DELAY)
+        previous_progress = progress
+
+        if time.monotonic() + delay > deadline:
+            raise ServiceStabilityTimeoutError(f"Service {service} did not become stable within {timeout} seconds")
+        time.sleep(delay)
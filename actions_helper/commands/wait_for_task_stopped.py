@@ -1,7 +1,34 @@
+import time
+from typing import Optional
+
 from botocore.client import BaseClient
 
+from actions_helper.poller import BatchPoller
+
+# Note: The timeout (= delay * max_attempts) must not be shorter than the workflow timeout!
+TASK_STOPPED_POLL_DELAY = 2  # seconds to wait between retries
+TASK_STOPPED_MAX_ATTEMPTS = 1440
+
+
+class TaskStoppedTimeoutError(Exception):
+    pass
+
+
+def get_task_stopped_timeout_error(task: str) -> TaskStoppedTimeoutError:
+    return TaskStoppedTimeoutError(
+        f"Task {task} did not stop within {TASK_STOPPED_POLL_DELAY * TASK_STOPPED_MAX_ATTEMPTS} seconds",
+    )
+
+
+def wait_for_task_stopped(ecs_client: BaseClient, cluster: str, task: str, poller: Optional[BatchPoller] = None):
+    if poller:
+        # Polls like the waiter, but shares the describes with the other waits of the poller
+        for _ in range(TASK_STOPPED_MAX_ATTEMPTS):
+            if poller.describe_task(cluster, task).result()["lastStatus"] == "STOPPED":
+                return
+            time.sleep(TASK_STOPPED_POLL_DELAY)
+        raise get_task_stopped_timeout_error(task)
 
-def wait_for_task_stopped(ecs_client: BaseClient, cluster: str, task: str):
     # Using Boto3 instead CLI in order to control delay and max attempts, see
     # https://docs.aws.amazon.com/cli/latest/reference/ecs/wait/tasks-stopped.html and
     # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ecs/waiter/TasksStopped.html
@@ -9,8 +36,7 @@ def wait_for_task_stopped(ecs_client: BaseClient, cluster: str, task: str):
         cluster=cluster,
         tasks=(task,),
         WaiterConfig={
-            # Note: The timeout (= delay * max_attempts) must not be shorter than the workflow timeout!
-            "Delay": 2,  # seconds to wait between retries
-            "MaxAttempts": 1440,
+            "Delay": TASK_STOPPED_POLL_DELAY,
+            "MaxAttempts": TASK_STOPPED_MAX_ATTEMPTS,
         },
     )
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from botocore.client import BaseClient
+
+THROTTLING_ERROR_CODES = (
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+)
+
+
+@dataclass(frozen=True)
+class Phase:
+    name: str
+    start: float  # seconds since the instrumentation was created
+    duration: float  # seconds
+    succeeded: bool
+
+
+# Times the phases of a command and counts the AWS calls of instrumented clients by operation. Calls count the API calls
+# made by the code, attempts include the retries of botocore and throttles count the throttled attempts. Waits sum up
+# the seconds the attempts were held back by the rate limiter.
+class Instrumentation:
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: list[Phase] = []
+        self.calls: Counter[str] = Counter()
+        self.attempts: Counter[str] = Counter()
+        self.throttles: Counter[str] = Counter()
+        self.rate_limit_waits: Counter[str] = Counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            with self._lock:
+                self.phases.append(
+                    Phase(
+                        name=name,
+                        start=round(start - self._start, 3),
+                        duration=round(time.perf_counter() - start, 3),
+                        succeeded=succeeded,
+                    ),
+                )
+
+    def instrument(self, client: BaseClient) -> BaseClient:
+        client.meta.events.register("before-call", self._on_before_call)
+        client.meta.events.register("request-created", self._on_request_created)
+        client.meta.events.register("needs-retry", self._on_needs_retry)
+        return client
+
+    def _count(self, counter: Counter[str], event_name: str):
+        # Event names look like "before-call.ecs.ListTaskDefinitions"
+        _, service, operation = event_name.split(".", 2)
+        with self._lock:
+            counter[f"{service}.{operation}"] += 1
+
+    def _on_before_call(self, event_name: str, **kwargs):
+        self._count(self.calls, event_name)
+
+    def _on_request_created(self, event_name: str, **kwargs):
+        self._count(self.attempts, event_name)
+
+    def _on_needs_retry(self, event_name: str, response: Optional[tuple[Any, dict[str, Any]]] = None, **kwargs):
+        if response and response[1].get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+            self._count(self.throttles, event_name)
+
+    def record_rate_limit_wait(self, operation: str, seconds: float):
+        with self._lock:
+            self.rate_limit_waits[operation] += seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "duration": round(time.perf_counter() - self._start, 3),
+                "phases": [asdict(phase) for phase in self.phases],
+                "api_calls": {
+                    operation: {
+                        "calls": self.calls[operation],
+                        "retries": self.attempts[operation] - self.calls[operation],
+                        "throttles": self.throttles[operation],
+                        "rate_limit_wait": round(self.rate_limit_waits[operation], 3),
+                    }
+                    for operation in sorted(self.calls)
+                },
+            }
+
+    def report(self, metrics_file: Optional[str] = None):
+        metrics = self.to_dict()
+        metrics_json = json.dumps(metrics)
+
+        if metrics_file:
+            Path(metrics_file).write_text(metrics_json)
+
+        if github_output := os.environ.get("GITHUB_OUTPUT"):
+            with Path(github_output).open("a") as file:
+                file.write(f"metrics={metrics_json}\n")
+
+        if github_step_summary := os.environ.get("GITHUB_STEP_SUMMARY"):
+            with Path(github_step_summary).open("a") as file:
+                file.write(format_summary(metrics))
+
+
+def format_summary(metrics: dict[str, Any]) -> str:
+    return "\n".join(
+        (
+            f"### Deployment metrics ({metrics['duration']:.1f}s)",
+            "",
+            "| Phase | Start (s) | Duration (s) | Succeeded |",
+            "| --- | ---: | ---: | --- |",
+            *(
+                f"| {phase['name']} | {phase['start']:.1f} | {phase['duration']:.1f} | {phase['succeeded']} |"
+                for phase in metrics["phases"]
+            ),
+            "",
+            "| AWS operation | Calls | Retries | Throttles | Rate limit wait (s) |",
+            "| --- | ---: | ---: | ---: | ---: |",
+            *(
+                f"| {operation} | {counts['calls']} | {counts['retries']} | {counts['throttles']} "
+                f"| {counts['rate_limit_wait']:.1f} |"
+                for operation, counts in metrics["api_calls"].items()
+            ),
+            "",
+            "",
+        ),
+    )
@@ -1,12 +1,23 @@
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from dataclasses import asdict, dataclass
 from enum import StrEnum, auto
+from typing import Optional, TextIO
 
-import boto3
 import click
 
-from actions_helper.commands.create_task_definition import create_task_definition
-from actions_helper.commands.deregister_task_definition import deregister_task_definition
-from actions_helper.commands.get_image_uri import get_image_uri
-from actions_helper.commands.run_preflight import run_preflight_container
+from actions_helper.outputs import DeployServiceOutput
+from actions_helper.utils import set_error
+
+# boto3 and the command modules are imported by the commands that need them, which keeps the CLI start-up fast
+
+# Defaults of the command modules, which are not imported to keep the start-up fast
+DEFAULT_API_RATE_LIMIT = 10.0  # requests per second, see actions_helper.rate_limiter.DEFAULT_RATE
+DEFAULT_IMAGE_WAIT_TIMEOUT = 600  # seconds, see actions_helper.commands.get_image_uri.IMAGE_WAIT_TIMEOUT
+DEFAULT_GC_KEEP_REVISIONS = 5  # see actions_helper.commands.gc_task_definitions.DEFAULT_KEEP_REVISIONS
+DEFAULT_GC_MAX_WORKERS = 8  # see actions_helper.commands.gc_task_definitions.DEFAULT_MAX_WORKERS
 
 
 class Environment(StrEnum):
@@ -15,11 +26,26 @@ class Environment(StrEnum):
     LIVE = auto()
 
 
+@dataclass(frozen=True)
+class ServiceDeployment:
+    application: str
+    environment: Environment
+    desired_count: Optional[int]
+    run_preflight: bool
+    fast_rollout: bool
+
+
 @click.group()
 def cli():
     pass  # pragma: no cover
 
 
+def check_fast_rollout(environment: Environment):
+    # Live services keep rolling out in waves at full capacity
+    if environment == Environment.LIVE:
+        raise RuntimeError("Fast rollout not allowed for live environment")
+
+
 @cli.command(
     name="ecs-deploy",
     short_help="Deploy production image to AWS ECS",
@@ -29,96 +55,408 @@ def cli():
 @click.option("--ecr-repository", envvar="ECR_REPOSITORY", type=str)
 @click.option("--deployment-tag", envvar="DEPLOYMENT_TAG", type=str)
 @click.option("--image-tag", envvar="IMAGE_TAG", type=str)
+@click.option(
+    "--pin-image-digest",
+    envvar="PIN_IMAGE_DIGEST",
+    type=bool,
+    default=False,
+    help="Deploy the image by its digest instead of its tag, so a moved tag cannot change the deployed image",
+)
+@click.option(
+    "--image-wait-timeout",
+    type=click.IntRange(min=0),
+    default=DEFAULT_IMAGE_WAIT_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for the image tag to be pushed",
+)
 @click.option("--run-preflight", envvar="RUN_PREFLIGHT", type=bool)
 @click.option("--desired-count", type=int)
 @click.option("--aws-region", envvar="AWS_DEFAULT_REGION", type=str)
+@click.option(
+    "--max-task-definition-revisions",
+    # The Pulumi revision and the one of the previous deployment have to be found
+    type=click.IntRange(min=2),
+    help="Only the newest N active revisions of each task definition family are searched for tags",
+)
+@click.option(
+    "--metrics-file",
+    envvar="METRICS_FILE",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write phase timings and AWS call counts as JSON to this file, "
+    "they are also written to $GITHUB_OUTPUT and $GITHUB_STEP_SUMMARY if set",
+)
+@click.option(
+    "--api-rate-limit",
+    envvar="API_RATE_LIMIT",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_API_RATE_LIMIT,
+    show_default=True,
+    help="Maximum ECS and ECR requests per second and API operation, 0 disables the rate limiting",
+)
+@click.option(
+    "--rollback-on-failure",
+    envvar="ROLLBACK_ON_FAILURE",
+    type=bool,
+    default=False,
+    help="Restore the previous task definition right away if the service does not become stable",
+)
+@click.option(
+    "--task-definition-cache-dir",
+    envvar="TASK_DEFINITION_CACHE_DIR",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache described task definition revisions in this directory, so later runs only describe new revisions",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="Only print the changes of the task definitions as JSON to stdout, without registering or deploying anything",
+)
+@click.option(
+    "--fast-rollout",
+    envvar="FAST_ROLLOUT",
+    type=bool,
+    default=False,
+    help="Replace all tasks at once and stop the deployment once tasks keep failing to start, "
+    "not allowed for the live environment",
+)
 def cmd_ecs_deploy(
     environment: Environment,
     allow_feature_branch_deployment: bool,
     ecr_repository: str,
     deployment_tag: str,
     image_tag: str,
+    pin_image_digest: bool,
+    image_wait_timeout: int,
     run_preflight: bool,
     desired_count: str,
     aws_region: str,
+    max_task_definition_revisions: Optional[int],
+    metrics_file: Optional[str],
+    api_rate_limit: float,
+    task_definition_cache_dir: Optional[str],
+    rollback_on_failure: bool,
+    plan: bool,
+    fast_rollout: bool,
 ):
     if allow_feature_branch_deployment and environment != Environment.DEV:
         raise RuntimeError("Deployments from feature branch only allowed for dev environment")
+    if fast_rollout:
+        check_fast_rollout(environment)
+
+    from actions_helper.clients import ClientFactory
+    from actions_helper.commands.deploy_service import deploy_service
+    from actions_helper.commands.get_image_uri import get_image
+    from actions_helper.commands.plan_deployment import plan_deployment
+    from actions_helper.instrumentation import Instrumentation
+    from actions_helper.poller import BatchPoller
+    from actions_helper.rate_limiter import RateLimiter
+    from actions_helper.task_definition_cache import TaskDefinitionCache
+
+    instrumentation = Instrumentation()
+    rate_limiter = RateLimiter(rate=api_rate_limit, instrumentation=instrumentation) if api_rate_limit else None
+    task_definition_cache = TaskDefinitionCache(task_definition_cache_dir) if task_definition_cache_dir else None
+    clients = ClientFactory(region_name=aws_region, instrumentation=instrumentation, rate_limiter=rate_limiter)
 
-    ecs_client = boto3.Session(region_name=aws_region).client("ecs")
-    ecr_client = boto3.Session(region_name=aws_region).client("ecr")
-    service = f"{ecr_repository}-{environment}"
-    production_task_definition = local_task_definition = preflight_task_definition = None
     try:
-        click.echo("Getting docker image URI...")
-        image_uri = get_image_uri(ecr_client=ecr_client, ecr_repository=ecr_repository, tag=image_tag)
-
-        click.echo("Creating local task definition...")
-        local_task_definition = create_task_definition(
-            ecs_client=ecs_client,
-            application_id=f"{ecr_repository}-local-exec-{environment}",
-            deployment_tag=deployment_tag,
-            image_uri=image_uri,
-        )
+        # While planning, the progress goes to stderr, so that stdout only holds the plan
+        with redirect_stdout(sys.stderr) if plan else nullcontext():
+            click.echo("Getting docker image URI...")
+            with instrumentation.phase("get_image_uri"):
+                image = get_image(
+                    ecr_client=clients.client("ecr"),
+                    ecr_repository=ecr_repository,
+                    tag=image_tag,
+                    pin_digest=pin_image_digest,
+                    timeout=image_wait_timeout,
+                )
 
-        click.echo("Creating production task definition...")
-        production_task_definition = create_task_definition(
-            ecs_client=ecs_client,
-            application_id=service,
-            deployment_tag=deployment_tag,
-            image_uri=image_uri,
-        )
+            if plan:
+                with instrumentation.phase("plan_deployment"):
+                    deployment_plan = plan_deployment(
+                        ecs_client=clients.client("ecs"),
+                        tagging_client=clients.client("resourcegroupstaggingapi"),
+                        application=ecr_repository,
+                        environment=environment,
+                        image_uri=image.image_uri,
+                        deployment_tag=deployment_tag,
+                        run_preflight=run_preflight,
+                        max_revisions=max_task_definition_revisions,
+                        task_definition_cache=task_definition_cache,
+                    )
 
-        if run_preflight:
-            click.echo("Run preflight enabled")
-            click.echo("Creating preflight task definition...")
-            preflight_task_definition = create_task_definition(
-                ecs_client=ecs_client,
-                application_id=f"{ecr_repository}-preflight-{environment}",
+        if plan:
+            click.echo(json.dumps(asdict(deployment_plan), indent=2, default=str))
+            return
+
+        with BatchPoller(clients.client("ecs")) as poller:
+            deploy_service(
+                ecs_client=clients.client("ecs"),
+                tagging_client=clients.client("resourcegroupstaggingapi"),
+                application=ecr_repository,
+                environment=environment,
+                image_uri=image.image_uri,
                 deployment_tag=deployment_tag,
-                image_uri=image_uri,
+                run_preflight=run_preflight,
+                desired_count=desired_count,
+                max_revisions=max_task_definition_revisions,
+                instrumentation=instrumentation,
+                task_definition_cache=task_definition_cache,
+                rollback_on_failure=rollback_on_failure,
+                logs_client=clients.client("logs"),
+                poller=poller,
+                fast_rollout=fast_rollout,
+                image_digest=image.image_digest,
+            )
+    finally:
+        instrumentation.report(metrics_file)
+
+
+@cli.command(
+    name="ecs-deploy-many",
+    short_help="Deploy production image to multiple AWS ECS services",
+)
+@click.option(
+    "--manifest",
+    type=click.File(),
+    required=True,
+    help="JSON list of services, e.g. "
+    '[{"application": "web", "environment": "dev", "desired_count": 2, "run_preflight": true, "fast_rollout": true}], '
+    "fast_rollout is not allowed for the live environment",
+)
+@click.option("--allow-feature-branch-deployment", type=bool)
+@click.option("--ecr-repository", envvar="ECR_REPOSITORY", type=str)
+@click.option("--deployment-tag", envvar="DEPLOYMENT_TAG", type=str)
+@click.option("--image-tag", envvar="IMAGE_TAG", type=str)
+@click.option(
+    "--pin-image-digest",
+    envvar="PIN_IMAGE_DIGEST",
+    type=bool,
+    default=False,
+    help="Deploy the image by its digest instead of its tag, so a moved tag cannot change the deployed image",
+)
+@click.option(
+    "--image-wait-timeout",
+    type=click.IntRange(min=0),
+    default=DEFAULT_IMAGE_WAIT_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for the image tag to be pushed",
+)
+@click.option("--aws-region", envvar="AWS_DEFAULT_REGION", type=str)
+@click.option("--max-parallel-deployments", type=click.IntRange(min=1), default=4, show_default=True)
+@click.option(
+    "--max-task-definition-revisions",
+    # The Pulumi revision and the one of the previous deployment have to be found
+    type=click.IntRange(min=2),
+    help="Only the newest N active revisions of each task definition family are searched for tags",
+)
+@click.option(
+    "--metrics-file",
+    envvar="METRICS_FILE",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write phase timings and AWS call counts as JSON to this file, "
+    "they are also written to $GITHUB_OUTPUT and $GITHUB_STEP_SUMMARY if set",
+)
+@click.option(
+    "--api-rate-limit",
+    envvar="API_RATE_LIMIT",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_API_RATE_LIMIT,
+    show_default=True,
+    help="Maximum ECS and ECR requests per second and API operation, 0 disables the rate limiting",
+)
+@click.option(
+    "--rollback-on-failure",
+    envvar="ROLLBACK_ON_FAILURE",
+    type=bool,
+    default=False,
+    help="Restore the previous task definition right away if the service does not become stable",
+)
+@click.option(
+    "--task-definition-cache-dir",
+    envvar="TASK_DEFINITION_CACHE_DIR",
+    type=click.Path(file_okay=False, writable=True),
+    help="Cache described task definition revisions in this directory, so later runs only describe new revisions",
+)
+def cmd_ecs_deploy_many(
+    manifest: TextIO,
+    allow_feature_branch_deployment: bool,
+    ecr_repository: str,
+    deployment_tag: str,
+    image_tag: str,
+    pin_image_digest: bool,
+    image_wait_timeout: int,
+    aws_region: str,
+    max_parallel_deployments: int,
+    max_task_definition_revisions: Optional[int],
+    metrics_file: Optional[str],
+    api_rate_limit: float,
+    task_definition_cache_dir: Optional[str],
+    rollback_on_failure: bool,
+):
+    deployments = tuple(
+        ServiceDeployment(
+            application=deployment["application"],
+            environment=Environment(deployment["environment"].lower()),
+            desired_count=deployment.get("desired_count"),
+            run_preflight=deployment.get("run_preflight", False),
+            fast_rollout=deployment.get("fast_rollout", False),
+        )
+        for deployment in json.load(manifest)
+    )
+    if allow_feature_branch_deployment and any(deployment.environment != Environment.DEV for deployment in deployments):
+        raise RuntimeError("Deployments from feature branch only allowed for dev environment")
+    for deployment in deployments:
+        if deployment.fast_rollout:
+            check_fast_rollout(deployment.environment)
+
+    from actions_helper.clients import DEFAULT_MAX_POOL_CONNECTIONS, ClientFactory
+    from actions_helper.commands.deploy_service import deploy_service
+    from actions_helper.commands.get_image_uri import get_image
+    from actions_helper.instrumentation import Instrumentation
+    from actions_helper.poller import BatchPoller
+    from actions_helper.rate_limiter import RateLimiter
+    from actions_helper.task_definition_cache import TaskDefinitionCache
+
+    instrumentation = Instrumentation()
+    rate_limiter = RateLimiter(rate=api_rate_limit, instrumentation=instrumentation) if api_rate_limit else None
+    task_definition_cache = TaskDefinitionCache(task_definition_cache_dir) if task_definition_cache_dir else None
+    # Each deployment runs up to four steps concurrently
+    clients = ClientFactory(
+        region_name=aws_region,
+        max_pool_connections=max(DEFAULT_MAX_POOL_CONNECTIONS, max_parallel_deployments * 4),
+        instrumentation=instrumentation,
+        rate_limiter=rate_limiter,
+    )
+    ecs_client = clients.client("ecs")
+    tagging_client = clients.client("resourcegroupstaggingapi")
+
+    try:
+        click.echo("Getting docker image URI...")
+        with instrumentation.phase("get_image_uri"):
+            image = get_image(
+                ecr_client=clients.client("ecr"),
+                ecr_repository=ecr_repository,
+                tag=image_tag,
+                pin_digest=pin_image_digest,
+                timeout=image_wait_timeout,
             )
-            run_preflight_container(
+
+        def deploy(deployment: ServiceDeployment) -> DeployServiceOutput:
+            return deploy_service(
                 ecs_client=ecs_client,
-                service=service,
-                cluster=environment,
-                latest_task_definition_arn=preflight_task_definition.latest_task_definition_arn,
+                tagging_client=tagging_client,
+                application=deployment.application,
+                environment=deployment.environment,
+                image_uri=image.image_uri,
+                deployment_tag=deployment_tag,
+                run_preflight=deployment.run_preflight,
+                desired_count=deployment.desired_count,
+                max_revisions=max_task_definition_revisions,
+                instrumentation=instrumentation,
+                task_definition_cache=task_definition_cache,
+                rollback_on_failure=rollback_on_failure,
+                logs_client=clients.client("logs"),
+                poller=poller,
+                fast_rollout=deployment.fast_rollout,
+                image_digest=image.image_digest,
             )
 
-        click.echo("Updating service...")
-        ecs_client.update_service(
-            taskDefinition=production_task_definition.latest_task_definition_arn,
-            desiredCount=desired_count,
-            cluster=environment,
-            service=service,
-        )
-        click.echo("Service updated")
-
-        click.echo("Waiting for service stability...")
-        # Using Boto3 instead CLI in order to control delay and max attempts, see
-        # https://docs.aws.amazon.com/cli/latest/reference/ecs/wait/services-stable.html and
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ecs/waiter/ServicesStable.html
-        ecs_client.get_waiter("services_stable").wait(
-            cluster=environment,
-            services=(service,),
-            WaiterConfig={
-                # Note: The timeout (= delay * max_attempts) must not be shorter than the workflow timeout!
-                "Delay": 2,  # seconds to wait between retries
-                "MaxAttempts": 1440,
-            },
-        )
-        click.echo("Service stable")
+        # The waits of all deployments share their describes
+        with (
+            BatchPoller(clients.client("ecs")) as poller,
+            ThreadPoolExecutor(max_workers=max_parallel_deployments) as executor,
+        ):
+            futures = {deployment: executor.submit(deploy, deployment) for deployment in deployments}
+
+        failed_services = []
+        for deployment, future in futures.items():
+            service = f"{deployment.application}-{deployment.environment}"
+            # Failed deployments have already been rolled back and reported their error through `set_error`
+            try:
+                output = future.result()
+                click.echo(f"{service}: deployed {output.task_definition_arn}")
+            except (Exception, SystemExit) as e:
+                click.echo(f"{service}: failed ({e!r})")
+                failed_services.append(service)
     finally:
-        click.echo("De-registering task definition")
-        deregister_task_definition(
-            ecs_client=ecs_client,
-            cluster=environment,
-            service=service,
-            production_task_definition_output=production_task_definition,
-            local_task_definition_output=local_task_definition,
-            preflight_task_definition_output=preflight_task_definition,
-            run_preflight=run_preflight,
-        )
+        instrumentation.report(metrics_file)
+
+    if failed_services:
+        set_error(f"Deployment failed for services {', '.join(failed_services)}")
+
+
+@cli.command(
+    name="gc-task-definitions",
+    short_help="Deregister and delete old task definition revisions",
+)
+@click.option("--family", "families", type=str, multiple=True, required=True, help="Task definition family")
+@click.option(
+    "--cluster",
+    "clusters",
+    type=str,
+    multiple=True,
+    required=True,
+    help="Cluster whose service deployments reference revisions which are kept",
+)
+@click.option(
+    "--keep",
+    type=click.IntRange(min=1),
+    default=DEFAULT_GC_KEEP_REVISIONS,
+    show_default=True,
+    help="Number of newest ACTIVE revisions kept per family and set of tags",
+)
+@click.option("--dry-run", is_flag=True, help="Only report the revisions which would be deregistered and deleted")
+@click.option(
+    "--state-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record the progress in this file, an interrupted run with the same arguments is resumed from it",
+)
+@click.option("--aws-region", envvar="AWS_DEFAULT_REGION", type=str)
+@click.option("--max-workers", type=click.IntRange(min=1), default=DEFAULT_GC_MAX_WORKERS, show_default=True)
+@click.option(
+    "--api-rate-limit",
+    envvar="API_RATE_LIMIT",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_API_RATE_LIMIT,
+    show_default=True,
+    help="Maximum ECS and ECR requests per second and API operation, 0 disables the rate limiting",
+)
+def cmd_gc_task_definitions(
+    families: tuple[str, ...],
+    clusters: tuple[str, ...],
+    keep: int,
+    dry_run: bool,
+    state_file: Optional[str],
+    aws_region: str,
+    max_workers: int,
+    api_rate_limit: float,
+):
+    from actions_helper.clients import DEFAULT_MAX_POOL_CONNECTIONS, ClientFactory
+    from actions_helper.commands.gc_task_definitions import gc_task_definitions
+    from actions_helper.rate_limiter import RateLimiter
+
+    clients = ClientFactory(
+        region_name=aws_region,
+        max_pool_connections=max(DEFAULT_MAX_POOL_CONNECTIONS, max_workers),
+        rate_limiter=RateLimiter(rate=api_rate_limit) if api_rate_limit else None,
+    )
+    output = gc_task_definitions(
+        ecs_client=clients.client("ecs"),
+        tagging_client=clients.client("resourcegroupstaggingapi"),
+        families=families,
+        clusters=clusters,
+        keep=keep,
+        dry_run=dry_run,
+        state_file=state_file,
+        max_workers=max_workers,
+    )
+
+    click.echo(
+        f"Kept {len(output.kept)} task definitions, deregistered {len(output.deregistered)} "
+        f"and deleted {len(output.deleted)}",
+    )
+    if output.failed:
+        set_error(f"Garbage collection failed for {len(output.failed)} task definitions, run again to resume")
 
 
 if __name__ == "__main__":  # pragma: no cover
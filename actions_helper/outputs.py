@@ -1,4 +1,12 @@
 from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class ImageOutput:
+    image_uri: str
+    # The digest the image tag pointed to, which stays the same while the tag can be moved to another image
+    image_digest: str
 
 
 @dataclass(frozen=True)
@@ -6,7 +14,52 @@ class CreateTaskDefinitionOutput:
     previous_task_definition_arn: str
     latest_task_definition_arn: str
 
+    @property
+    def reused(self) -> bool:
+        # An unchanged task definition reuses the previously deployed revision
+        return self.previous_task_definition_arn == self.latest_task_definition_arn
+
+
+@dataclass(frozen=True)
+class PreparedTaskDefinition:
+    # Result of the read-only lookups of `create_task_definition`, which only has to register it afterwards
+    application_id: str
+    task_definition: dict[str, Any]
+    fingerprint: str
+    previous_task_definition_arn: str
+    # The deployed revision was registered from the same rendered task definition and is reused
+    unchanged: bool
+
 
 @dataclass(frozen=True)
 class RunPreflightOutput:
     preflight_task_arn: str
+
+
+@dataclass(frozen=True)
+class DeployServiceOutput:
+    service: str
+    task_definition_arn: str
+
+
+@dataclass(frozen=True)
+class GcTaskDefinitionsOutput:
+    kept: tuple[str, ...]
+    deregistered: tuple[str, ...]
+    deleted: tuple[str, ...]
+    failed: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class TaskDefinitionPlan:
+    family: str
+    # Revision the rendered task definition is compared to, empty for initial deployments
+    current_task_definition_arn: str
+    changes: tuple[dict[str, Any], ...]
+
+
+@dataclass(frozen=True)
+class DeploymentPlan:
+    service: str
+    image_uri: str
+    task_definitions: tuple[TaskDefinitionPlan, ...]
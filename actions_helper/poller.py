@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from botocore.client import BaseClient
+
+# Rounds start at most this often, callers asking in between are served together by the next round
+DEFAULT_POLL_INTERVAL = 2  # seconds, like the waiters
+# Operation, maximum number of resources per call and ARN key of the descriptions by kind of resource
+DESCRIBE_OPERATIONS = {
+    "tasks": ("describe_tasks", 100, "taskArn"),
+    "services": ("describe_services", 10, "serviceArn"),
+}
+
+
+class DescribeFailedError(Exception):
+    pass
+
+
+def find_description(descriptions: list[dict[str, Any]], key: str, resource: str) -> Optional[dict[str, Any]]:
+    # Resources can be given by ARN, or by the last part of it, e.g. the service name or task ID
+    return next(
+        (
+            description
+            for description in descriptions
+            if description[key] == resource or description[key].endswith(f"/{resource}")
+        ),
+        None,
+    )
+
+
+# Combines the describes of all waiting callers into batched `describe_tasks` and `describe_services` calls per
+# cluster, and passes each caller the description it asked for. Rounds start at most once per interval, so the
+# number of calls grows with the number of batches, not with the number of concurrent waits. One poller is shared by
+# all deployment threads, which block on the returned futures.
+class BatchPoller:
+    def __init__(self, ecs_client: BaseClient, interval: float = DEFAULT_POLL_INTERVAL):
+        self.ecs_client = ecs_client
+        self.interval = interval
+        # Futures of the waiting callers by kind of resource, cluster and resource
+        self._pending: defaultdict[tuple[str, str], defaultdict[str, list[Future]]] = self._new_pending()
+        self._next_round_at = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="poller", daemon=True)
+
+    @staticmethod
+    def _new_pending() -> defaultdict[tuple[str, str], defaultdict[str, list[Future]]]:
+        return defaultdict(lambda: defaultdict(list))
+
+    def describe_task(self, cluster: str, task: str) -> Future:
+        return self._request("tasks", cluster, task)
+
+    def describe_service(self, cluster: str, service: str) -> Future:
+        return self._request("services", cluster, service)
+
+    def _request(self, kind: str, cluster: str, resource: str) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The poller is closed")
+            if not self._thread.is_alive():
+                self._thread.start()
+            self._pending[(kind, cluster)][resource].append(future)
+            self._condition.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                while not self._closed and (delay := self._next_round_at - time.monotonic()) > 0:
+                    self._condition.wait(delay)
+                if self._closed:
+                    return
+                pending, self._pending = self._pending, self._new_pending()
+                self._next_round_at = time.monotonic() + self.interval
+
+            for (kind, cluster), futures_by_resource in pending.items():
+                self._describe(kind, cluster, futures_by_resource)
+
+    def _describe(self, kind: str, cluster: str, futures_by_resource: dict[str, list[Future]]):
+        # Futures cancelled by their thread in the meantime are skipped, the others can no longer be cancelled
+        futures_by_resource = {
+            resource: running_futures
+            for resource, futures in futures_by_resource.items()
+            if (running_futures := [future for future in futures if future.set_running_or_notify_cancel()])
+        }
+        operation, max_resources, key = DESCRIBE_OPERATIONS[kind]
+        resources = tuple(futures_by_resource)
+        for start in range(0, len(resources), max_resources):
+            batch = resources[start : start + max_resources]
+            try:
+                response = getattr(self.ecs_client, operation)(cluster=cluster, **{kind: list(batch)})
+            except Exception as e:
+                for resource in batch:
+                    for future in futures_by_resource[resource]:
+                        future.set_exception(e)
+                continue
+
+            for resource in batch:
+                description = find_description(response[kind], key, resource)
+                failure = find_description(response.get("failures", []), "arn", resource)
+                for future in futures_by_resource[resource]:
+                    if description is None:
+                        reason = failure["reason"] if failure else "MISSING"
+                        future.set_exception(DescribeFailedError(f"Describing {resource} failed: {reason}"))
+                    else:
+                        future.set_result(description)
+
+    def close(self):
+        # Callers still waiting are failed instead of being left waiting forever
+        with self._condition:
+            self._closed = True
+            pending, self._pending = self._pending, self._new_pending()
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        for futures_by_resource in pending.values():
+            for futures in futures_by_resource.values():
+                for future in futures:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(RuntimeError("The poller is closed"))
+
+    def __enter__(self) -> "BatchPoller":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
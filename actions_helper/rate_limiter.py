@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Optional
+
+from botocore.client import BaseClient
+
+from actions_helper.instrumentation import Instrumentation
+
+# ECS and ECR throttle per account and operation, so the sustained rate stays well below their refill rates to leave
+# room for other deployments running at the same time
+DEFAULT_RATE = 10.0  # requests per second and operation
+DEFAULT_BURST = 20  # requests
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid token bucket with rate {rate} and burst {burst}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        # The token is taken right away, possibly leaving a debt which the caller waits off outside the lock. Callers
+        # are served in the order they arrive, and concurrent callers queue up behind each other's debt.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate) - 1
+            self._updated_at = now
+            wait = max(0.0, -self._tokens / self.rate)
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+# Paces every request attempt of the attached clients with a token bucket per API operation. Retries take a token as
+# well, so throttled calls back off instead of retrying at full speed. One limiter is shared by all threads.
+class RateLimiter:
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        rates_by_operation: Optional[dict[str, tuple[float, int]]] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        # Overrides keyed like "ecs.DescribeTaskDefinition"
+        self.rates_by_operation = rates_by_operation or {}
+        self._instrumentation = instrumentation
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, operation: str) -> TokenBucket:
+        with self._lock:
+            if operation not in self._buckets:
+                self._buckets[operation] = TokenBucket(*self.rates_by_operation.get(operation, (self.rate, self.burst)))
+            return self._buckets[operation]
+
+    def attach(self, client: BaseClient) -> BaseClient:
+        client.meta.events.register("request-created", self._on_request_created)
+        return client
+
+    def _on_request_created(self, event_name: str, **kwargs):
+        # Event names look like "request-created.ecs.DescribeTaskDefinition"
+        _, service, operation = event_name.split(".", 2)
+        operation = f"{service}.{operation}"
+        wait = self.bucket(operation).acquire()
+        if self._instrumentation:
+            self._instrumentation.record_rate_limit_wait(operation, wait)
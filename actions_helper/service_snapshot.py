@@ -0,0 +1,23 @@
+from typing import Any, Optional
+
+
+# Latest description of a service, shared by the steps of one deployment. The network configuration does not change
+# during a deployment, so any description serves it. The deployments only change when the service is updated, so a
+# description stays current until the next update, and the stability waiter, which describes the service anyway,
+# refreshes it afterwards.
+class ServiceSnapshot:
+    def __init__(self):
+        self._description: Optional[dict[str, Any]] = None
+        self._current = False
+
+    def get(self, static: bool = False) -> Optional[dict[str, Any]]:
+        # Returns None if the service needs to be described, for its deployments only while the snapshot is current
+        return self._description if static or self._current else None
+
+    def update(self, description: dict[str, Any]):
+        self._description = description
+        self._current = True
+
+    def invalidate(self):
+        # Called when the service is updated, the next description shows the new deployment
+        self._current = False
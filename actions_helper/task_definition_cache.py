@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from botocore.client import BaseClient
+
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024  # bytes
+# Tags of a revision can be changed after its registration, unlike its content, so the tag index and the tags cached
+# with a revision expire
+DEFAULT_TAGS_MAX_AGE = 24 * 60 * 60  # seconds
+CACHE_FILE_SUFFIX = ".json.z"
+# Missing and broken entries, e.g. of an interrupted cache restore, are described and written again
+CACHE_READ_ERRORS = (OSError, zlib.error, ValueError)
+
+
+# Caches task definition revisions with their tags on disk, one zlib compressed JSON file per revision ARN, and the tag
+# index of each scanned family prefix. The content of a revision never changes, so it is kept until the cache exceeds
+# its maximum size, when the least recently used entries are evicted. Deregistered revisions are never looked up, since
+# callers only ask for ACTIVE ones.
+class TaskDefinitionCache:
+    def __init__(
+        self,
+        directory: str | Path,
+        max_size: int = DEFAULT_MAX_SIZE,
+        tags_max_age: float = DEFAULT_TAGS_MAX_AGE,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.tags_max_age = tags_max_age
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self.directory.glob(f"*{CACHE_FILE_SUFFIX}"))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}{CACHE_FILE_SUFFIX}"
+
+    def _read(self, key: str) -> Optional[dict[str, Any]]:
+        path = self._path(key)
+        try:
+            entry = json.loads(zlib.decompress(path.read_bytes()))
+            # Marks the entry as recently used for the eviction
+            os.utime(path)
+        except CACHE_READ_ERRORS:
+            return None
+        return entry if entry.get("key") == key else None
+
+    def _write(self, key: str, entry: dict[str, Any]):
+        path = self._path(key)
+        data = zlib.compress(json.dumps(entry | {"key": key}, default=str).encode())
+        with self._lock:
+            previous_size = path.stat().st_size if path.exists() else 0
+            # Other threads and processes only ever see complete files
+            temporary_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            temporary_path.write_bytes(data)
+            temporary_path.replace(path)
+            self._size += len(data) - previous_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        paths = sorted(self.directory.glob(f"*{CACHE_FILE_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+        self._size = sum(path.stat().st_size for path in paths)
+        while self._size > self.max_size:
+            path = paths.pop(0)
+            self._size -= path.stat().st_size
+            path.unlink()
+
+    def get(self, task_definition_arn: str, fresh_tags: bool = False) -> Optional[dict[str, Any]]:
+        # Returns a fresh copy of the cached `describe_task_definition` response, callers are free to modify it. Callers
+        # which need the current tags ignore entries whose tags expired, entries without a timestamp count as expired.
+        if (entry := self._read(task_definition_arn)) is None or (
+            fresh_tags and time.time() - entry.get("tagsCachedAt", 0) > self.tags_max_age
+        ):
+            return None
+        return {"taskDefinition": entry["taskDefinition"], "tags": entry["tags"]}
+
+    def put(self, task_definition_arn: str, task_definition: dict[str, Any], tags: list[dict[str, str]]):
+        self._write(task_definition_arn, {"taskDefinition": task_definition, "tags": tags, "tagsCachedAt": time.time()})
+
+    def get_tag_index(self, task_definition_family_prefix: str) -> "TaskDefinitionTagIndex":
+        # An expired or missing index is replaced by an empty one, so all revisions are looked up once again
+        entry = self._read(f"tag-index:{task_definition_family_prefix}")
+        if entry is None or time.time() - entry["createdAt"] > self.tags_max_age:
+            return TaskDefinitionTagIndex()
+        return TaskDefinitionTagIndex(
+            tags_by_arn=entry["tagsByArn"],
+            created_at=entry["createdAt"],
+        )
+
+    def put_tag_index(self, task_definition_family_prefix: str, tag_index: "TaskDefinitionTagIndex"):
+        self._write(
+            f"tag-index:{task_definition_family_prefix}",
+            {"tagsByArn": tag_index.tags_by_arn, "createdAt": tag_index.created_at},
+        )
+
+
+def parse_task_definition_arn(task_definition_arn: str) -> tuple[str, int]:
+    # arn:aws:ecs:<region>:<account>:task-definition/<family>:<revision>
+    family, revision = task_definition_arn.rsplit("/", 1)[1].rsplit(":", 1)
+    return family, int(revision)
+
+
+# Tags of the ACTIVE revisions of a task definition family prefix by ARN. Listed revisions which are not indexed are new
+# ones, and indexed revisions which are no longer listed have been deregistered. The index expires like cached tags,
+# since tags can be changed after the registration of a revision.
+@dataclass
+class TaskDefinitionTagIndex:
+    tags_by_arn: dict[str, list[dict[str, str]]] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+    def get_unindexed_task_definition_arns(self, task_definition_arns: tuple[str, ...]) -> tuple[str, ...]:
+        # New revisions, and older ones which an earlier scan limited to fewer revisions did not reach
+        return tuple(arn for arn in task_definition_arns if arn not in self.tags_by_arn)
+
+    def update(
+        self,
+        task_definition_arns: tuple[str, ...],
+        tags_by_arn: dict[str, list[dict[str, str]]],
+        complete: bool,
+    ) -> bool:
+        # Adds the tags of the listed ACTIVE revisions and removes the deregistered ones. Unless all ACTIVE revisions
+        # were listed, only indexed revisions within the listed range are known to be deregistered. Returns whether
+        # the index changed.
+        listed_arns = set(task_definition_arns)
+        lowest_listed_revisions = {}
+        for task_definition_arn in task_definition_arns:
+            family, revision = parse_task_definition_arn(task_definition_arn)
+            lowest_listed_revisions[family] = min(revision, lowest_listed_revisions.get(family, revision))
+
+        def is_deregistered(task_definition_arn: str) -> bool:
+            if task_definition_arn in listed_arns:
+                return False
+            family, revision = parse_task_definition_arn(task_definition_arn)
+            return complete or revision > lowest_listed_revisions.get(family, revision)
+
+        deregistered_arns = tuple(filter(is_deregistered, self.tags_by_arn))
+        new_tags_by_arn = {arn: tags for arn, tags in tags_by_arn.items() if arn not in self.tags_by_arn}
+
+        for task_definition_arn in deregistered_arns:
+            del self.tags_by_arn[task_definition_arn]
+        self.tags_by_arn |= new_tags_by_arn
+        return bool(deregistered_arns or new_tags_by_arn)
+
+
+def describe_task_definition(
+    ecs_client: BaseClient,
+    task_definition_arn: str,
+    task_definition_cache: Optional[TaskDefinitionCache] = None,
+    fresh_tags: bool = False,
+) -> dict[str, Any]:
+    if task_definition_cache and (response := task_definition_cache.get(task_definition_arn, fresh_tags)):
+        return response
+
+    response = ecs_client.describe_task_definition(taskDefinition=task_definition_arn, include=["TAGS"])
+    if task_definition_cache:
+        task_definition_cache.put(task_definition_arn, response["taskDefinition"], response.get("tags", []))
+    return response
@@ -0,0 +1,57 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+@dataclass(frozen=True)
+class Step:
+    function: Callable[..., Any]
+    depends_on: tuple[str, ...]
+
+
+# Runs steps on a thread pool as soon as all of their dependencies are done. Each step receives the results of its
+# dependencies as keyword arguments named after the dependency. Steps have to be added after their dependencies, which
+# makes cycles impossible. Once a step fails, no further steps are started, but running steps are awaited, so `results`
+# is consistent when `run` returns or raises.
+class TaskGraph:
+    def __init__(self):
+        self.steps: dict[str, Step] = {}
+        self.results: dict[str, Any] = {}
+
+    def add(self, name: str, function: Callable[..., Any], depends_on: tuple[str, ...] = ()):
+        if name in self.steps:
+            raise ValueError(f"Step {name} already exists")
+        if unknown_steps := set(depends_on) - self.steps.keys():
+            raise ValueError(f"Step {name} depends on unknown steps {sorted(unknown_steps)}")
+        self.steps[name] = Step(function=function, depends_on=depends_on)
+
+    def run(self, max_workers: Optional[int] = None):
+        pending = dict(self.steps)
+        running: dict[Future, str] = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(self.steps), 1)) as executor:
+            while True:
+                if error is None:
+                    for name, step in tuple(pending.items()):
+                        if all(dependency in self.results for dependency in step.depends_on):
+                            del pending[name]
+                            future = executor.submit(
+                                step.function,
+                                **{dependency: self.results[dependency] for dependency in step.depends_on},
+                            )
+                            running[future] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except BaseException as e:
+                        error = error or e
+
+        if error is not None:
+            raise error
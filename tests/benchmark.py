@@ -0,0 +1,183 @@
+import io
+import json
+import time
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+import click
+from click.testing import CliRunner
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands.create_task_definition import create_task_definition
+from actions_helper.commands.deregister_task_definition import deregister_task_definition
+from actions_helper.commands.get_active_task_definition_by_tag import get_active_task_definition_arn_by_tag
+from actions_helper.main import cmd_ecs_deploy
+from actions_helper.outputs import CreateTaskDefinitionOutput
+from tests.fake_aws import (
+    APPLICATION,
+    DEPLOYMENT_TAG,
+    ENVIRONMENT,
+    IMAGE_TAG,
+    SERVICE,
+    TEST_REGION,
+    make_backend,
+)
+
+# Run with `python -m tests.benchmark`, see `--help` for the available options
+DEFAULT_FAMILY_SIZES = (1, 10, 100, 1000)
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    scenario: str
+    family_size: int
+    wall_time: float
+    calls: int
+    throttled: int
+    calls_by_operation: dict[str, int]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    # Runs before the measurement, its result is passed to `run`
+    setup: Callable[[ClientFactory], Any]
+    run: Callable[[ClientFactory, Any], Any]
+
+
+def scan_family(clients: ClientFactory, bulk: bool) -> str:
+    return get_active_task_definition_arn_by_tag(
+        ecs_client=clients.client("ecs"),
+        tagging_client=clients.client("resourcegroupstaggingapi") if bulk else None,
+        task_definition_family_prefix=SERVICE,
+        task_definition_tags=f"created_by:Pulumi,Name:{SERVICE}",
+        allow_initial_deployment=False,
+    )
+
+
+def register_task_definition(clients: ClientFactory, application_id: str = SERVICE) -> CreateTaskDefinitionOutput:
+    return create_task_definition(
+        ecs_client=clients.client("ecs"),
+        tagging_client=clients.client("resourcegroupstaggingapi"),
+        application_id=application_id,
+        image_uri=f"{APPLICATION}:{IMAGE_TAG}",
+        deployment_tag=DEPLOYMENT_TAG,
+    )
+
+
+def deploy_task_definitions(clients: ClientFactory) -> tuple[CreateTaskDefinitionOutput, CreateTaskDefinitionOutput]:
+    local_output = register_task_definition(clients, application_id=f"{APPLICATION}-local-exec-{ENVIRONMENT}")
+    production_output = register_task_definition(clients)
+    clients.client("ecs").update_service(
+        cluster=ENVIRONMENT,
+        service=SERVICE,
+        taskDefinition=production_output.latest_task_definition_arn,
+    )
+    return local_output, production_output
+
+
+def deregister_task_definitions(
+    clients: ClientFactory,
+    outputs: tuple[CreateTaskDefinitionOutput, CreateTaskDefinitionOutput],
+):
+    local_output, production_output = outputs
+    deregister_task_definition(
+        ecs_client=clients.client("ecs"),
+        cluster=ENVIRONMENT,
+        service=SERVICE,
+        run_preflight=False,
+        production_task_definition_output=production_output,
+        local_task_definition_output=local_output,
+        preflight_task_definition_output=None,
+    )
+
+
+def deploy(clients: ClientFactory):
+    result = CliRunner(env={"AWS_DEFAULT_REGION": TEST_REGION}).invoke(
+        cmd_ecs_deploy,
+        args=(
+            "--environment",
+            ENVIRONMENT,
+            "--allow-feature-branch-deployment",
+            "false",
+            "--ecr-repository",
+            APPLICATION,
+            "--deployment-tag",
+            DEPLOYMENT_TAG,
+            "--image-tag",
+            IMAGE_TAG,
+            "--run-preflight",
+            "true",
+            "--desired-count",
+            "1",
+        ),
+    )
+    if result.exit_code != 0:
+        raise RuntimeError(f"Deployment failed: {result.output}") from result.exception
+
+
+def no_setup(clients: ClientFactory):
+    pass
+
+
+SCENARIOS = {
+    "get_active_task_definition_arn_by_tag": Scenario(
+        setup=no_setup,
+        run=lambda clients, _: scan_family(clients, bulk=False),
+    ),
+    "get_active_task_definition_arn_by_tag_bulk": Scenario(
+        setup=no_setup,
+        run=lambda clients, _: scan_family(clients, bulk=True),
+    ),
+    "create_task_definition": Scenario(setup=no_setup, run=lambda clients, _: register_task_definition(clients)),
+    "deregister_task_definition": Scenario(setup=deploy_task_definitions, run=deregister_task_definitions),
+    "ecs_deploy": Scenario(setup=no_setup, run=lambda clients, _: deploy(clients)),
+    # Deploys the same image again
+    "ecs_redeploy": Scenario(setup=deploy, run=lambda clients, _: deploy(clients)),
+}
+
+
+def run_scenario(scenario: str, family_size: int, latency: float = 0.0, throttle_rate: float = 0.0) -> ScenarioResult:
+    backend = make_backend(family_size=family_size, latency=latency, throttle_rate=throttle_rate)
+    # The output of the commands would drown the results
+    with backend.patch_client_factory(), redirect_stdout(io.StringIO()):
+        clients = ClientFactory(region_name=TEST_REGION)
+        for service_name in ("ecs", "ecr", "resourcegroupstaggingapi"):
+            clients.client(service_name)
+        setup_result = SCENARIOS[scenario].setup(clients)
+        backend.reset_calls()
+
+        start = time.perf_counter()
+        SCENARIOS[scenario].run(clients, setup_result)
+        wall_time = time.perf_counter() - start
+
+    return ScenarioResult(scenario=scenario, family_size=family_size, wall_time=wall_time, **backend.summary())
+
+
+@click.command()
+@click.option("--scenario", "scenarios", type=click.Choice(tuple(SCENARIOS)), multiple=True)
+@click.option("--family-size", "family_sizes", type=click.IntRange(min=1), multiple=True)
+@click.option("--latency", type=float, default=0.02, show_default=True, help="Seconds per API call")
+@click.option("--throttle-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True)
+@click.option("--json", "as_json", is_flag=True, help="Print results as JSON lines")
+def benchmark(
+    scenarios: tuple[str, ...],
+    family_sizes: tuple[int, ...],
+    latency: float,
+    throttle_rate: float,
+    as_json: bool,
+):
+    for scenario in scenarios or tuple(SCENARIOS):
+        for family_size in family_sizes or DEFAULT_FAMILY_SIZES:
+            result = run_scenario(scenario, family_size, latency=latency, throttle_rate=throttle_rate)
+            if as_json:
+                click.echo(json.dumps(asdict(result)))
+            else:
+                click.echo(
+                    f"{result.scenario:<45} revisions={result.family_size:<5} wall_time={result.wall_time:8.3f}s "
+                    f"calls={result.calls:<5} throttled={result.throttled:<4} {result.calls_by_operation}",
+                )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    benchmark()
@@ -0,0 +1,402 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Iterator
+from unittest.mock import patch
+
+from botocore.awsrequest import AWSResponse
+from botocore.client import BaseClient
+
+from actions_helper.clients import ClientFactory
+from actions_helper.utils import PLACEHOLDER_TEXT
+
+TEST_ACCOUNT_ID = "123456789012"
+TEST_REGION = "eu-central-1"
+# Deployment of `make_backend`, shared by the tests running whole deployments and the benchmark
+APPLICATION = "app"
+ENVIRONMENT = "dev"
+SERVICE = f"{APPLICATION}-{ENVIRONMENT}"
+DEPLOYMENT_TAG = "GitHub Actions Deployment"
+IMAGE_TAG = "master-e0428b7"
+LOCAL_FAMILY = f"{APPLICATION}-local-exec-{ENVIRONMENT}"
+PREFLIGHT_FAMILY = f"{APPLICATION}-preflight-{ENVIRONMENT}"
+LIST_TASK_DEFINITIONS_PAGE_SIZE = 100
+
+
+class FakeAwsError(Exception):
+    def __init__(self, code: str, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+
+
+class FakeRawResponse(bytes):
+    def stream(self, **kwargs) -> Iterator[bytes]:
+        yield bytes(self)
+
+
+# In-process stand-in for the ECS, ECR, CloudWatch Logs and Resource Groups Tagging APIs. It answers the HTTP requests
+# of real botocore clients from the `before-send` event, so request serialization, response parsing, waiters and
+# retries all run as they would against AWS, with configurable latency and throttling for every call.
+class FakeAwsBackend:
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls: Counter[str] = Counter()
+        self.throttled_calls: Counter[str] = Counter()
+
+        self.task_definitions: dict[str, dict[str, Any]] = {}
+        self.task_definition_tags: dict[str, list[dict[str, str]]] = {}
+        self.services: dict[tuple[str, str], dict[str, Any]] = {}
+        self.tasks: dict[str, dict[str, Any]] = {}
+        self.images: dict[tuple[str, str], dict[str, Any]] = {}
+        # Messages by log group and stream
+        self.log_events: dict[tuple[str, str], list[str]] = {}
+
+        self._random = random.Random(seed)
+        # Every push gets a new digest, also when it moves an existing tag
+        self._image_pushes = itertools.count()
+        self._lock = threading.Lock()
+        self._attached_clients: set[int] = set()
+
+    # Setup
+
+    def attach(self, client: BaseClient) -> BaseClient:
+        with self._lock:
+            if id(client) not in self._attached_clients:
+                self._attached_clients.add(id(client))
+                client.meta.events.register_first("before-send", self._handle_request)
+        return client
+
+    @contextmanager
+    def patch_client_factory(self) -> Iterator[None]:
+        client = ClientFactory.client
+        with (
+            patch.dict(
+                "os.environ",
+                {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing", "AWS_SESSION_TOKEN": "testing"},
+            ),
+            patch.object(
+                ClientFactory,
+                attribute="client",
+                autospec=True,
+                side_effect=lambda factory, service_name: self.attach(client(factory, service_name)),
+            ),
+        ):
+            yield
+
+    def add_image(self, repository: str, tag: str):
+        self.images[(repository, tag)] = {
+            "registryId": TEST_ACCOUNT_ID,
+            "repositoryName": repository,
+            "imageDigest": f"sha256:{next(self._image_pushes):064x}",
+            "imageTags": [tag],
+        }
+
+    def add_task_definition_family(self, family: str, revisions: int, deployment_tag: str) -> str:
+        # The oldest revision was created by Pulumi, the newest by the previous deployment, others by someone else.
+        # A family with a single revision has never been deployed. Returns the newest revision.
+        task_definition_arn = self.register_task_definition(
+            family=family,
+            tags={"created_by": "Pulumi", "Name": family},
+        )
+        for _ in range(revisions - 2):
+            self.register_task_definition(family=family, tags={"created_by": "Manual", "Name": family})
+        if revisions > 1:
+            task_definition_arn = self.register_task_definition(
+                family=family,
+                tags={"created_by": deployment_tag, "Name": family},
+            )
+        return task_definition_arn
+
+    def add_service(self, cluster: str, service: str, task_definition_arn: str):
+        self.services[(cluster, service)] = {
+            "serviceName": service,
+            "serviceArn": f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:service/{cluster}/{service}",
+            "status": "ACTIVE",
+            "desiredCount": 1,
+            "deploymentConfiguration": {
+                "maximumPercent": 200,
+                "minimumHealthyPercent": 100,
+                "deploymentCircuitBreaker": {"enable": False, "rollback": False},
+            },
+            "networkConfiguration": {
+                "awsvpcConfiguration": {"subnets": ["subnet-1"], "securityGroups": ["sg-1"]},
+            },
+            "deployments": [self._make_deployment(task_definition_arn, desired_count=1)],
+            "events": [],
+        }
+
+    def register_task_definition(self, family: str, tags: dict[str, str], image: str = PLACEHOLDER_TEXT) -> str:
+        return self._register_task_definition(
+            {
+                "family": family,
+                "containerDefinitions": [{"name": family, "image": image}],
+                "tags": [{"key": key, "value": value} for key, value in tags.items()],
+            },
+        )["taskDefinition"]["taskDefinitionArn"]
+
+    # Request handling
+
+    def _handle_request(self, request, **kwargs) -> AWSResponse:
+        operation = request.headers["X-Amz-Target"].decode().split(".")[-1]
+        body = json.loads(request.body or b"{}")
+        time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[operation] += 1
+            try:
+                if self.throttle_rate and self._random.random() < self.throttle_rate:
+                    self.throttled_calls[operation] += 1
+                    raise FakeAwsError("ThrottlingException", "Rate exceeded")
+                handler = getattr(self, f"_{re.sub(r'(?<!^)(?=[A-Z])', '_', operation).lower()}")
+                status_code, payload = 200, handler(body)
+            except FakeAwsError as e:
+                status_code, payload = e.status_code, {"__type": e.code, "message": str(e)}
+
+        return AWSResponse(
+            url=request.url,
+            status_code=status_code,
+            headers={"Content-Type": "application/x-amz-json-1.1"},
+            raw=FakeRawResponse(json.dumps(payload).encode()),
+        )
+
+    def _get_task_definition(self, task_definition: str) -> dict[str, Any]:
+        if task_definition in self.task_definitions:
+            return self.task_definitions[task_definition]
+        for arn, definition in self.task_definitions.items():
+            if arn.endswith(f"/{task_definition}"):
+                return definition
+        raise FakeAwsError("ClientException", f"Unable to describe task definition {task_definition}")
+
+    def _get_service(self, cluster: str, service: str) -> dict[str, Any]:
+        # Services can be given by name or ARN
+        service = service.rsplit("/", 1)[-1]
+        if (cluster, service) not in self.services:
+            raise FakeAwsError("ServiceNotFoundException", f"Service {service} not found")
+        return self.services[(cluster, service)]
+
+    def _make_deployment(self, task_definition_arn: str, desired_count: int) -> dict[str, Any]:
+        return {
+            "id": f"ecs-svc/{self._random.getrandbits(32)}",
+            "status": "PRIMARY",
+            "taskDefinition": task_definition_arn,
+            "desiredCount": desired_count,
+            "runningCount": desired_count,
+            "pendingCount": 0,
+            "failedTasks": 0,
+            "rolloutState": "COMPLETED",
+            "createdAt": time.time(),
+        }
+
+    # ECS
+
+    def _list_task_definitions(self, body: dict[str, Any]) -> dict[str, Any]:
+        arns = [
+            arn
+            for arn, definition in self.task_definitions.items()
+            if definition["family"].startswith(body.get("familyPrefix", ""))
+            and definition["status"] == body.get("status", "ACTIVE")
+        ]
+        if body.get("sort") == "DESC":
+            arns.reverse()
+
+        start = int(body.get("nextToken", 0))
+        end = start + body.get("maxResults", LIST_TASK_DEFINITIONS_PAGE_SIZE)
+        return {"taskDefinitionArns": arns[start:end]} | ({"nextToken": str(end)} if end < len(arns) else {})
+
+    def _describe_task_definition(self, body: dict[str, Any]) -> dict[str, Any]:
+        definition = self._get_task_definition(body["taskDefinition"])
+        return {"taskDefinition": json.loads(json.dumps(definition))} | (
+            {"tags": self.task_definition_tags[definition["taskDefinitionArn"]]}
+            if "TAGS" in body.get("include", ())
+            else {}
+        )
+
+    def _register_task_definition(self, body: dict[str, Any]) -> dict[str, Any]:
+        tags = body.pop("tags", [])
+        family = body["family"]
+        revision = 1 + max(
+            (definition["revision"] for definition in self.task_definitions.values() if definition["family"] == family),
+            default=0,
+        )
+        arn = f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task-definition/{family}:{revision}"
+        self.task_definitions[arn] = body | {
+            "taskDefinitionArn": arn,
+            "revision": revision,
+            "status": "ACTIVE",
+            "requiresAttributes": [],
+            "compatibilities": ["EC2", "FARGATE"],
+            "registeredAt": time.time(),
+            "registeredBy": f"arn:aws:iam::{TEST_ACCOUNT_ID}:user/test",
+        }
+        self.task_definition_tags[arn] = tags
+        return {"taskDefinition": self.task_definitions[arn], "tags": tags}
+
+    def _deregister_task_definition(self, body: dict[str, Any]) -> dict[str, Any]:
+        definition = self._get_task_definition(body["taskDefinition"])
+        definition["status"] = "INACTIVE"
+        return {"taskDefinition": definition}
+
+    def _delete_task_definitions(self, body: dict[str, Any]) -> dict[str, Any]:
+        task_definitions, failures = [], []
+        for task_definition in body["taskDefinitions"]:
+            definition = self._get_task_definition(task_definition)
+            if definition["status"] == "INACTIVE":
+                definition["status"] = "DELETE_IN_PROGRESS"
+                task_definitions.append(definition)
+            else:
+                failures.append({"arn": task_definition, "reason": "The task definition is not INACTIVE"})
+        return {"taskDefinitions": task_definitions, "failures": failures}
+
+    def _list_services(self, body: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "serviceArns": [
+                service["serviceArn"] for (cluster, _), service in self.services.items() if cluster == body["cluster"]
+            ],
+        }
+
+    def _describe_services(self, body: dict[str, Any]) -> dict[str, Any]:
+        # Missing services are reported as failures, not errors
+        services, failures = [], []
+        for service in body["services"]:
+            try:
+                services.append(self._get_service(body["cluster"], service))
+            except FakeAwsError:
+                failures.append({"arn": service, "reason": "MISSING"})
+        return {"services": services, "failures": failures}
+
+    def _update_service(self, body: dict[str, Any]) -> dict[str, Any]:
+        service = self._get_service(body["cluster"], body["service"])
+        # Rollouts finish immediately, so waiters succeed on their first poll
+        desired_count = body.get("desiredCount", service["desiredCount"])
+        service["desiredCount"] = desired_count
+        if "deploymentConfiguration" in body:
+            service["deploymentConfiguration"] = body["deploymentConfiguration"]
+        # Only a new task definition starts a new deployment
+        if "taskDefinition" in body:
+            service["deployments"] = [self._make_deployment(body["taskDefinition"], desired_count)]
+        return {"service": service}
+
+    def _run_task(self, body: dict[str, Any]) -> dict[str, Any]:
+        self._get_task_definition(body["taskDefinition"])
+        task_arn = f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task/{body['cluster']}/{len(self.tasks)}"
+        self.tasks[task_arn] = {
+            "taskArn": task_arn,
+            "lastStatus": "STOPPED",
+            "containers": [{"name": "preflight", "exitCode": 0}],
+        }
+        return {"tasks": [self.tasks[task_arn]], "failures": []}
+
+    def _describe_tasks(self, body: dict[str, Any]) -> dict[str, Any]:
+        # Tasks can be given by ARN or ID, missing tasks are reported as failures
+        tasks, failures = [], []
+        for task in body["tasks"]:
+            if task_arn := next((arn for arn in self.tasks if arn == task or arn.endswith(f"/{task}")), None):
+                tasks.append(self.tasks[task_arn])
+            else:
+                failures.append({"arn": task, "reason": "MISSING"})
+        return {"tasks": tasks, "failures": failures}
+
+    # ECR
+
+    def _describe_images(self, body: dict[str, Any]) -> dict[str, Any]:
+        repository = body["repositoryName"]
+        image_details = [
+            self.images[(repository, image_id["imageTag"])]
+            for image_id in body["imageIds"]
+            if (repository, image_id["imageTag"]) in self.images
+        ]
+        if not image_details:
+            raise FakeAwsError("ImageNotFoundException", f"Image not found in repository {repository}")
+        return {"imageDetails": image_details}
+
+    def _describe_repositories(self, body: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "repositories": [
+                {
+                    "repositoryName": repository,
+                    "registryId": TEST_ACCOUNT_ID,
+                    "repositoryUri": f"{TEST_ACCOUNT_ID}.dkr.ecr.{TEST_REGION}.amazonaws.com/{repository}",
+                }
+                for repository in body["repositoryNames"]
+            ],
+        }
+
+    # CloudWatch Logs
+
+    def _get_log_events(self, body: dict[str, Any]) -> dict[str, Any]:
+        log_stream = (body["logGroupName"], body["logStreamName"])
+        if log_stream not in self.log_events:
+            raise FakeAwsError("ResourceNotFoundException", "The specified log stream does not exist.")
+        # Forward tokens are the index of the next event, the end of the stream returns the given token
+        start = int(body["nextToken"].removeprefix("f/")) if "nextToken" in body else 0
+        messages = self.log_events[log_stream][start:]
+        return {
+            "events": [{"timestamp": 0, "message": message, "ingestionTime": 0} for message in messages],
+            "nextForwardToken": f"f/{start + len(messages)}",
+            "nextBackwardToken": f"b/{start}",
+        }
+
+    # Resource Groups Tagging API
+
+    def _get_resources(self, body: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "ResourceTagMappingList": [
+                {
+                    "ResourceARN": arn,
+                    "Tags": [{"Key": tag["key"], "Value": tag["value"]} for tag in self.task_definition_tags[arn]],
+                }
+                for arn in body.get("ResourceARNList", ())
+                if arn in self.task_definition_tags
+            ],
+        }
+
+    # Results
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttled_calls.clear()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "calls": self.total_calls,
+            "throttled": sum(self.throttled_calls.values()),
+            "calls_by_operation": dict(sorted(self.calls.items())),
+        }
+
+
+def make_backend(family_size: int, latency: float, throttle_rate: float) -> FakeAwsBackend:
+    backend = FakeAwsBackend(latency=latency, throttle_rate=throttle_rate)
+    backend.add_image(repository=APPLICATION, tag=IMAGE_TAG)
+    for family in (LOCAL_FAMILY, SERVICE, PREFLIGHT_FAMILY):
+        task_definition_arn = backend.add_task_definition_family(
+            family=family,
+            revisions=family_size,
+            deployment_tag=DEPLOYMENT_TAG,
+        )
+        if family == SERVICE:
+            backend.add_service(cluster=ENVIRONMENT, service=SERVICE, task_definition_arn=task_definition_arn)
+    return backend
+
+
+def break_deployment(backend: FakeAwsBackend):
+    # Every check fails: the service is missing, the Pulumi task definition of the local family has a real image and
+    # the preflight family has two revisions of previous deployments
+    del backend.services[(ENVIRONMENT, SERVICE)]
+    pulumi_task_definition_arn = f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task-definition/{LOCAL_FAMILY}:1"
+    backend.task_definitions[pulumi_task_definition_arn]["containerDefinitions"][0]["image"] = "nginx"
+    backend.register_task_definition(
+        family=PREFLIGHT_FAMILY,
+        tags={"created_by": DEPLOYMENT_TAG, "Name": PREFLIGHT_FAMILY},
+    )
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from tests.benchmark import benchmark, run_scenario
+
+
+# Keeps the benchmark harness working and guards the number of API calls per scenario
+class BenchmarkTestCase(unittest.TestCase):
+    def test_get_active_task_definition_arn_by_tag(self):
+        result = run_scenario("get_active_task_definition_arn_by_tag", family_size=150)
+        self.assertDictEqual(result.calls_by_operation, {"ListTaskDefinitions": 2, "DescribeTaskDefinition": 150})
+
+        result = run_scenario("get_active_task_definition_arn_by_tag_bulk", family_size=150)
+        self.assertDictEqual(result.calls_by_operation, {"ListTaskDefinitions": 2, "GetResources": 2})
+
+    def test_create_task_definition(self):
+        result = run_scenario("create_task_definition", family_size=10)
+        self.assertDictEqual(
+            result.calls_by_operation,
+            {"ListTaskDefinitions": 1, "GetResources": 1, "DescribeTaskDefinition": 1, "RegisterTaskDefinition": 1},
+        )
+
+    def test_deregister_task_definition(self):
+        result = run_scenario("deregister_task_definition", family_size=10)
+        self.assertDictEqual(result.calls_by_operation, {"DescribeServices": 1, "DeregisterTaskDefinition": 2})
+
+    def test_ecs_deploy(self):
+        result = run_scenario("ecs_deploy", family_size=10)
+        self.assertEqual(result.calls_by_operation["RegisterTaskDefinition"], 3)
+        self.assertEqual(result.calls_by_operation["UpdateService"], 1)
+        self.assertEqual(result.throttled, 0)
+
+    def test_ecs_redeploy(self):
+        # The unchanged task definitions are reused and the service already runs the production one
+        result = run_scenario("ecs_redeploy", family_size=10)
+        self.assertNotIn("RegisterTaskDefinition", result.calls_by_operation)
+        self.assertNotIn("UpdateService", result.calls_by_operation)
+        self.assertNotIn("DeregisterTaskDefinition", result.calls_by_operation)
+
+    # Skips the backoff of the retries
+    @patch("time.sleep")
+    def test_throttling(self, _):
+        result = run_scenario("get_active_task_definition_arn_by_tag_bulk", family_size=10, throttle_rate=0.5)
+        self.assertGreater(result.throttled, 0)
+        self.assertEqual(result.calls, 2 + result.throttled)
+
+    def test_benchmark_command(self):
+        result = CliRunner().invoke(
+            benchmark,
+            args=("--scenario", "create_task_definition", "--family-size", "2", "--latency", "0", "--json"),
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('"scenario": "create_task_definition"', result.output)
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.rate_limiter import RateLimiter
+from tests.utils import TEST_AWS_DEFAULT_REGION
+
+
+class ClientFactoryTestCase(unittest.TestCase):
+    def test_client(self):
+        clients = ClientFactory(region_name=TEST_AWS_DEFAULT_REGION, max_pool_connections=20)
+
+        with patch.object(clients._session, attribute="client", wraps=clients._session.client) as session_client_patch:
+            ecs_client = clients.client("ecs")
+            self.assertIs(clients.client("ecs"), ecs_client)
+            self.assertIsNot(clients.client("ecr"), ecs_client)
+
+        self.assertEqual(session_client_patch.call_count, 2)
+        self.assertEqual(ecs_client.meta.region_name, TEST_AWS_DEFAULT_REGION)
+        self.assertEqual(ecs_client.meta.config.max_pool_connections, 20)
+        self.assertEqual(ecs_client.meta.config.retries["mode"], "adaptive")
+
+    def test_client_rate_limiter(self):
+        rate_limiter = RateLimiter()
+        clients = ClientFactory(region_name=TEST_AWS_DEFAULT_REGION, rate_limiter=rate_limiter)
+
+        with patch.object(rate_limiter, attribute="attach") as attach_patch:
+            ecs_client = clients.client("ecs")
+            ecr_client = clients.client("ecr")
+            clients.client("resourcegroupstaggingapi")
+
+        self.assertListEqual([call.args[0] for call in attach_patch.call_args_list], [ecs_client, ecr_client])
@@ -4,10 +4,17 @@ from unittest.mock import Mock, patch
 import boto3
 
 from actions_helper.commands import create_task_definition as create_task_definition_command
-from actions_helper.commands.create_task_definition import create_task_definition, get_rendered_task_definition
+from actions_helper.commands.create_task_definition import (
+    FINGERPRINT_TAG_KEY,
+    create_task_definition,
+    get_rendered_task_definition,
+    get_task_definition_fingerprint,
+)
 from actions_helper.utils import PLACEHOLDER_TEXT
 from tests.utils import TEST_APPLICATION_ID
 
+TEST_IMAGE_DIGEST = f"sha256:{'0' * 64}"
+
 
 class CreateTaskDefinitionTestCase(unittest.TestCase):
     @patch.object(boto3, attribute="client")
@@ -70,17 +77,15 @@ class CreateTaskDefinitionTestCase(unittest.TestCase):
             self.assertNotIn("foo", task_definition.items())
 
     @patch("actions_helper.commands.create_task_definition.KEYS_TO_DELETE_FROM_TASK_DEFINITION", [])
-    @patch("actions_helper.commands.create_task_definition.get_active_task_definition_arn_by_tag", Mock())
     def test_create_task_definition(self):
         with (
             patch.object(
                 self.ecs_client,
                 attribute="describe_task_definition",
-                side_effect=Mock(
-                    return_value={
-                        "taskDefinition": {"containerDefinitions": [{"image": PLACEHOLDER_TEXT}], "foo": "bar"},
-                    },
-                ),
+                # Every call returns a new response, like the real client
+                side_effect=lambda **_: {
+                    "taskDefinition": {"containerDefinitions": [{"image": PLACEHOLDER_TEXT}], "foo": "bar"},
+                },
             ),
             patch.object(
                 self.ecs_client,
@@ -88,18 +93,67 @@ class CreateTaskDefinitionTestCase(unittest.TestCase):
                 side_effect=Mock(
                     return_value={"taskDefinition": {"taskDefinitionArn": "deployed_task_definition_arn"}},
                 ),
-            ),
+            ) as register_task_definition_patch,
             patch.object(
                 create_task_definition_command,
-                attribute="get_active_task_definition_arn_by_tag",
-                side_effect=Mock(return_value="test_arn"),
-            ),
+                attribute="TaskDefinitionFamily",
+            ) as task_definition_family_patch,
         ):
+            task_definition_family_patch.return_value.get_active_task_definition_arn_by_tag.return_value = "test_arn"
+            task_definition_family_patch.return_value.get_task_definition_tags.return_value = []
             output = create_task_definition(
                 ecs_client=self.ecs_client,
                 application_id=TEST_APPLICATION_ID,
                 image_uri=self.image_uri,
                 deployment_tag="GitHub Actions Deployment",
+                image_digest=TEST_IMAGE_DIGEST,
             )
             self.assertEqual(output.previous_task_definition_arn, "test_arn")
             self.assertEqual(output.latest_task_definition_arn, "deployed_task_definition_arn")
+            self.assertFalse(output.reused)
+
+            with self.subTest("Unchanged task definition"):
+                task_definition_family_patch.return_value.get_task_definition_tags.return_value = [
+                    {
+                        "key": FINGERPRINT_TAG_KEY,
+                        "value": register_task_definition_patch.call_args.kwargs["tags"][2]["value"],
+                    },
+                ]
+                output = create_task_definition(
+                    ecs_client=self.ecs_client,
+                    application_id=TEST_APPLICATION_ID,
+                    image_uri=self.image_uri,
+                    deployment_tag="GitHub Actions Deployment",
+                    image_digest=TEST_IMAGE_DIGEST,
+                )
+                self.assertEqual(output.latest_task_definition_arn, "test_arn")
+                self.assertTrue(output.reused)
+                register_task_definition_patch.assert_called_once()
+
+            # The tag of the image was moved to another image, or the image it points to is not known
+            for image_digest in (f"sha256:{'1' * 64}", None):
+                with self.subTest("Changed image", image_digest=image_digest):
+                    register_task_definition_patch.reset_mock()
+                    output = create_task_definition(
+                        ecs_client=self.ecs_client,
+                        application_id=TEST_APPLICATION_ID,
+                        image_uri=self.image_uri,
+                        deployment_tag="GitHub Actions Deployment",
+                        image_digest=image_digest,
+                    )
+                    self.assertFalse(output.reused)
+                    register_task_definition_patch.assert_called_once()
+
+    def test_task_definition_fingerprint(self):
+        self.assertEqual(
+            get_task_definition_fingerprint({"family": "foo", "containerDefinitions": [{"image": self.image_uri}]}),
+            get_task_definition_fingerprint({"containerDefinitions": [{"image": self.image_uri}], "family": "foo"}),
+        )
+        self.assertNotEqual(
+            get_task_definition_fingerprint({"containerDefinitions": [{"image": self.image_uri}]}),
+            get_task_definition_fingerprint({"containerDefinitions": [{"image": "test/dummy:master-0000000"}]}),
+        )
+        self.assertNotEqual(
+            get_task_definition_fingerprint({"containerDefinitions": [{"image": self.image_uri}]}, TEST_IMAGE_DIGEST),
+            get_task_definition_fingerprint({"containerDefinitions": [{"image": self.image_uri}]}, "sha256:moved"),
+        )
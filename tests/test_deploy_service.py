@@ -0,0 +1,242 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from typing import Optional
+from unittest.mock import patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands.deploy_service import FAST_ROLLOUT_DEPLOYMENT_CONFIGURATION, deploy_service
+from actions_helper.commands.get_image_uri import get_image
+from actions_helper.commands.wait_for_service_stable import DeploymentFailedError
+from actions_helper.instrumentation import Instrumentation
+from actions_helper.outputs import DeployServiceOutput
+from actions_helper.poller import BatchPoller
+from tests.fake_aws import (
+    APPLICATION,
+    DEPLOYMENT_TAG,
+    ENVIRONMENT,
+    IMAGE_TAG,
+    SERVICE,
+    TEST_REGION,
+    FakeAwsBackend,
+    FakeAwsError,
+    break_deployment,
+    make_backend,
+)
+
+
+def deploy(
+    backend: FakeAwsBackend,
+    poller: Optional[BatchPoller] = None,
+    fast_rollout: bool = False,
+    desired_count: Optional[int] = 1,
+) -> DeployServiceOutput:
+    clients = ClientFactory(region_name=TEST_REGION)
+    image = get_image(ecr_client=clients.client("ecr"), ecr_repository=APPLICATION, tag=IMAGE_TAG)
+    return deploy_service(
+        ecs_client=clients.client("ecs"),
+        tagging_client=clients.client("resourcegroupstaggingapi"),
+        logs_client=clients.client("logs"),
+        application=APPLICATION,
+        environment=ENVIRONMENT,
+        image_uri=image.image_uri,
+        image_digest=image.image_digest,
+        deployment_tag=DEPLOYMENT_TAG,
+        run_preflight=True,
+        desired_count=desired_count,
+        poller=poller,
+        fast_rollout=fast_rollout,
+    )
+
+
+class DeployServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.output = io.StringIO()
+        redirect = redirect_stdout(self.output)
+        redirect.__enter__()
+        self.addCleanup(redirect.__exit__, None, None, None)
+
+    def test_desired_count(self):
+        for desired_count in (None, 2):
+            backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+            with self.subTest(desired_count=desired_count), backend.patch_client_factory():
+                deploy(backend, desired_count=desired_count)
+                self.assertEqual(backend.services[(ENVIRONMENT, SERVICE)]["desiredCount"], desired_count or 1)
+
+    def test_shared_poller(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        with (
+            backend.patch_client_factory(),
+            BatchPoller(ClientFactory(region_name=TEST_REGION).client("ecs")) as poller,
+        ):
+            output = deploy(backend, poller=poller)
+
+        self.assertEqual(
+            backend.services[(ENVIRONMENT, SERVICE)]["deployments"][0]["taskDefinition"],
+            output.task_definition_arn,
+        )
+        # The preflight describes the stopped task once more, outside of the poller
+        self.assertEqual(backend.calls["DescribeTasks"], 2)
+
+    def test_service_snapshot(self):
+        # The preflight describes the service, the waiter once more after the update, and the deregistration reuses
+        # the description of the waiter
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        with backend.patch_client_factory():
+            deploy(backend)
+
+        self.assertEqual(backend.calls["DescribeServices"], 2)
+
+    def test_fast_rollout(self):
+        # The fast rollout only applies to its own deployment, the next one runs with the configuration of the service
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        deployment_configuration = backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"]
+        with (
+            backend.patch_client_factory(),
+            patch.object(backend, attribute="_update_service", side_effect=backend._update_service) as update_service,
+        ):
+            deploy(backend, fast_rollout=True)
+            backend.add_image(repository=APPLICATION, tag=IMAGE_TAG)
+            deploy(backend)
+
+        self.assertEqual(
+            [call.args[0].get("deploymentConfiguration") for call in update_service.call_args_list],
+            [FAST_ROLLOUT_DEPLOYMENT_CONFIGURATION, deployment_configuration, None],
+        )
+        self.assertEqual(backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"], deployment_configuration)
+
+        with self.subTest("Without a circuit breaker"):
+            del backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"]["deploymentCircuitBreaker"]
+            backend.add_image(repository=APPLICATION, tag=IMAGE_TAG)
+            with backend.patch_client_factory():
+                deploy(backend, fast_rollout=True)
+            self.assertEqual(
+                backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"]["deploymentCircuitBreaker"],
+                {"enable": False, "rollback": False},
+            )
+
+    @patch(
+        "actions_helper.commands.deploy_service.wait_for_service_stable",
+        side_effect=DeploymentFailedError("Deployment failed"),
+    )
+    def test_fast_rollout_failed(self, _):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        deployment_configuration = backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"]
+        with backend.patch_client_factory(), self.assertRaises(SystemExit):
+            deploy(backend, fast_rollout=True)
+
+        self.assertEqual(backend.services[(ENVIRONMENT, SERVICE)]["deploymentConfiguration"], deployment_configuration)
+
+    def test_validation_failed(self):
+        # Every problem is reported before anything is registered, so there is nothing to deregister either
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        break_deployment(backend)
+        with backend.patch_client_factory(), self.assertRaises(SystemExit):
+            deploy(backend)
+
+        self.assertEqual(self.output.getvalue().count("::error"), 4)
+        self.assertNotIn("RegisterTaskDefinition", backend.calls)
+        self.assertNotIn("DeregisterTaskDefinition", backend.calls)
+
+    def test_redeploy(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        with backend.patch_client_factory():
+            first_output = deploy(backend)
+            backend.reset_calls()
+            second_output = deploy(backend)
+
+        self.assertEqual(first_output, second_output)
+        self.assertIn("Service already runs the unchanged task definition, skipping update", self.output.getvalue())
+        self.assertEqual(backend.calls["RegisterTaskDefinition"], 0)
+        self.assertEqual(backend.calls["UpdateService"], 0)
+
+    def test_redeploy_moved_image_tag(self):
+        # A new image pushed with the same tag renders the same task definition, but has to be deployed
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        with backend.patch_client_factory():
+            first_output = deploy(backend)
+            backend.add_image(repository=APPLICATION, tag=IMAGE_TAG)
+            backend.reset_calls()
+            second_output = deploy(backend)
+
+        self.assertNotEqual(first_output, second_output)
+        self.assertEqual(
+            backend.services[(ENVIRONMENT, SERVICE)]["deployments"][0]["taskDefinition"],
+            second_output.task_definition_arn,
+        )
+        self.assertEqual(backend.calls["RegisterTaskDefinition"], 3)
+        self.assertEqual(backend.calls["UpdateService"], 1)
+
+    def test_preflight_logs(self):
+        preflight_family = f"{APPLICATION}-preflight-{ENVIRONMENT}"
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        for definition in backend.task_definitions.values():
+            if definition["family"] == preflight_family:
+                definition["containerDefinitions"][0]["logConfiguration"] = {
+                    "logDriver": "awslogs",
+                    "options": {"awslogs-group": f"/ecs/{APPLICATION}", "awslogs-stream-prefix": "ecs"},
+                }
+        # The preflight is the first task run by the backend
+        backend.log_events[(f"/ecs/{APPLICATION}", f"ecs/{preflight_family}/0")] = ["Migrating...", "Migrated"]
+
+        with backend.patch_client_factory():
+            deploy(backend)
+        self.assertIn(f"[{preflight_family}] Migrating...\n[{preflight_family}] Migrated\n", self.output.getvalue())
+
+        with (
+            backend.patch_client_factory(),
+            patch.object(backend, attribute="_get_log_events", side_effect=FakeAwsError("AccessDenied", "")),
+        ):
+            deploy(backend)
+        self.assertIn(f"Following the logs of {preflight_family} failed", self.output.getvalue())
+
+
+@patch(
+    "actions_helper.commands.deploy_service.wait_for_service_stable",
+    side_effect=DeploymentFailedError("Deployment failed"),
+)
+class DeployServiceRollbackTestCase(unittest.TestCase):
+    def deploy(self, family_size: int, rollback_on_failure: bool) -> tuple[str, Instrumentation]:
+        backend = make_backend(family_size=family_size, latency=0, throttle_rate=0)
+        instrumentation = Instrumentation()
+        output = io.StringIO()
+
+        with backend.patch_client_factory(), redirect_stdout(output), self.assertRaises(SystemExit):
+            deploy_service(
+                ecs_client=ClientFactory(region_name=TEST_REGION).client("ecs"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=f"{APPLICATION}:latest",
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=False,
+                desired_count=1,
+                instrumentation=instrumentation,
+                rollback_on_failure=rollback_on_failure,
+            )
+
+        self.backend = backend
+        self.output = output.getvalue()
+        return backend.services[(ENVIRONMENT, SERVICE)]["deployments"][0]["taskDefinition"], instrumentation
+
+    def test_rollback(self, _):
+        with self.subTest("Rollback"):
+            task_definition_arn, instrumentation = self.deploy(family_size=3, rollback_on_failure=True)
+            self.assertTrue(task_definition_arn.endswith(f"/{SERVICE}:3"))
+            self.assertEqual(self.backend.calls["UpdateService"], 2)
+            self.assertIn(f"rollback:{SERVICE}", [phase.name for phase in instrumentation.phases])
+            self.assertIn(f"Service {SERVICE} recovered on {task_definition_arn}", self.output)
+
+        with self.subTest("No rollback"):
+            task_definition_arn, instrumentation = self.deploy(family_size=3, rollback_on_failure=False)
+            self.assertTrue(task_definition_arn.endswith(f"/{SERVICE}:4"))
+            self.assertEqual(self.backend.calls["UpdateService"], 1)
+
+        with self.subTest("Initial deployment"):
+            task_definition_arn, instrumentation = self.deploy(family_size=1, rollback_on_failure=True)
+            self.assertTrue(task_definition_arn.endswith(f"/{SERVICE}:2"))
+            self.assertIn("No previous task definition to roll back to", self.output)
+
+    @patch("actions_helper.commands.rollback_service.wait_for_service_stable", side_effect=DeploymentFailedError)
+    def test_rollback_failed(self, *_):
+        self.deploy(family_size=3, rollback_on_failure=True)
+        self.assertIn(f"Rollback of service {SERVICE} failed", self.output)
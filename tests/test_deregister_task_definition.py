@@ -243,3 +243,70 @@ class DeregisterTaskDefinitionTestCase(unittest.TestCase):
                     call(taskDefinition=production_task_definition_2),
                 ),
             )
+
+    def test_deregister_task_definition_service_not_stable(self):
+        local_task_definition_1 = production_task_definition_1 = Mock()
+        local_task_definition_2 = production_task_definition_2 = Mock()
+        with (
+            self.subTest("Service runs the new task definition, but did not become stable"),
+            patch.object(
+                self.ecs_client,
+                attribute="describe_services",
+                return_value=self.describe_service_return_value(status="PRIMARY", arn=production_task_definition_2),
+            ),
+            patch.object(self.ecs_client, attribute="deregister_task_definition") as ecs_deregister_patch,
+            self.assertRaises(SystemExit),
+        ):
+            deregister_task_definition(
+                ecs_client=self.ecs_client,
+                service="",
+                cluster="",
+                local_task_definition_output=CreateTaskDefinitionOutput(
+                    previous_task_definition_arn=local_task_definition_1,
+                    latest_task_definition_arn=local_task_definition_2,
+                ),
+                production_task_definition_output=CreateTaskDefinitionOutput(
+                    previous_task_definition_arn=production_task_definition_1,
+                    latest_task_definition_arn=production_task_definition_2,
+                ),
+                preflight_task_definition_output=None,
+                run_preflight=False,
+                service_stable=False,
+            )
+
+        ecs_deregister_patch.assert_has_calls(
+            (
+                call(taskDefinition=local_task_definition_2),
+                call(taskDefinition=production_task_definition_2),
+            ),
+        )
+
+    def test_deregister_task_definition_reused(self):
+        local_task_definition_1, local_task_definition_2 = Mock(), Mock()
+        production_task_definition = Mock()
+        with (
+            self.subTest("Unchanged production task definition was reused"),
+            patch.object(
+                self.ecs_client,
+                attribute="describe_services",
+                return_value=self.describe_service_return_value(status="PRIMARY", arn=production_task_definition),
+            ),
+            patch.object(self.ecs_client, attribute="deregister_task_definition") as ecs_deregister_patch,
+        ):
+            deregister_task_definition(
+                ecs_client=self.ecs_client,
+                service="",
+                cluster="",
+                local_task_definition_output=CreateTaskDefinitionOutput(
+                    previous_task_definition_arn=local_task_definition_1,
+                    latest_task_definition_arn=local_task_definition_2,
+                ),
+                production_task_definition_output=CreateTaskDefinitionOutput(
+                    previous_task_definition_arn=production_task_definition,
+                    latest_task_definition_arn=production_task_definition,
+                ),
+                preflight_task_definition_output=None,
+                run_preflight=False,
+            )
+
+        ecs_deregister_patch.assert_called_once_with(taskDefinition=local_task_definition_1)
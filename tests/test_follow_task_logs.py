@@ -0,0 +1,96 @@
+import io
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands.follow_task_logs import (
+    TaskLogStream,
+    follow_task_logs,
+    get_task_log_stream,
+    poll_task_logs,
+    print_new_task_logs,
+)
+from tests.fake_aws import TEST_ACCOUNT_ID, TEST_REGION, FakeAwsBackend, FakeAwsError
+
+TEST_TASK_ARN = f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task/dev/0123456789abcdef"
+TEST_LOG_STREAM = TaskLogStream(container="app-preflight-dev", group="/ecs/app", name="preflight/app-preflight-dev/0")
+
+
+def make_task_definition(log_configuration: dict) -> dict:
+    return {"containerDefinitions": [{"name": "app-preflight-dev", "logConfiguration": log_configuration}]}
+
+
+class FollowTaskLogsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeAwsBackend()
+        self.output = io.StringIO()
+        for context in (self.backend.patch_client_factory(), redirect_stdout(self.output)):
+            context.__enter__()
+            self.addCleanup(context.__exit__, None, None, None)
+        self.logs_client = ClientFactory(region_name=TEST_REGION).client("logs")
+
+    def test_get_task_log_stream(self):
+        for name, log_configuration, expected_log_stream in (
+            (
+                "awslogs",
+                {
+                    "logDriver": "awslogs",
+                    "options": {"awslogs-group": "/ecs/app", "awslogs-stream-prefix": "preflight"},
+                },
+                TaskLogStream(
+                    container="app-preflight-dev",
+                    group="/ecs/app",
+                    name="preflight/app-preflight-dev/0123456789abcdef",
+                ),
+            ),
+            ("No stream prefix", {"logDriver": "awslogs", "options": {"awslogs-group": "/ecs/app"}}, None),
+            ("Other log driver", {"logDriver": "splunk", "options": {"awslogs-stream-prefix": "preflight"}}, None),
+            ("No log configuration", {}, None),
+        ):
+            with self.subTest(name):
+                self.assertEqual(
+                    get_task_log_stream(make_task_definition(log_configuration), TEST_TASK_ARN),
+                    expected_log_stream,
+                )
+
+    def test_print_new_task_logs(self):
+        with self.subTest("Stream not created yet"):
+            self.assertIsNone(print_new_task_logs(self.logs_client, TEST_LOG_STREAM, next_token=None))
+
+        self.backend.log_events[(TEST_LOG_STREAM.group, TEST_LOG_STREAM.name)] = ["Migrating...\n", "Migrated"]
+        with self.subTest("New lines"):
+            next_token = print_new_task_logs(self.logs_client, TEST_LOG_STREAM, next_token=None)
+            self.assertEqual(next_token, "f/2")
+            self.assertEqual(
+                self.output.getvalue(),
+                "[app-preflight-dev] Migrating...\n[app-preflight-dev] Migrated\n",
+            )
+
+        with self.subTest("No new lines"):
+            self.assertEqual(print_new_task_logs(self.logs_client, TEST_LOG_STREAM, next_token), next_token)
+            self.assertEqual(self.output.getvalue().count("Migrat"), 2)
+
+        with (
+            self.subTest("Error"),
+            patch.object(self.backend, attribute="_get_log_events", side_effect=FakeAwsError("AccessDenied", "")),
+        ):
+            stopped = threading.Event()
+            stopped.set()
+            poll_task_logs(self.logs_client, TEST_LOG_STREAM, stopped)
+            self.assertIn("Following the logs of app-preflight-dev failed", self.output.getvalue())
+
+    @patch("actions_helper.commands.follow_task_logs.TASK_LOGS_POLL_DELAY", new=0.01)
+    def test_follow_task_logs(self):
+        messages = self.backend.log_events.setdefault((TEST_LOG_STREAM.group, TEST_LOG_STREAM.name), [])
+
+        with follow_task_logs(self.logs_client, TEST_LOG_STREAM):
+            messages.append("Step 1")
+            time.sleep(0.1)
+            self.assertEqual(self.output.getvalue(), "[app-preflight-dev] Step 1\n")
+            # Written right before the task stopped
+            messages.append("Step 2")
+
+        self.assertEqual(self.output.getvalue(), "[app-preflight-dev] Step 1\n[app-preflight-dev] Step 2\n")
@@ -0,0 +1,215 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands import gc_task_definitions as gc_task_definitions_command
+from actions_helper.commands.gc_task_definitions import (
+    GcStateMismatchError,
+    gc_task_definitions,
+    get_deployed_task_definition_arns,
+    get_task_definition_family,
+)
+from tests.fake_aws import TEST_REGION, FakeAwsBackend, FakeAwsError
+
+TEST_FAMILY = "foo-dev"
+TEST_DEPLOYMENT_TAG = "GitHub Actions Deployment"
+
+
+class GcTaskDefinitionsTestCase(unittest.TestCase):
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.state_file = Path(temporary_directory.name) / "state.json"
+
+        self.backend = FakeAwsBackend()
+        # Newest first: 1 Pulumi and 12 deployed revisions, the oldest deployed one still runs in a deployment
+        self.pulumi_arn = self.backend.register_task_definition(TEST_FAMILY, {"created_by": "Pulumi"})
+        self.deployed_arns = tuple(
+            reversed(
+                [
+                    self.backend.register_task_definition(
+                        TEST_FAMILY,
+                        {"created_by": TEST_DEPLOYMENT_TAG, "fingerprint": str(revision)},
+                    )
+                    for revision in range(12)
+                ],
+            ),
+        )
+        self.backend.add_service(cluster="dev", service=TEST_FAMILY, task_definition_arn=self.deployed_arns[-1])
+        # Other families sharing the prefix are not collected
+        self.other_family_arn = self.backend.register_task_definition(f"{TEST_FAMILY}-worker", {})
+        self.inactive_arn = self.backend.register_task_definition(TEST_FAMILY, {"created_by": "Manual"})
+        self.backend.task_definitions[self.inactive_arn]["status"] = "INACTIVE"
+
+        patcher = self.backend.patch_client_factory()
+        patcher.__enter__()
+        self.addCleanup(patcher.__exit__, None, None, None)
+        self.clients = ClientFactory(region_name=TEST_REGION)
+
+    def gc(self, **kwargs):
+        return gc_task_definitions(
+            ecs_client=self.clients.client("ecs"),
+            tagging_client=self.clients.client("resourcegroupstaggingapi"),
+            **{"families": (TEST_FAMILY,), "clusters": ("dev",), "keep": 3, "state_file": str(self.state_file)}
+            | kwargs,
+        )
+
+    def status(self, task_definition_arn: str) -> str:
+        return self.backend.task_definitions[task_definition_arn]["status"]
+
+    def test_get_task_definition_family(self):
+        self.assertEqual(get_task_definition_family(self.pulumi_arn), TEST_FAMILY)
+
+    def test_dry_run(self):
+        output = self.gc(dry_run=True)
+
+        self.assertTupleEqual(output.kept, (*self.deployed_arns[:3], self.deployed_arns[-1], self.pulumi_arn))
+        self.assertTupleEqual(output.deregistered, ())
+        self.assertEqual(self.backend.calls["DeregisterTaskDefinition"], 0)
+        self.assertEqual(self.backend.calls["DeleteTaskDefinitions"], 0)
+        self.assertFalse(self.state_file.exists())
+
+    def test_gc(self):
+        output = self.gc()
+
+        self.assertTupleEqual(output.deregistered, self.deployed_arns[3:-1])
+        self.assertTupleEqual(output.deleted, (self.inactive_arn, *self.deployed_arns[3:-1]))
+        self.assertTupleEqual(output.failed, ())
+        for task_definition_arn in output.kept + (self.other_family_arn,):
+            self.assertEqual(self.status(task_definition_arn), "ACTIVE")
+        for task_definition_arn in output.deleted:
+            self.assertEqual(self.status(task_definition_arn), "DELETE_IN_PROGRESS")
+        # 9 revisions are deleted in batches of up to 10
+        self.assertEqual(self.backend.calls["DeleteTaskDefinitions"], 1)
+        self.assertFalse(self.state_file.exists())
+
+    def test_gc_deployed_inactive_revision(self):
+        # A deregistered revision which still runs in a deployment is not deleted
+        deployed_inactive_arn = self.backend.register_task_definition(TEST_FAMILY, {"created_by": "Manual"})
+        self.backend.task_definitions[deployed_inactive_arn]["status"] = "INACTIVE"
+        self.backend.add_service(
+            cluster="dev",
+            service=f"{TEST_FAMILY}-worker",
+            task_definition_arn=deployed_inactive_arn,
+        )
+
+        output = self.gc()
+
+        self.assertIn(deployed_inactive_arn, output.kept)
+        self.assertNotIn(deployed_inactive_arn, output.deleted)
+        self.assertEqual(self.status(deployed_inactive_arn), "INACTIVE")
+
+    def test_gc_without_state_file(self):
+        output = self.gc(state_file=None)
+        self.assertEqual(len(output.deleted), 9)
+
+    def test_get_deployed_task_definition_arns(self):
+        ecs_client = Mock()
+        ecs_client.list_services.side_effect = (
+            {"serviceArns": [f"service_{index}" for index in range(11)], "nextToken": "token"},
+            {"serviceArns": ["service_11"]},
+        )
+        ecs_client.describe_services.side_effect = lambda cluster, services: {
+            "services": [{"deployments": [{"taskDefinition": f"{service}_task_definition"}]} for service in services],
+        }
+
+        task_definition_arns = get_deployed_task_definition_arns(ecs_client, clusters=("dev",))
+
+        self.assertEqual(len(task_definition_arns), 12)
+        self.assertEqual(ecs_client.describe_services.call_count, 3)
+        self.assertEqual(ecs_client.list_services.call_args.kwargs["nextToken"], "token")
+
+    def test_gc_resume(self):
+        deregister_task_definitions = gc_task_definitions_command.deregister_task_definitions
+
+        with (
+            self.subTest("Interrupted"),
+            patch.object(gc_task_definitions_command, attribute="CHECKPOINT_INTERVAL", new=4),
+            patch.object(
+                gc_task_definitions_command,
+                attribute="delete_task_definitions",
+                side_effect=KeyboardInterrupt,
+            ),
+            self.assertRaises(KeyboardInterrupt),
+        ):
+            self.gc()
+        state = json.loads(self.state_file.read_text())
+        self.assertEqual(len(state["deregistered"]), 8)
+        self.assertListEqual(state["deleted"], [])
+
+        self.backend.reset_calls()
+        with (
+            self.subTest("Resumed"),
+            patch.object(
+                gc_task_definitions_command,
+                attribute="deregister_task_definitions",
+                wraps=deregister_task_definitions,
+            ) as deregister_task_definitions_patch,
+        ):
+            output = self.gc()
+
+        deregister_task_definitions_patch.assert_called_once()
+        self.assertEqual(len(output.deleted), 9)
+        # The families were not scanned again and the deregistered revisions were not deregistered again
+        self.assertNotIn("ListTaskDefinitions", self.backend.calls)
+        self.assertNotIn("DeregisterTaskDefinition", self.backend.calls)
+        self.assertFalse(self.state_file.exists())
+
+    def test_gc_resume_other_arguments(self):
+        with (
+            patch.object(
+                gc_task_definitions_command,
+                attribute="delete_task_definitions",
+                side_effect=KeyboardInterrupt,
+            ),
+            self.assertRaises(KeyboardInterrupt),
+        ):
+            self.gc()
+        state = self.state_file.read_text()
+
+        for name, kwargs in (
+            ("Other families", {"families": (f"{TEST_FAMILY}-worker",)}),
+            ("Other clusters", {"clusters": ("dev", "staging")}),
+            ("Other number of kept revisions", {"keep": 5}),
+        ):
+            with self.subTest(name), self.assertRaises(GcStateMismatchError):
+                self.gc(**kwargs)
+            # The state of the interrupted run is kept
+            self.assertEqual(self.state_file.read_text(), state)
+
+    def test_gc_failures(self):
+        with (
+            patch.object(
+                self.backend,
+                attribute="_deregister_task_definition",
+                side_effect=FakeAwsError("ClientException", "Deregistration failed"),
+            ),
+            patch.object(
+                self.backend,
+                attribute="_delete_task_definitions",
+                side_effect=lambda body: {
+                    "taskDefinitions": [],
+                    "failures": [{"arn": arn, "reason": "Deletion failed"} for arn in body["taskDefinitions"]],
+                },
+            ),
+        ):
+            output = self.gc()
+
+        self.assertTupleEqual(output.failed, (*self.deployed_arns[3:-1], self.inactive_arn))
+        # Failed runs can be resumed
+        self.assertTrue(self.state_file.exists())
+
+    def test_gc_delete_error(self):
+        with patch.object(
+            self.backend,
+            attribute="_delete_task_definitions",
+            side_effect=FakeAwsError("ClientException", "Deletion failed"),
+        ):
+            output = self.gc()
+
+        self.assertTupleEqual(output.deregistered, self.deployed_arns[3:-1])
+        self.assertTupleEqual(output.failed, (self.inactive_arn, *self.deployed_arns[3:-1]))
+        self.assertTrue(self.state_file.exists())
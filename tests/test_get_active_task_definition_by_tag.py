@@ -1,14 +1,21 @@
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
 import boto3
+from botocore.exceptions import ClientError
 
 from actions_helper.commands.get_active_task_definition_by_tag import (
+    MAX_TAGGING_RESOURCE_ARNS,
     NonSingleValueError,
     Tag,
+    TaskDefinitionFamily,
     format_tags,
     get_active_task_definition_arn_by_tag,
+    get_task_definition_tags_in_bulk,
+    iter_active_task_definition_tags,
 )
+from actions_helper.task_definition_cache import TaskDefinitionCache
 from tests.utils import TEST_APPLICATION_ID
 
 
@@ -159,3 +166,249 @@ class GetTaskDefinitionByTagTestCase(unittest.TestCase):
                 allow_initial_deployment=True,
             )
             self.assertEqual(arn, "")
+
+    def test_get_task_definition_tags_in_bulk(self):
+        tagging_client = Mock()
+        task_definition_arns = tuple(f"arn_{index}" for index in range(MAX_TAGGING_RESOURCE_ARNS + 1))
+        tagging_client.get_resources.side_effect = lambda ResourceARNList: {
+            "ResourceTagMappingList": [
+                {"ResourceARN": arn, "Tags": [{"Key": "created_by", "Value": "Pulumi"}]} for arn in ResourceARNList
+            ],
+        }
+
+        tags_by_arn = get_task_definition_tags_in_bulk(tagging_client, task_definition_arns)
+
+        self.assertEqual(tagging_client.get_resources.call_count, 2)
+        self.assertEqual(tuple(tags_by_arn), task_definition_arns)
+        self.assertEqual(tags_by_arn[task_definition_arns[0]], [self.pulumi_tag])
+
+    def test_iter_active_task_definition_tags(self):
+        tagging_client = Mock()
+        tagging_client.get_resources.return_value = {
+            # The second task definition is not yet known to the Tagging API
+            "ResourceTagMappingList": [{"ResourceARN": "arn_1", "Tags": [{"Key": "created_by", "Value": "Pulumi"}]}],
+        }
+
+        with (
+            patch.object(
+                self.ecs_client,
+                attribute="list_task_definitions",
+                side_effect=(
+                    {"taskDefinitionArns": ["arn_1", "arn_2"], "nextToken": "token"},
+                    {"taskDefinitionArns": ["arn_3"]},
+                ),
+            ) as list_task_definitions_patch,
+            patch.object(
+                self.ecs_client,
+                attribute="describe_task_definition",
+                return_value={"tags": [{"key": "created_by", "value": "dummy"}]},
+            ) as describe_task_definition_patch,
+        ):
+            with self.subTest("All pages"):
+                task_definitions = tuple(
+                    iter_active_task_definition_tags(
+                        ecs_client=self.ecs_client,
+                        task_definition_family_prefix=TEST_APPLICATION_ID,
+                        tagging_client=tagging_client,
+                    ),
+                )
+                self.assertEqual(
+                    task_definitions,
+                    (
+                        ("arn_1", [self.pulumi_tag]),
+                        ("arn_2", [{"key": "created_by", "value": "dummy"}]),
+                        ("arn_3", [{"key": "created_by", "value": "dummy"}]),
+                    ),
+                )
+                self.assertEqual(list_task_definitions_patch.call_args.kwargs["nextToken"], "token")
+                self.assertEqual(describe_task_definition_patch.call_count, 2)
+
+            list_task_definitions_patch.reset_mock(side_effect=True)
+            list_task_definitions_patch.return_value = {"taskDefinitionArns": ["arn_1", "arn_2"], "nextToken": "token"}
+            with self.subTest("Revision horizon"):
+                task_definitions = tuple(
+                    iter_active_task_definition_tags(
+                        ecs_client=self.ecs_client,
+                        task_definition_family_prefix=TEST_APPLICATION_ID,
+                        tagging_client=tagging_client,
+                        max_revisions=1,
+                    ),
+                )
+                self.assertEqual(task_definitions, (("arn_1", [self.pulumi_tag]),))
+                list_task_definitions_patch.assert_called_once()
+
+    def test_iter_active_task_definition_tags_indexed(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        task_definition_cache = TaskDefinitionCache(temporary_directory.name)
+        arns = {
+            revision: f"arn:aws:ecs:eu-central-1:123456789012:task-definition/{TEST_APPLICATION_ID}:{revision}"
+            for revision in range(1, 5)
+        }
+        dummy_tags = [{"key": "created_by", "value": "dummy"}]
+
+        tagging_client = Mock()
+        tagging_client.get_resources.side_effect = lambda ResourceARNList: {
+            # The newest revision is still missing from the eventually consistent Tagging API
+            "ResourceTagMappingList": [
+                {"ResourceARN": arn, "Tags": [{"Key": "created_by", "Value": "Pulumi"}]}
+                for arn in ResourceARNList
+                if arn != arns[4]
+            ],
+        }
+
+        def scan(revisions: tuple[int, ...]) -> tuple[tuple[str, list[dict[str, str]]], ...]:
+            with patch.object(
+                self.ecs_client,
+                attribute="list_task_definitions",
+                return_value={"taskDefinitionArns": [arns[revision] for revision in revisions]},
+            ):
+                return tuple(
+                    iter_active_task_definition_tags(
+                        ecs_client=self.ecs_client,
+                        task_definition_family_prefix=TEST_APPLICATION_ID,
+                        tagging_client=tagging_client,
+                        task_definition_cache=task_definition_cache,
+                    ),
+                )
+
+        with patch.object(
+            self.ecs_client,
+            attribute="describe_task_definition",
+            return_value={"taskDefinition": {}, "tags": dummy_tags},
+        ) as describe_task_definition_patch:
+            with self.subTest("First scan"):
+                self.assertEqual(
+                    scan((3, 2, 1)),
+                    ((arns[3], [self.pulumi_tag]), (arns[2], [self.pulumi_tag]), (arns[1], [self.pulumi_tag])),
+                )
+                tagging_client.get_resources.assert_called_once_with(ResourceARNList=[arns[3], arns[2], arns[1]])
+                describe_task_definition_patch.assert_not_called()
+
+            tagging_client.reset_mock()
+            with self.subTest("New and deregistered revisions"):
+                self.assertEqual(
+                    scan((4, 3, 2)),
+                    ((arns[4], dummy_tags), (arns[3], [self.pulumi_tag]), (arns[2], [self.pulumi_tag])),
+                )
+                # Only the new revision was looked up
+                tagging_client.get_resources.assert_called_once_with(ResourceARNList=[arns[4]])
+                describe_task_definition_patch.assert_called_once_with(taskDefinition=arns[4], include=["TAGS"])
+                tag_index = task_definition_cache.get_tag_index(TEST_APPLICATION_ID)
+                self.assertEqual(tuple(tag_index.tags_by_arn), (arns[3], arns[2], arns[4]))
+
+            tagging_client.reset_mock()
+            describe_task_definition_patch.reset_mock()
+            with (
+                self.subTest("Unchanged"),
+                patch.object(task_definition_cache, attribute="put_tag_index") as put_tag_index_patch,
+            ):
+                self.assertEqual(len(scan((4, 3, 2))), 3)
+                tagging_client.get_resources.assert_not_called()
+                describe_task_definition_patch.assert_not_called()
+                put_tag_index_patch.assert_not_called()
+
+            # The newest revision was tagged again since it was cached
+            describe_task_definition_patch.return_value = {"taskDefinition": {}, "tags": [self.pulumi_tag]}
+            with (
+                self.subTest("Expired"),
+                patch("actions_helper.task_definition_cache.time.time", return_value=1e12),
+            ):
+                self.assertEqual(scan((4, 3, 2))[0], (arns[4], [self.pulumi_tag]))
+                tagging_client.get_resources.assert_called_once_with(ResourceARNList=[arns[4], arns[3], arns[2]])
+                # The tags cached with the revision expired as well
+                describe_task_definition_patch.assert_called_once_with(taskDefinition=arns[4], include=["TAGS"])
+
+    def test_get_active_definition_by_tag_stops_at_second_match(self):
+        with (
+            patch.object(
+                self.ecs_client,
+                attribute="list_task_definitions",
+                return_value={"taskDefinitionArns": ["arn_1", "arn_2", "arn_3", "arn_4"]},
+            ),
+            patch.object(
+                self.ecs_client,
+                attribute="describe_task_definition",
+                return_value={"tags": [self.pulumi_tag]},
+            ) as describe_task_definition_patch,
+            self.assertRaises(NonSingleValueError),
+        ):
+            get_active_task_definition_arn_by_tag(
+                ecs_client=self.ecs_client,
+                task_definition_family_prefix=TEST_APPLICATION_ID,
+                task_definition_tags=f"{self.pulumi_tag['key']}:{self.pulumi_tag['value']}",
+                allow_initial_deployment=False,
+            )
+        self.assertEqual(describe_task_definition_patch.call_count, 2)
+
+    def test_get_active_definition_by_tag_bulk_unavailable(self):
+        tagging_client = Mock()
+        tagging_client.get_resources.side_effect = ClientError(
+            error_response={"Error": {"Code": "AccessDeniedException"}},
+            operation_name="GetResources",
+        )
+
+        with (
+            patch.object(
+                self.ecs_client,
+                attribute="list_task_definitions",
+                return_value={"taskDefinitionArns": ["dummy"]},
+            ),
+            patch.object(
+                self.ecs_client,
+                attribute="describe_task_definition",
+                return_value={"taskDefinition": {"taskDefinitionArn": "dummy"}, "tags": [self.pulumi_tag]},
+            ) as describe_task_definition_patch,
+        ):
+            arn = get_active_task_definition_arn_by_tag(
+                ecs_client=self.ecs_client,
+                tagging_client=tagging_client,
+                task_definition_family_prefix=TEST_APPLICATION_ID,
+                task_definition_tags=f"{self.pulumi_tag['key']}:{self.pulumi_tag['value']}",
+                allow_initial_deployment=False,
+            )
+
+        self.assertEqual(arn, "dummy")
+        describe_task_definition_patch.assert_called_once()
+
+    def test_task_definition_family(self):
+        github_tags = [{"key": "created_by", "value": "Github"}, {"key": "Name", "value": TEST_APPLICATION_ID}]
+        pulumi_tags = [self.pulumi_tag, {"key": "Name", "value": TEST_APPLICATION_ID}]
+        tags_by_arn = {"arn_3": github_tags, "arn_2": pulumi_tags, "arn_1": github_tags}
+
+        with (
+            patch.object(
+                self.ecs_client,
+                attribute="list_task_definitions",
+                return_value={"taskDefinitionArns": list(tags_by_arn)},
+            ) as list_task_definitions_patch,
+            patch.object(
+                self.ecs_client,
+                attribute="describe_task_definition",
+                side_effect=lambda taskDefinition, include: {"tags": tags_by_arn[taskDefinition]},
+            ) as describe_task_definition_patch,
+        ):
+            task_definition_family = TaskDefinitionFamily(
+                ecs_client=self.ecs_client,
+                task_definition_family_prefix=TEST_APPLICATION_ID,
+            )
+
+            with self.subTest("Lookups share one scan"):
+                self.assertEqual(
+                    task_definition_family.get_active_task_definition_arn_by_tag(
+                        task_definition_tags=f"created_by:Pulumi,Name:{TEST_APPLICATION_ID}",
+                        allow_initial_deployment=False,
+                    ),
+                    "arn_2",
+                )
+                with self.assertRaises(NonSingleValueError):
+                    task_definition_family.get_active_task_definition_arn_by_tag(
+                        task_definition_tags=f"created_by:Github,Name:{TEST_APPLICATION_ID}",
+                        allow_initial_deployment=True,
+                    )
+                list_task_definitions_patch.assert_called_once()
+                self.assertEqual(describe_task_definition_patch.call_count, 3)
+
+            with self.subTest("Tags of a revision"):
+                self.assertListEqual(task_definition_family.get_task_definition_tags("arn_2"), pulumi_tags)
+                self.assertEqual(describe_task_definition_patch.call_count, 3)
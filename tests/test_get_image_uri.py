@@ -2,28 +2,93 @@ import unittest
 from unittest.mock import Mock, patch
 
 import boto3
+from botocore.exceptions import ClientError
 
-from actions_helper.commands.get_image_uri import get_image_uri
+from actions_helper.commands.get_image_uri import ImageNotFoundError, get_image
 
+TEST_REGISTRY_ID = "123456789012"
+TEST_IMAGE_DIGEST = f"sha256:{'0' * 64}"
 
+
+def image_not_found_error(code: str = "ImageNotFoundException") -> ClientError:
+    return ClientError(error_response={"Error": {"Code": code}}, operation_name="DescribeImages")
+
+
+@patch("actions_helper.commands.get_image_uri.time.sleep")
 class GetImageUriTestCase(unittest.TestCase):
     @patch.object(boto3, attribute="client")
     def setUp(self, boto3_client):
         self.ecr_client = boto3_client
+        self.ecr_client.meta.partition = "aws"
+        self.ecr_client.meta.region_name = "eu-central-1"
         self.image_tag = "master-e0428b7"
+        self.image_details = {
+            "imageDetails": [
+                {"registryId": TEST_REGISTRY_ID, "imageDigest": TEST_IMAGE_DIGEST, "imageTags": [self.image_tag]},
+            ],
+        }
+        self.repository_uri = f"{TEST_REGISTRY_ID}.dkr.ecr.eu-central-1.amazonaws.com/foo"
+
+    def test_get_image_uri(self, sleep_patch):
+        with patch.object(
+            self.ecr_client,
+            attribute="describe_images",
+            side_effect=Mock(return_value=self.image_details),
+        ):
+            with self.subTest("Tag"):
+                image = get_image(ecr_client=self.ecr_client, ecr_repository="foo", tag=self.image_tag)
+                self.assertEqual(image.image_uri, f"{self.repository_uri}:{self.image_tag}")
+                self.assertEqual(image.image_digest, TEST_IMAGE_DIGEST)
+
+            with self.subTest("Digest"):
+                image = get_image(
+                    ecr_client=self.ecr_client,
+                    ecr_repository="foo",
+                    tag=self.image_tag,
+                    pin_digest=True,
+                )
+                self.assertEqual(image.image_uri, f"{self.repository_uri}@{TEST_IMAGE_DIGEST}")
+
+            with self.subTest("China partition"):
+                self.ecr_client.meta.partition = "aws-cn"
+                self.ecr_client.meta.region_name = "cn-north-1"
+                image = get_image(ecr_client=self.ecr_client, ecr_repository="foo", tag=self.image_tag)
+                self.assertEqual(
+                    image.image_uri,
+                    f"{TEST_REGISTRY_ID}.dkr.ecr.cn-north-1.amazonaws.com.cn/foo:{self.image_tag}",
+                )
+
+        self.ecr_client.describe_repositories.assert_not_called()
+        sleep_patch.assert_not_called()
+
+    def test_get_image_uri_wait_for_push(self, sleep_patch):
+        with patch.object(
+            self.ecr_client,
+            attribute="describe_images",
+            side_effect=(image_not_found_error(), image_not_found_error(), self.image_details),
+        ):
+            image = get_image(ecr_client=self.ecr_client, ecr_repository="foo", tag=self.image_tag)
+
+        self.assertEqual(image.image_uri, f"{self.repository_uri}:{self.image_tag}")
+        self.assertListEqual([call.args[0] for call in sleep_patch.call_args_list], [2, 3])
+
+    def test_get_image_uri_not_found(self, sleep_patch):
+        with (
+            self.subTest("Timeout"),
+            patch.object(self.ecr_client, attribute="describe_images", side_effect=image_not_found_error()),
+            patch("actions_helper.commands.get_image_uri.time.monotonic", side_effect=(0, 0, 5, 12)),
+            self.assertRaises(ImageNotFoundError),
+        ):
+            get_image(ecr_client=self.ecr_client, ecr_repository="foo", tag=self.image_tag, timeout=10)
+        self.assertListEqual([call.args[0] for call in sleep_patch.call_args_list], [2, 3])
 
-    def test_get_image_uri(self):
         with (
+            self.subTest("Other errors are raised at once"),
             patch.object(
                 self.ecr_client,
                 attribute="describe_images",
-                side_effect=Mock(return_value={"imageDetails": [{"imageTags": [self.image_tag]}]}),
-            ),
-            patch.object(
-                self.ecr_client,
-                attribute="describe_repositories",
-                side_effect=Mock(return_value={"repositories": [{"repositoryUri": "dummy"}]}),
+                side_effect=image_not_found_error("RepositoryNotFoundException"),
             ),
+            self.assertRaises(ClientError),
         ):
-            image_uri = get_image_uri(ecr_client=self.ecr_client, ecr_repository=Mock(), tag=Mock())
-            self.assertEqual(image_uri, f"dummy:{self.image_tag}")
+            get_image(ecr_client=self.ecr_client, ecr_repository="foo", tag=self.image_tag)
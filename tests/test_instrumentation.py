@@ -0,0 +1,86 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from botocore.config import Config
+
+from actions_helper.clients import ClientFactory
+from actions_helper.instrumentation import Instrumentation
+from tests.fake_aws import TEST_REGION, FakeAwsBackend
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = Path(temporary_directory.name)
+        self.instrumentation = Instrumentation()
+
+    def test_phase(self):
+        with self.instrumentation.phase("succeeded"):
+            pass
+        with self.assertRaises(RuntimeError), self.instrumentation.phase("failed"):
+            raise RuntimeError
+
+        self.assertEqual(
+            [(phase.name, phase.succeeded) for phase in self.instrumentation.phases],
+            [("succeeded", True), ("failed", False)],
+        )
+
+    # Skips the backoff of the retries
+    @patch("time.sleep")
+    def test_api_calls(self, _):
+        backend = FakeAwsBackend(throttle_rate=0.3, seed=1)
+        with backend.patch_client_factory():
+            factory = ClientFactory(region_name=TEST_REGION, instrumentation=self.instrumentation)
+            # The standard retry mode has no client side rate limiting which would wait for the throttled calls
+            factory._config = factory._config.merge(Config(retries={"mode": "standard", "max_attempts": 10}))
+            ecs_client = factory.client("ecs")
+            for _ in range(3):
+                ecs_client.list_task_definitions()
+
+        api_calls = self.instrumentation.to_dict()["api_calls"]
+        self.assertDictEqual(
+            api_calls,
+            {
+                "ecs.ListTaskDefinitions": {
+                    "calls": 3,
+                    "retries": backend.calls["ListTaskDefinitions"] - 3,
+                    "throttles": backend.throttled_calls["ListTaskDefinitions"],
+                    "rate_limit_wait": 0.0,
+                },
+            },
+        )
+        self.assertGreater(api_calls["ecs.ListTaskDefinitions"]["throttles"], 0)
+
+    def test_report(self):
+        metrics_file = self.directory / "metrics.json"
+        github_output = self.directory / "github_output"
+        github_step_summary = self.directory / "github_step_summary"
+
+        with self.instrumentation.phase("get_image_uri"):
+            self.instrumentation.calls["ecr.DescribeImages"] += 1
+            self.instrumentation.attempts["ecr.DescribeImages"] += 2
+
+        with self.subTest("Without GitHub Actions"), patch.dict("os.environ", clear=True):
+            self.instrumentation.report(str(metrics_file))
+            metrics = json.loads(metrics_file.read_text())
+            self.assertEqual(metrics["phases"][0]["name"], "get_image_uri")
+            self.assertDictEqual(
+                metrics["api_calls"],
+                {"ecr.DescribeImages": {"calls": 1, "retries": 1, "throttles": 0, "rate_limit_wait": 0.0}},
+            )
+
+        with (
+            self.subTest("GitHub Actions"),
+            patch.dict(
+                "os.environ",
+                {"GITHUB_OUTPUT": str(github_output), "GITHUB_STEP_SUMMARY": str(github_step_summary)},
+            ),
+        ):
+            self.instrumentation.report()
+            self.assertTrue(github_output.read_text().startswith('metrics={"duration": '))
+            self.assertIn("| get_image_uri | 0.0 |", github_step_summary.read_text())
+            self.assertIn("| ecr.DescribeImages | 1 | 1 | 0 | 0.0 |", github_step_summary.read_text())
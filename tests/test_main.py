@@ -1,25 +1,67 @@
+import json
+import subprocess
+import sys
 import unittest
 from typing import Any
 from unittest.mock import Mock, patch
 
 from click.testing import CliRunner
 
-from actions_helper.main import cmd_ecs_deploy
-from actions_helper.outputs import CreateTaskDefinitionOutput
+from actions_helper import main, rate_limiter
+from actions_helper.commands import gc_task_definitions, get_image_uri
+from actions_helper.main import cmd_ecs_deploy, cmd_ecs_deploy_many, cmd_gc_task_definitions
+from actions_helper.outputs import (
+    CreateTaskDefinitionOutput,
+    DeploymentPlan,
+    DeployServiceOutput,
+    GcTaskDefinitionsOutput,
+    ImageOutput,
+)
 from tests.utils import TEST_APPLICATION_ID, TEST_AWS_DEFAULT_REGION
 
 TEST_ENVIRONMENT = "dev"
+TEST_IMAGE_DIGEST = f"sha256:{'0' * 64}"
+# Importing the CLI must not import boto3, which is only needed once a command runs
+IMPORT_TIME_BUDGET = 0.5  # seconds
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_import_time(self):
+        result = subprocess.run(
+            (
+                sys.executable,
+                "-c",
+                "import sys, time; start = time.perf_counter(); import actions_helper.main; "
+                "print(time.perf_counter() - start, 'botocore' in sys.modules)",
+            ),
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        import_time, botocore_imported = result.stdout.split()
 
+        self.assertEqual(botocore_imported, "False")
+        self.assertLess(float(import_time), IMPORT_TIME_BUDGET)
 
-@patch("actions_helper.main.boto3.Session")
+    def test_defaults(self):
+        # The CLI repeats the defaults of the command modules, so that it does not have to import them
+        self.assertEqual(main.DEFAULT_API_RATE_LIMIT, rate_limiter.DEFAULT_RATE)
+        self.assertEqual(main.DEFAULT_IMAGE_WAIT_TIMEOUT, get_image_uri.IMAGE_WAIT_TIMEOUT)
+        self.assertEqual(main.DEFAULT_GC_KEEP_REVISIONS, gc_task_definitions.DEFAULT_KEEP_REVISIONS)
+        self.assertEqual(main.DEFAULT_GC_MAX_WORKERS, gc_task_definitions.DEFAULT_MAX_WORKERS)
+
+
+@patch("actions_helper.clients.boto3.Session")
+@patch("actions_helper.commands.deploy_service.wait_for_service_stable")
 @patch(
-    "actions_helper.main.create_task_definition",
+    "actions_helper.commands.deploy_service.create_task_definition",
     return_value=CreateTaskDefinitionOutput(
         latest_task_definition_arn=Mock(return_value=""),
         previous_task_definition_arn=Mock(return_value=""),
     ),
 )
-@patch("actions_helper.main.get_image_uri")
+@patch("actions_helper.commands.get_image_uri.get_image")
+@patch("actions_helper.commands.deploy_service.validate_deployment")
 class CmdECSDeployTestCase(unittest.TestCase):
     def setUp(self):
         self.runner = CliRunner(env={"AWS_DEFAULT_REGION": TEST_AWS_DEFAULT_REGION})
@@ -45,10 +87,57 @@ class CmdECSDeployTestCase(unittest.TestCase):
         self.assertIsInstance(result.exception, RuntimeError)
         self.assertEqual(result.exit_code, 1)
 
+    def test_fast_rollout(self, *args, **kwargs):
+        with patch("actions_helper.commands.deploy_service.deploy_service") as deploy_service_patch:
+            with self.subTest("Live environment"):
+                result = self.runner.invoke(
+                    cmd_ecs_deploy,
+                    args=self.make_args(
+                        self.pulumi_command_args
+                        | {"--environment": "live", "--allow-feature-branch-deployment": False, "--fast-rollout": True},
+                    ),
+                )
+                self.assertIsInstance(result.exception, RuntimeError)
+                deploy_service_patch.assert_not_called()
+
+            with self.subTest("Dev environment"):
+                result = self.runner.invoke(
+                    cmd_ecs_deploy,
+                    args=self.make_args(self.pulumi_command_args | {"--fast-rollout": True}),
+                )
+                self.assertEqual(result.exit_code, 0)
+                self.assertTrue(deploy_service_patch.call_args.kwargs["fast_rollout"])
+
+    def test_cmd_ecs_deploy_plan(self, *args, **kwargs):
+        deployment_plan = DeploymentPlan(
+            service=f"{TEST_APPLICATION_ID}-{TEST_ENVIRONMENT}",
+            image_uri="image_uri",
+            task_definitions=(),
+        )
+        with (
+            patch(
+                "actions_helper.commands.plan_deployment.plan_deployment",
+                return_value=deployment_plan,
+            ) as plan_deployment_patch,
+            patch("actions_helper.commands.deploy_service.deploy_service") as deploy_service_patch,
+        ):
+            result = self.runner.invoke(cmd_ecs_deploy, args=self.make_args(self.pulumi_command_args | {"--plan": ""}))
+
+        self.assertEqual(result.exit_code, 0)
+        plan_deployment_patch.assert_called_once()
+        deploy_service_patch.assert_not_called()
+        self.assertIn("Getting docker image URI...", result.stderr)
+        self.assertDictEqual(
+            json.loads(result.stdout),
+            {"service": f"{TEST_APPLICATION_ID}-{TEST_ENVIRONMENT}", "image_uri": "image_uri", "task_definitions": []},
+        )
+
     def test_cmd_ecs_deploy_without_preflight(self, *args, **kwargs):
         with (
-            patch("actions_helper.main.run_preflight_container") as run_preflight_mock,
-            patch("actions_helper.main.deregister_task_definition") as deregister_task_definition_mock,
+            patch("actions_helper.commands.deploy_service.run_preflight_container") as run_preflight_mock,
+            patch(
+                "actions_helper.commands.deploy_service.deregister_task_definition",
+            ) as deregister_task_definition_mock,
         ):
             result = self.runner.invoke(cmd_ecs_deploy, args=self.make_args(self.pulumi_command_args))
 
@@ -58,8 +147,10 @@ class CmdECSDeployTestCase(unittest.TestCase):
 
     def test_cmd_ecs_deploy_with_preflight(self, *args, **kwargs):
         with (
-            patch("actions_helper.main.run_preflight_container") as run_preflight_mock,
-            patch("actions_helper.main.deregister_task_definition") as deregister_task_definition_mock,
+            patch("actions_helper.commands.deploy_service.run_preflight_container") as run_preflight_mock,
+            patch(
+                "actions_helper.commands.deploy_service.deregister_task_definition",
+            ) as deregister_task_definition_mock,
         ):
             result = self.runner.invoke(
                 cmd_ecs_deploy,
@@ -68,3 +159,158 @@ class CmdECSDeployTestCase(unittest.TestCase):
             run_preflight_mock.assert_called()
             deregister_task_definition_mock.assert_called()
             self.assertEqual(result.exit_code, 0)
+
+    def test_cmd_ecs_deploy_failed_task_definition(self, *args, **kwargs):
+        local_task_definition = CreateTaskDefinitionOutput(
+            latest_task_definition_arn="local_arn",
+            previous_task_definition_arn="",
+        )
+
+        def create_task_definition(application_id: str, **_):
+            if application_id == f"{TEST_APPLICATION_ID}-local-exec-{TEST_ENVIRONMENT}":
+                return local_task_definition
+            raise RuntimeError("registration failed")
+
+        with (
+            patch("actions_helper.commands.deploy_service.create_task_definition", side_effect=create_task_definition),
+            patch("actions_helper.commands.deploy_service.run_preflight_container") as run_preflight_mock,
+            patch(
+                "actions_helper.commands.deploy_service.deregister_task_definition",
+            ) as deregister_task_definition_mock,
+        ):
+            result = self.runner.invoke(
+                cmd_ecs_deploy,
+                args=self.make_args(self.pulumi_command_args | {"--run-preflight": True}),
+            )
+            self.assertIsInstance(result.exception, RuntimeError)
+            run_preflight_mock.assert_not_called()
+            deregister_task_definition_mock.assert_called_once()
+            self.assertEqual(
+                deregister_task_definition_mock.call_args.kwargs["local_task_definition_output"],
+                local_task_definition,
+            )
+            self.assertIsNone(deregister_task_definition_mock.call_args.kwargs["production_task_definition_output"])
+
+
+@patch("actions_helper.clients.boto3.Session")
+@patch(
+    "actions_helper.commands.get_image_uri.get_image",
+    return_value=ImageOutput(image_uri="image_uri", image_digest=TEST_IMAGE_DIGEST),
+)
+class CmdECSDeployManyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.runner = CliRunner(env={"AWS_DEFAULT_REGION": TEST_AWS_DEFAULT_REGION})
+        self.args = (
+            "--manifest - --ecr-repository foo --deployment-tag Github-Action --image-tag master-e0428b7 "
+            "--allow-feature-branch-deployment true"
+        )
+        self.manifest = [
+            {
+                "application": "web",
+                "environment": "dev",
+                "desired_count": 2,
+                "run_preflight": True,
+                "fast_rollout": True,
+            },
+            {"application": "worker", "environment": "DEV"},
+        ]
+
+    @staticmethod
+    def deploy_service(application: str, environment: str, **_) -> DeployServiceOutput:
+        if application == "worker":
+            raise SystemExit(1)
+        return DeployServiceOutput(service=f"{application}-{environment}", task_definition_arn="arn")
+
+    def test_allow_feature_branch_wrong_environment(self, get_image_patch, *args):
+        result = self.runner.invoke(
+            cmd_ecs_deploy_many,
+            args=self.args,
+            input=json.dumps([*self.manifest, {"application": "web", "environment": "live"}]),
+        )
+        self.assertIsInstance(result.exception, RuntimeError)
+        get_image_patch.assert_not_called()
+
+    def test_max_task_definition_revisions(self, get_image_patch, *args):
+        for command in (cmd_ecs_deploy, cmd_ecs_deploy_many):
+            with self.subTest(command=command.name):
+                result = self.runner.invoke(
+                    command,
+                    args="--ecr-repository foo --image-tag master-e0428b7 --max-task-definition-revisions 1",
+                )
+                self.assertEqual(result.exit_code, 2)
+                self.assertIn("1 is not in the range x>=2", result.output)
+        get_image_patch.assert_not_called()
+
+    def test_max_parallel_deployments(self, get_image_patch, *args):
+        result = self.runner.invoke(
+            cmd_ecs_deploy_many,
+            args=f"{self.args} --max-parallel-deployments 0",
+            input=json.dumps(self.manifest),
+        )
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("0 is not in the range x>=1", result.output)
+        get_image_patch.assert_not_called()
+
+    def test_fast_rollout_live_environment(self, get_image_patch, *args):
+        result = self.runner.invoke(
+            cmd_ecs_deploy_many,
+            args="--manifest - --ecr-repository foo --deployment-tag Github-Action --image-tag master-e0428b7",
+            input=json.dumps([{"application": "web", "environment": "live", "fast_rollout": True}]),
+        )
+        self.assertIsInstance(result.exception, RuntimeError)
+        get_image_patch.assert_not_called()
+
+    def test_cmd_ecs_deploy_many(self, get_image_patch, *args):
+        with patch(
+            "actions_helper.commands.deploy_service.deploy_service",
+            side_effect=self.deploy_service,
+        ) as deploy_service_patch:
+            result = self.runner.invoke(cmd_ecs_deploy_many, args=self.args, input=json.dumps(self.manifest))
+
+        get_image_patch.assert_called_once()
+        self.assertEqual(deploy_service_patch.call_count, 2)
+        web_deployment = next(
+            call.kwargs for call in deploy_service_patch.call_args_list if call.kwargs["application"] == "web"
+        )
+        self.assertEqual(web_deployment["image_uri"], "image_uri")
+        self.assertEqual(web_deployment["image_digest"], TEST_IMAGE_DIGEST)
+        self.assertEqual(web_deployment["desired_count"], 2)
+        self.assertTrue(web_deployment["run_preflight"])
+        self.assertTrue(web_deployment["fast_rollout"])
+
+        self.assertIn("web-dev: deployed arn", result.output)
+        self.assertIn("worker-dev: failed", result.output)
+        self.assertIn("Deployment failed for services worker-dev", result.output)
+        self.assertEqual(result.exit_code, 1)
+
+    def test_cmd_ecs_deploy_many_successful(self, *args):
+        with patch("actions_helper.commands.deploy_service.deploy_service", side_effect=self.deploy_service):
+            result = self.runner.invoke(cmd_ecs_deploy_many, args=self.args, input=json.dumps(self.manifest[:1]))
+
+        self.assertIn("web-dev: deployed arn", result.output)
+        self.assertEqual(result.exit_code, 0)
+
+
+@patch("actions_helper.clients.boto3.Session")
+class CmdGcTaskDefinitionsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.runner = CliRunner(env={"AWS_DEFAULT_REGION": TEST_AWS_DEFAULT_REGION})
+        self.args = "--family foo-dev --family foo-test --cluster dev --cluster test --keep 2 --dry-run"
+
+    def test_cmd_gc_task_definitions(self, *args):
+        for failed, exit_code in (((), 0), (("arn",), 1)):
+            with (
+                self.subTest(failed=failed),
+                patch(
+                    "actions_helper.commands.gc_task_definitions.gc_task_definitions",
+                    return_value=GcTaskDefinitionsOutput(kept=("arn",), deregistered=(), deleted=(), failed=failed),
+                ) as gc_task_definitions_patch,
+            ):
+                result = self.runner.invoke(cmd_gc_task_definitions, args=self.args)
+
+                self.assertEqual(result.exit_code, exit_code)
+                self.assertIn("Kept 1 task definitions", result.output)
+                self.assertEqual(gc_task_definitions_patch.call_args.kwargs["families"], ("foo-dev", "foo-test"))
+                self.assertEqual(gc_task_definitions_patch.call_args.kwargs["clusters"], ("dev", "test"))
+                self.assertEqual(gc_task_definitions_patch.call_args.kwargs["keep"], 2)
+                self.assertTrue(gc_task_definitions_patch.call_args.kwargs["dry_run"])
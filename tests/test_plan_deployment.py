@@ -0,0 +1,158 @@
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands import plan_deployment as plan_deployment_command
+from actions_helper.commands.plan_deployment import diff_task_definitions, plan_deployment
+from actions_helper.poller import DescribeFailedError
+from actions_helper.utils import PLACEHOLDER_TEXT
+from tests.fake_aws import APPLICATION, DEPLOYMENT_TAG, ENVIRONMENT, SERVICE, TEST_REGION, make_backend
+
+
+class PlanDeploymentTestCase(unittest.TestCase):
+    def test_diff_task_definitions(self):
+        current = {"family": "foo", "cpu": "256", "containerDefinitions": [{"image": "a", "environment": [1]}]}
+        planned = {"family": "foo", "memory": "512", "containerDefinitions": [{"image": "b", "environment": [1, 2]}]}
+
+        self.assertTupleEqual(
+            diff_task_definitions(current, planned),
+            (
+                {"path": "containerDefinitions[0].environment", "action": "change", "current": [1], "planned": [1, 2]},
+                {"path": "containerDefinitions[0].image", "action": "change", "current": "a", "planned": "b"},
+                {"path": "cpu", "action": "remove", "current": "256"},
+                {"path": "memory", "action": "add", "planned": "512"},
+            ),
+        )
+        self.assertTupleEqual(diff_task_definitions(current, current), ())
+
+    def test_plan_deployment(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        # The service runs an older revision than the one of the previous deployment
+        production_arn = f"arn:aws:ecs:{TEST_REGION}:123456789012:task-definition/{SERVICE}:2"
+        backend.add_service(cluster=ENVIRONMENT, service=SERVICE, task_definition_arn=production_arn)
+        image_uri = f"{APPLICATION}:new"
+
+        with backend.patch_client_factory(), redirect_stdout(io.StringIO()):
+            clients = ClientFactory(region_name=TEST_REGION)
+            deployment_plan = plan_deployment(
+                ecs_client=clients.client("ecs"),
+                tagging_client=clients.client("resourcegroupstaggingapi"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=image_uri,
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=True,
+            )
+
+        self.assertEqual(deployment_plan.service, SERVICE)
+        self.assertListEqual(
+            [
+                (plan.family, plan.current_task_definition_arn.rsplit("/")[-1])
+                for plan in deployment_plan.task_definitions
+            ],
+            [
+                (f"{APPLICATION}-local-exec-{ENVIRONMENT}", f"{APPLICATION}-local-exec-{ENVIRONMENT}:3"),
+                (SERVICE, f"{SERVICE}:2"),
+                (f"{APPLICATION}-preflight-{ENVIRONMENT}", f"{APPLICATION}-preflight-{ENVIRONMENT}:3"),
+            ],
+        )
+        for plan in deployment_plan.task_definitions:
+            self.assertIn(
+                {
+                    "path": "containerDefinitions[0].image",
+                    "action": "change",
+                    "current": PLACEHOLDER_TEXT,
+                    "planned": image_uri,
+                },
+                plan.changes,
+            )
+        # Nothing was written
+        self.assertSetEqual(
+            set(backend.calls),
+            {"DescribeServices", "ListTaskDefinitions", "GetResources", "DescribeTaskDefinition"},
+        )
+
+    def test_plan_initial_deployment(self):
+        backend = make_backend(family_size=1, latency=0, throttle_rate=0)
+
+        with backend.patch_client_factory(), redirect_stdout(io.StringIO()):
+            clients = ClientFactory(region_name=TEST_REGION)
+            deployment_plan = plan_deployment(
+                ecs_client=clients.client("ecs"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=f"{APPLICATION}:new",
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=False,
+            )
+
+        local_plan, production_plan = deployment_plan.task_definitions
+        # The service runs the revision created by Pulumi, the local task definition was never deployed
+        self.assertTrue(production_plan.current_task_definition_arn)
+        self.assertEqual(local_plan.current_task_definition_arn, "")
+        self.assertEqual({change["action"] for change in local_plan.changes}, {"add"})
+
+    def test_plan_scans_without_waiting_for_service(self):
+        # The service is only described once the production family was scanned, which would never happen if the scan
+        # waited for the description
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        production_prepared = threading.Event()
+        prepare_task_definition = plan_deployment_command.prepare_task_definition
+        describe_service = plan_deployment_command.describe_service
+
+        def prepare_production_task_definition(application_id: str, **kwargs):
+            prepared_task_definition = prepare_task_definition(application_id=application_id, **kwargs)
+            if application_id == SERVICE:
+                production_prepared.set()
+            return prepared_task_definition
+
+        def describe_service_after_scan(*args, **kwargs):
+            if not production_prepared.wait(timeout=5):
+                raise TimeoutError("Production family was not scanned")
+            return describe_service(*args, **kwargs)
+
+        with (
+            backend.patch_client_factory(),
+            redirect_stdout(io.StringIO()),
+            patch.object(
+                plan_deployment_command,
+                attribute="prepare_task_definition",
+                side_effect=prepare_production_task_definition,
+            ),
+            patch.object(
+                plan_deployment_command,
+                attribute="describe_service",
+                side_effect=describe_service_after_scan,
+            ),
+        ):
+            deployment_plan = plan_deployment(
+                ecs_client=ClientFactory(region_name=TEST_REGION).client("ecs"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=f"{APPLICATION}:new",
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=False,
+            )
+
+        self.assertEqual(deployment_plan.task_definitions[1].family, SERVICE)
+
+    def test_plan_missing_service(self):
+        backend = make_backend(family_size=1, latency=0, throttle_rate=0)
+        del backend.services[(ENVIRONMENT, SERVICE)]
+
+        with (
+            backend.patch_client_factory(),
+            redirect_stdout(io.StringIO()),
+            self.assertRaisesRegex(DescribeFailedError, SERVICE),
+        ):
+            plan_deployment(
+                ecs_client=ClientFactory(region_name=TEST_REGION).client("ecs"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=f"{APPLICATION}:new",
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=False,
+            )
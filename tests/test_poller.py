@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import call, patch
+
+from botocore.exceptions import ClientError
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands.wait_for_service_stable import wait_for_service_stable
+from actions_helper.commands.wait_for_task_stopped import (
+    TASK_STOPPED_POLL_DELAY,
+    TaskStoppedTimeoutError,
+    wait_for_task_stopped,
+)
+from actions_helper.poller import BatchPoller, DescribeFailedError
+from tests.fake_aws import TEST_ACCOUNT_ID, TEST_REGION, FakeAwsBackend, FakeAwsError
+
+TEST_CLUSTERS = ("dev", "test")
+
+
+class BatchPollerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeAwsBackend()
+        for cluster in TEST_CLUSTERS:
+            for index in range(25):
+                self.backend.add_service(cluster=cluster, service=f"app{index}-{cluster}", task_definition_arn="arn")
+        for index in range(150):
+            task_arn = f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task/dev/{index}"
+            self.backend.tasks[task_arn] = {"taskArn": task_arn, "lastStatus": "STOPPED", "containers": []}
+
+        patch_client_factory = self.backend.patch_client_factory()
+        patch_client_factory.__enter__()
+        self.addCleanup(patch_client_factory.__exit__, None, None, None)
+        self.poller = BatchPoller(ClientFactory(region_name=TEST_REGION).client("ecs"), interval=0.2)
+        self.addCleanup(self.poller.close)
+
+    def test_batched_describes(self):
+        # The first round starts right away, the requests made meanwhile are combined into the next one
+        self.poller.describe_service("dev", "app0-dev").result()
+        self.backend.reset_calls()
+
+        service_futures = {
+            (cluster, index): self.poller.describe_service(cluster, f"app{index}-{cluster}")
+            for cluster in TEST_CLUSTERS
+            for index in range(25)
+        }
+        task_futures = {index: self.poller.describe_task("dev", str(index)) for index in range(150)}
+        duplicate_future = self.poller.describe_service("dev", "app0-dev")
+
+        for (cluster, index), future in service_futures.items():
+            self.assertEqual(future.result()["serviceName"], f"app{index}-{cluster}")
+        for index, future in task_futures.items():
+            self.assertTrue(future.result()["taskArn"].endswith(f"/{index}"))
+        self.assertEqual(duplicate_future.result(), service_futures[("dev", 0)].result())
+        self.assertEqual(self.backend.calls, {"DescribeServices": 3 * 2, "DescribeTasks": 2})
+
+    def test_failures(self):
+        with self.subTest("Missing"), self.assertRaisesRegex(DescribeFailedError, "Describing unknown failed: MISSING"):
+            self.poller.describe_service("dev", "unknown").result()
+
+        with (
+            self.subTest("Error"),
+            patch.object(self.backend, attribute="_describe_tasks", side_effect=FakeAwsError("AccessDenied", "")),
+            self.assertRaises(ClientError),
+        ):
+            self.poller.describe_task("dev", "0").result()
+
+    def test_cancelled(self):
+        self.poller.describe_task("dev", "0").result()
+        self.backend.reset_calls()
+
+        cancelled_future = self.poller.describe_task("dev", "1")
+        cancelled_future.cancel()
+        future = self.poller.describe_task("dev", "2")
+
+        self.assertEqual(future.result()["taskArn"], f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task/dev/2")
+        self.assertTrue(cancelled_future.cancelled())
+        self.assertEqual(self.backend.calls["DescribeTasks"], 1)
+
+        with BatchPoller(self.poller.ecs_client) as poller:
+            poller.describe_task("dev", "0").result()
+            poller.describe_task("dev", "1").cancel()
+
+    def test_close(self):
+        with BatchPoller(self.poller.ecs_client) as poller:
+            poller.describe_task("dev", "0").result()
+            # Waits for the next round, which is only due after the interval
+            future = poller.describe_task("dev", "1")
+
+        with self.assertRaisesRegex(RuntimeError, "The poller is closed"):
+            future.result()
+        with self.assertRaisesRegex(RuntimeError, "The poller is closed"):
+            poller.describe_task("dev", "0")
+
+    @patch("actions_helper.commands.wait_for_task_stopped.time.sleep")
+    def test_waiters(self, sleep_patch):
+        with self.subTest("Service stable"):
+            deployment = wait_for_service_stable(
+                ecs_client=None,
+                cluster="dev",
+                service="app0-dev",
+                task_definition_arn="arn",
+                poller=self.poller,
+            )
+            self.assertEqual(deployment["taskDefinition"], "arn")
+
+        with self.subTest("Task stopped"):
+            wait_for_task_stopped(ecs_client=None, cluster="dev", task="0", poller=self.poller)
+            # The fake backend sleeps for its latency as well
+            self.assertNotIn(call(TASK_STOPPED_POLL_DELAY), sleep_patch.call_args_list)
+
+        self.backend.tasks[f"arn:aws:ecs:{TEST_REGION}:{TEST_ACCOUNT_ID}:task/dev/0"]["lastStatus"] = "RUNNING"
+        with (
+            self.subTest("Task stopped timeout"),
+            patch("actions_helper.commands.wait_for_task_stopped.TASK_STOPPED_MAX_ATTEMPTS", new=2),
+            self.assertRaises(TaskStoppedTimeoutError),
+        ):
+            wait_for_task_stopped(ecs_client=None, cluster="dev", task="0", poller=self.poller)
+        self.assertEqual(sleep_patch.call_args_list.count(call(TASK_STOPPED_POLL_DELAY)), 2)
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+from actions_helper.clients import ClientFactory
+from actions_helper.instrumentation import Instrumentation
+from actions_helper.rate_limiter import RateLimiter, TokenBucket
+from tests.fake_aws import TEST_REGION, FakeAwsBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ("monotonic", "sleep"):
+            patcher = patch(f"actions_helper.rate_limiter.time.{name}", side_effect=getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2, burst=3)
+
+        with self.subTest("Burst"):
+            self.assertListEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+
+        with self.subTest("Sustained rate"):
+            self.assertListEqual([bucket.acquire() for _ in range(3)], [0.5, 0.5, 0.5])
+            self.assertEqual(self.clock.now, 1.5)
+
+        with self.subTest("Refill"):
+            self.clock.now += 10
+            self.assertListEqual([bucket.acquire() for _ in range(4)], [0.0, 0.0, 0.0, 0.5])
+
+    def test_token_bucket_queued_callers(self):
+        # Callers which have taken their token but still wait are queued, so the next caller waits for all of them
+        bucket = TokenBucket(rate=1, burst=1)
+        with patch("actions_helper.rate_limiter.time.sleep"):
+            self.assertListEqual([bucket.acquire() for _ in range(3)], [0.0, 1.0, 2.0])
+
+    def test_token_bucket_invalid(self):
+        for rate, burst in ((0, 1), (1, 0)):
+            with self.subTest(rate=rate, burst=burst), self.assertRaises(ValueError):
+                TokenBucket(rate=rate, burst=burst)
+
+    def test_bucket_per_operation(self):
+        rate_limiter = RateLimiter(rate=5, burst=10, rates_by_operation={"ecs.DescribeTaskDefinition": (1, 2)})
+
+        self.assertIs(rate_limiter.bucket("ecs.ListTaskDefinitions"), rate_limiter.bucket("ecs.ListTaskDefinitions"))
+        self.assertIsNot(rate_limiter.bucket("ecs.ListTaskDefinitions"), rate_limiter.bucket("ecr.DescribeImages"))
+        self.assertEqual(
+            (rate_limiter.bucket("ecs.ListTaskDefinitions").rate, rate_limiter.bucket("ecs.ListTaskDefinitions").burst),
+            (5, 10),
+        )
+        self.assertEqual(
+            (
+                rate_limiter.bucket("ecs.DescribeTaskDefinition").rate,
+                rate_limiter.bucket("ecs.DescribeTaskDefinition").burst,
+            ),
+            (1, 2),
+        )
+
+    def test_attach(self):
+        instrumentation = Instrumentation()
+        rate_limiter = RateLimiter(rate=1, burst=2, instrumentation=instrumentation)
+        backend = FakeAwsBackend()
+
+        with backend.patch_client_factory():
+            clients = ClientFactory(region_name=TEST_REGION, instrumentation=instrumentation, rate_limiter=rate_limiter)
+            ecs_client = clients.client("ecs")
+            for _ in range(4):
+                ecs_client.list_task_definitions()
+            ecs_client.describe_services(cluster="dev", services=[])
+            # Limiters work without instrumentation as well
+            ecr_client = RateLimiter(rate=1, burst=1).attach(clients._session.client("ecr"))
+            backend.attach(ecr_client)
+            for _ in range(2):
+                ecr_client.describe_repositories(repositoryNames=["web"])
+
+        self.assertEqual(backend.calls["ListTaskDefinitions"], 4)
+        self.assertEqual(self.clock.now, 3.0)
+        self.assertDictEqual(
+            {
+                operation: counts["rate_limit_wait"]
+                for operation, counts in instrumentation.to_dict()["api_calls"].items()
+            },
+            {"ecs.DescribeServices": 0.0, "ecs.ListTaskDefinitions": 2.0},
+        )
@@ -0,0 +1,27 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from actions_helper.commands.rollback_service import rollback_service
+from tests.utils import TEST_CLUSTER, TEST_SERVICE
+
+
+class RollbackServiceTestCase(unittest.TestCase):
+    @patch("actions_helper.commands.rollback_service.time.monotonic", side_effect=(10, 52))
+    @patch("actions_helper.commands.rollback_service.wait_for_service_stable")
+    def test_rollback_service(self, wait_for_service_stable_patch, _):
+        ecs_client = Mock()
+
+        time_to_recovery = rollback_service(
+            ecs_client=ecs_client,
+            cluster=TEST_CLUSTER,
+            service=TEST_SERVICE,
+            task_definition_arn="previous_arn",
+        )
+
+        self.assertEqual(time_to_recovery, 42)
+        ecs_client.update_service.assert_called_once_with(
+            cluster=TEST_CLUSTER,
+            service=TEST_SERVICE,
+            taskDefinition="previous_arn",
+        )
+        self.assertEqual(wait_for_service_stable_patch.call_args.kwargs["task_definition_arn"], "previous_arn")
@@ -0,0 +1,24 @@
+import unittest
+
+from actions_helper.service_snapshot import ServiceSnapshot
+from tests.utils import make_service
+
+
+class ServiceSnapshotTestCase(unittest.TestCase):
+    def test_service_snapshot(self):
+        service_snapshot = ServiceSnapshot()
+        service_description = make_service("COMPLETED", running_count=2)["services"][0]
+
+        with self.subTest("Empty"):
+            self.assertIsNone(service_snapshot.get())
+            self.assertIsNone(service_snapshot.get(static=True))
+
+        service_snapshot.update(service_description)
+        with self.subTest("Current"):
+            self.assertIs(service_snapshot.get(), service_description)
+            self.assertIs(service_snapshot.get(static=True), service_description)
+
+        service_snapshot.invalidate()
+        with self.subTest("Service updated"):
+            self.assertIsNone(service_snapshot.get())
+            self.assertIs(service_snapshot.get(static=True), service_description)
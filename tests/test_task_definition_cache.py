@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import ANY, Mock, patch
+
+from actions_helper.task_definition_cache import TaskDefinitionCache, TaskDefinitionTagIndex, describe_task_definition
+
+TEST_TASK_DEFINITION_ARN = "arn:aws:ecs:us-east-1:123456789012:task-definition/foo:1"
+
+
+class TaskDefinitionCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = Path(temporary_directory.name) / "cache"
+        self.cache = TaskDefinitionCache(self.directory)
+        self.task_definition = {"family": "foo", "containerDefinitions": [{"name": "foo", "image": "image"}]}
+        self.tags = [{"key": "created_by", "value": "Pulumi"}]
+
+    def test_get(self):
+        with self.subTest("Missing"):
+            self.assertIsNone(self.cache.get(TEST_TASK_DEFINITION_ARN))
+
+        self.cache.put(TEST_TASK_DEFINITION_ARN, self.task_definition, self.tags)
+
+        with self.subTest("Cached"):
+            response = self.cache.get(TEST_TASK_DEFINITION_ARN)
+            self.assertDictEqual(response, {"taskDefinition": self.task_definition, "tags": self.tags})
+
+        with self.subTest("Copies"):
+            response["taskDefinition"]["containerDefinitions"][0]["image"] = "rendered"
+            self.assertDictEqual(self.cache.get(TEST_TASK_DEFINITION_ARN)["taskDefinition"], self.task_definition)
+
+        with self.subTest("Expired tags"), patch("actions_helper.task_definition_cache.time.time", return_value=1e12):
+            self.assertIsNone(self.cache.get(TEST_TASK_DEFINITION_ARN, fresh_tags=True))
+            self.assertIsNotNone(self.cache.get(TEST_TASK_DEFINITION_ARN))
+
+        with self.subTest("Shared with other instances"):
+            self.assertIsNotNone(TaskDefinitionCache(self.directory).get(TEST_TASK_DEFINITION_ARN))
+
+        with self.subTest("Broken"):
+            next(self.directory.iterdir()).write_bytes(b"broken")
+            self.assertIsNone(self.cache.get(TEST_TASK_DEFINITION_ARN))
+
+    def test_tag_index(self):
+        with self.subTest("Missing"):
+            self.assertEqual(self.cache.get_tag_index("foo"), TaskDefinitionTagIndex(created_at=ANY))
+
+        tag_index = TaskDefinitionTagIndex(tags_by_arn={TEST_TASK_DEFINITION_ARN: self.tags})
+        self.cache.put_tag_index("foo", tag_index)
+
+        with self.subTest("Cached"):
+            self.assertEqual(self.cache.get_tag_index("foo"), tag_index)
+            self.assertEqual(self.cache.get_tag_index("fo"), TaskDefinitionTagIndex(created_at=ANY))
+
+        with self.subTest("Expired"), patch("actions_helper.task_definition_cache.time.time", return_value=1e12):
+            self.assertEqual(self.cache.get_tag_index("foo"), TaskDefinitionTagIndex(created_at=ANY))
+
+    def test_tag_index_update(self):
+        arns = {
+            (family, revision): f"arn:aws:ecs:us-east-1:123456789012:task-definition/{family}:{revision}"
+            for family in ("foo", "foo-worker")
+            for revision in range(1, 6)
+        }
+        tag_index = TaskDefinitionTagIndex()
+
+        with self.subTest("New revisions"):
+            listed_arns = (arns["foo", 4], arns["foo", 2], arns["foo-worker", 1])
+            self.assertTrue(tag_index.update(listed_arns, dict.fromkeys(listed_arns, self.tags), complete=True))
+            self.assertEqual(
+                tag_index.get_unindexed_task_definition_arns((arns["foo", 5], arns["foo", 4])),
+                (arns["foo", 5],),
+            )
+
+        with self.subTest("Unchanged"):
+            self.assertFalse(tag_index.update(listed_arns, {}, complete=True))
+
+        with self.subTest("Partial listing"):
+            # The deregistration of revisions older than the listed ones is unknown
+            self.assertTrue(
+                tag_index.update((arns["foo", 5], arns["foo", 3]), {arns["foo", 5]: self.tags}, complete=False),
+            )
+            self.assertEqual(
+                set(tag_index.tags_by_arn),
+                {arns["foo", 5], arns["foo", 2], arns["foo-worker", 1]},
+            )
+
+        with self.subTest("Complete listing"):
+            self.assertTrue(tag_index.update((arns["foo", 5],), {}, complete=True))
+            self.assertEqual(set(tag_index.tags_by_arn), {arns["foo", 5]})
+
+    def test_eviction(self):
+        arns = tuple(f"{TEST_TASK_DEFINITION_ARN[:-1]}{revision}" for revision in range(1, 4))
+        for index, arn in enumerate(arns[:2]):
+            self.cache.put(arn, self.task_definition, self.tags)
+            os.utime(self.cache._path(arn), (index, index))
+        # Room for two entries, the first one was used most recently
+        self.cache.max_size = self.cache._size * 5 // 4
+        self.cache.get(arns[0])
+
+        self.cache.put(arns[2], self.task_definition, self.tags)
+
+        self.assertEqual(len(tuple(self.directory.iterdir())), 2)
+        self.assertIsNone(self.cache.get(arns[1]))
+        self.assertIsNotNone(self.cache.get(arns[0]))
+        self.assertIsNotNone(self.cache.get(arns[2]))
+
+    def test_describe_task_definition(self):
+        ecs_client = Mock()
+        ecs_client.describe_task_definition.return_value = {"taskDefinition": self.task_definition, "tags": self.tags}
+
+        with self.subTest("Without cache"):
+            for _ in range(2):
+                describe_task_definition(ecs_client, TEST_TASK_DEFINITION_ARN)
+            self.assertEqual(ecs_client.describe_task_definition.call_count, 2)
+            ecs_client.describe_task_definition.assert_called_with(
+                taskDefinition=TEST_TASK_DEFINITION_ARN,
+                include=["TAGS"],
+            )
+
+        ecs_client.reset_mock()
+        with self.subTest("With cache"):
+            for _ in range(2):
+                response = describe_task_definition(ecs_client, TEST_TASK_DEFINITION_ARN, self.cache)
+                self.assertDictEqual(response, {"taskDefinition": self.task_definition, "tags": self.tags})
+            ecs_client.describe_task_definition.assert_called_once()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+from unittest.mock import Mock
+
+from actions_helper.task_graph import TaskGraph
+
+
+class TaskGraphTestCase(unittest.TestCase):
+    def test_add_invalid_steps(self):
+        graph = TaskGraph()
+        graph.add("a", Mock())
+
+        with self.subTest("Duplicate step"), self.assertRaises(ValueError):
+            graph.add("a", Mock())
+
+        with self.subTest("Unknown dependency"), self.assertRaises(ValueError):
+            graph.add("b", Mock(), depends_on=("c",))
+
+    def test_run_passes_dependency_results(self):
+        graph = TaskGraph()
+        graph.add("a", Mock(return_value=1))
+        graph.add("b", Mock(return_value=2))
+        graph.add("c", lambda a, b: a + b, depends_on=("a", "b"))
+        graph.run()
+
+        self.assertDictEqual(graph.results, {"a": 1, "b": 2, "c": 3})
+
+    def test_run_independent_steps_concurrently(self):
+        # Both steps can only finish if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        graph = TaskGraph()
+        graph.add("a", barrier.wait)
+        graph.add("b", barrier.wait)
+        graph.run()
+
+        self.assertSetEqual(set(graph.results), {"a", "b"})
+
+    def test_run_failed_step(self):
+        release_slow_step = threading.Event()
+
+        def failing_step():
+            release_slow_step.set()
+            raise RuntimeError("failed")
+
+        def slow_step():
+            release_slow_step.wait(timeout=5)
+            return "slow"
+
+        dependent_step = Mock()
+        graph = TaskGraph()
+        graph.add("slow", slow_step)
+        graph.add("failing", failing_step)
+        graph.add("dependent", dependent_step, depends_on=("failing",))
+
+        with self.assertRaisesRegex(RuntimeError, "failed"):
+            graph.run()
+
+        dependent_step.assert_not_called()
+        # Running steps are awaited, so their results are available after a failure
+        self.assertDictEqual(graph.results, {"slow": "slow"})
+
+    def test_run_empty_graph(self):
+        graph = TaskGraph()
+        graph.run()
+        self.assertDictEqual(graph.results, {})
@@ -0,0 +1,89 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from typing import Optional
+
+from actions_helper.clients import ClientFactory
+from actions_helper.commands.validate_deployment import validate_deployment
+from actions_helper.service_snapshot import ServiceSnapshot
+from actions_helper.utils import PLACEHOLDER_TEXT
+from tests.fake_aws import (
+    APPLICATION,
+    DEPLOYMENT_TAG,
+    ENVIRONMENT,
+    LOCAL_FAMILY,
+    PREFLIGHT_FAMILY,
+    SERVICE,
+    TEST_REGION,
+    FakeAwsBackend,
+    break_deployment,
+    make_backend,
+)
+
+
+class ValidateDeploymentTestCase(unittest.TestCase):
+    def validate(self, backend: FakeAwsBackend, service_snapshot: Optional[ServiceSnapshot] = None) -> dict:
+        with backend.patch_client_factory():
+            clients = ClientFactory(region_name=TEST_REGION)
+            return validate_deployment(
+                ecs_client=clients.client("ecs"),
+                tagging_client=clients.client("resourcegroupstaggingapi"),
+                application=APPLICATION,
+                environment=ENVIRONMENT,
+                image_uri=f"{APPLICATION}:latest",
+                deployment_tag=DEPLOYMENT_TAG,
+                run_preflight=True,
+                service_snapshot=service_snapshot,
+            )
+
+    def test_validate_deployment(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        service_snapshot = ServiceSnapshot()
+
+        with redirect_stdout(io.StringIO()):
+            prepared_task_definitions = self.validate(backend, service_snapshot)
+
+        self.assertEqual(tuple(prepared_task_definitions), (LOCAL_FAMILY, SERVICE, PREFLIGHT_FAMILY))
+        for application_id, prepared_task_definition in prepared_task_definitions.items():
+            self.assertEqual(prepared_task_definition.application_id, application_id)
+            self.assertEqual(prepared_task_definition.task_definition["family"], application_id)
+            self.assertTrue(prepared_task_definition.previous_task_definition_arn.endswith(f"/{application_id}:3"))
+            self.assertFalse(prepared_task_definition.unchanged)
+        self.assertEqual(service_snapshot.get()["serviceName"], SERVICE)
+        self.assertNotIn("RegisterTaskDefinition", backend.calls)
+
+    def test_validation_failed(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        break_deployment(backend)
+        output = io.StringIO()
+
+        with redirect_stdout(output), self.assertRaises(SystemExit):
+            self.validate(backend)
+
+        output = output.getvalue()
+        self.assertIn(f"::error ::Validation of service {SERVICE} failed: Describing {SERVICE} failed: MISSING", output)
+        self.assertIn(
+            f"::error ::Not all values for containerDefinitions 'image' equal to '{PLACEHOLDER_TEXT}'",
+            output,
+        )
+        self.assertIn(
+            f"::error ::Validation of task definition family {PREFLIGHT_FAMILY} failed: Expected exactly one active "
+            f"task definition with tags created_by:{DEPLOYMENT_TAG},Name:{PREFLIGHT_FAMILY}",
+            output,
+        )
+        self.assertIn(
+            f"::error ::Validation of the deployment of {SERVICE} failed for service {SERVICE}, "
+            f"task definition family {LOCAL_FAMILY}, task definition family {PREFLIGHT_FAMILY}",
+            output,
+        )
+        self.assertNotIn("RegisterTaskDefinition", backend.calls)
+
+    def test_service_not_active(self):
+        backend = make_backend(family_size=3, latency=0, throttle_rate=0)
+        backend.services[(ENVIRONMENT, SERVICE)]["status"] = "INACTIVE"
+        output = io.StringIO()
+
+        with redirect_stdout(output), self.assertRaises(SystemExit):
+            self.validate(backend)
+
+        self.assertIn(f"Validation of service {SERVICE} failed: Service {SERVICE} is INACTIVE", output.getvalue())
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch
+
+import boto3
+
+from actions_helper.commands.wait_for_service_stable import (
+    MAX_FAILED_TASKS,
+    MAX_POLL_DELAY,
+    MIN_POLL_DELAY,
+    DeploymentFailedError,
+    ServiceStabilityTimeoutError,
+    wait_for_service_stable,
+)
+from tests.utils import TEST_CLUSTER, TEST_SERVICE, TEST_TASK_DEFINITION_ARN, make_event, make_service
+
+
+@patch("actions_helper.commands.wait_for_service_stable.time.sleep")
+class WaitForServiceStableTestCase(unittest.TestCase):
+    @patch.object(boto3, attribute="client")
+    def setUp(self, boto3_client):
+        self.ecs_client = boto3_client
+
+    def _wait(self, describe_services_side_effect, timeout: float = 60):
+        with patch.object(
+            self.ecs_client,
+            attribute="describe_services",
+            side_effect=describe_services_side_effect,
+        ) as describe_services_patch:
+            wait_for_service_stable(
+                ecs_client=self.ecs_client,
+                cluster=TEST_CLUSTER,
+                service=TEST_SERVICE,
+                task_definition_arn=TEST_TASK_DEFINITION_ARN,
+                timeout=timeout,
+            )
+        return describe_services_patch
+
+    def test_rollout_completed(self, sleep_patch):
+        describe_services_patch = self._wait(
+            (
+                make_service("IN_PROGRESS", running_count=0, pending_count=2),
+                make_service("IN_PROGRESS", running_count=2),
+                make_service("IN_PROGRESS", running_count=2),
+                make_service("IN_PROGRESS", running_count=2),
+                make_service("COMPLETED", running_count=2),
+            ),
+        )
+        self.assertEqual(describe_services_patch.call_count, 5)
+        # Backs off while the deployment makes no progress
+        self.assertEqual(
+            [delay.args[0] for delay in sleep_patch.call_args_list],
+            [MIN_POLL_DELAY, MIN_POLL_DELAY, MIN_POLL_DELAY * 1.5, MIN_POLL_DELAY * 1.5**2],
+        )
+
+    def test_backoff_limit(self, sleep_patch):
+        self._wait((*(make_service("IN_PROGRESS", running_count=0),) * 10, make_service("COMPLETED", running_count=2)))
+        self.assertEqual(sleep_patch.call_args.args[0], MAX_POLL_DELAY)
+
+    def test_without_rollout_state(self, sleep_patch):
+        old_deployment = {"taskDefinition": "old_task_definition_arn"}
+        describe_services_patch = self._wait(
+            (
+                make_service(None, running_count=2, other_deployments=(old_deployment,)),
+                make_service(None, running_count=2),
+            ),
+        )
+        self.assertEqual(describe_services_patch.call_count, 2)
+
+    def test_deployment_not_found(self, sleep_patch):
+        with self.assertRaises(DeploymentFailedError):
+            self._wait((make_service("COMPLETED", running_count=2, task_definition_arn="other_arn"),))
+
+    def test_timeout(self, sleep_patch):
+        with self.assertRaises(ServiceStabilityTimeoutError):
+            self._wait((make_service("IN_PROGRESS", running_count=0),) * 2, timeout=MIN_POLL_DELAY / 2)
+
+    def test_rollout_failed(self, sleep_patch):
+        with self.assertRaisesRegex(DeploymentFailedError, "tasks failed to start"):
+            self._wait(
+                (
+                    make_service("IN_PROGRESS", running_count=0),
+                    make_service("FAILED", running_count=0, rolloutStateReason="tasks failed to start"),
+                ),
+            )
+
+    def test_repeated_task_failures(self, sleep_patch):
+        with self.assertRaisesRegex(DeploymentFailedError, f"failed to start {MAX_FAILED_TASKS} tasks"):
+            self._wait(
+                (
+                    make_service("IN_PROGRESS", running_count=0, failedTasks=MAX_FAILED_TASKS - 1),
+                    make_service("IN_PROGRESS", running_count=0, failedTasks=MAX_FAILED_TASKS),
+                    make_service("COMPLETED", running_count=2),
+                ),
+            )
+
+    def test_failure_events(self, sleep_patch):
+        old_failure = make_event("1", "(service foo-dev) was unable to place a task", seconds_after_deployment=-1)
+        started = make_event("2", "(service foo-dev) has started 2 tasks")
+        circuit_breaker = make_event("3", "(service foo-dev) rolling back to deployment ecs-svc/0")
+
+        with self.subTest("Events before the deployment are ignored"):
+            self._wait(
+                (
+                    make_service("IN_PROGRESS", running_count=0, events=(started, old_failure)),
+                    make_service("COMPLETED", running_count=2, events=(started, old_failure)),
+                ),
+            )
+
+        with self.subTest("Circuit breaker rollback"), self.assertRaisesRegex(DeploymentFailedError, "rolling back"):
+            self._wait(
+                (
+                    make_service("IN_PROGRESS", running_count=0, events=(started,)),
+                    make_service("IN_PROGRESS", running_count=0, events=(circuit_breaker, started)),
+                ),
+            )
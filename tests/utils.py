@@ -1,3 +1,6 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any, Optional
+
 TEST_AWS_DEFAULT_REGION = "us-east-1"
 TEST_APPLICATION_ID = "foo"
 TEST_CLUSTER = "dev"
@@ -9,3 +12,39 @@ TEST_KEYS_TO_DELETE_FROM_TASK_DEFINITION = (
     "status",
     "compatibilities",
 )
+
+TEST_TASK_DEFINITION_ARN = "task_definition_arn"
+TEST_DEPLOYMENT_CREATED_AT = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def make_service(
+    rollout_state: Optional[str],
+    running_count: int,
+    pending_count: int = 0,
+    desired_count: int = 2,
+    task_definition_arn: str = TEST_TASK_DEFINITION_ARN,
+    other_deployments: tuple[dict[str, Any], ...] = (),
+    events: tuple[dict[str, Any], ...] = (),
+    **deployment_fields,
+) -> dict[str, Any]:
+    deployment = (
+        {
+            "id": "ecs-svc/1",
+            "createdAt": TEST_DEPLOYMENT_CREATED_AT,
+            "taskDefinition": task_definition_arn,
+            "runningCount": running_count,
+            "pendingCount": pending_count,
+            "desiredCount": desired_count,
+        }
+        | ({"rolloutState": rollout_state} if rollout_state else {})
+        | deployment_fields
+    )
+    return {"services": [{"deployments": [deployment, *other_deployments], "events": list(events)}]}
+
+
+def make_event(event_id: str, message: str, seconds_after_deployment: int = 1) -> dict[str, Any]:
+    return {
+        "id": event_id,
+        "createdAt": TEST_DEPLOYMENT_CREATED_AT + timedelta(seconds=seconds_after_deployment),
+        "message": message,
+    }